@@ -1,3 +1,7 @@
+import time
+# Cold-start measurement: from interpreter reaching this module to the end of startup
+_startup_clock = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine, Base
@@ -42,13 +46,17 @@ import asyncio
 from services.cleanup_service import CleanupService
 from database import SessionLocal
 
+def _run_cleanup():
+    with SessionLocal() as db:
+        CleanupService.run_cleanup(db, days=15)
+
 async def scheduled_cleanup():
     """Background task to run cleanup daily"""
     while True:
         try:
             logger.info("Triggering scheduled cleanup task...")
-            with SessionLocal() as db:
-                CleanupService.run_cleanup(db, days=15)
+            # Blocking file and database work (including the one-time manifest backfill)
+            await asyncio.to_thread(_run_cleanup)
         except Exception as e:
             logger.error(f"Error in scheduled cleanup background task: {e}")
         
@@ -92,6 +100,22 @@ async def startup_event():
     # Start the cleanup task in the background
     asyncio.create_task(scheduled_cleanup())
 
+    # Start the generation job workers (re-queues jobs interrupted by a restart)
+    await files.job_service.start()
+
+    # Heavy libraries (PDF/Office parsers, OCR, pandas, Gemini SDK) load on first use, not here
+    from services.lazy_imports import process_rss_mb
+    rss = process_rss_mb()
+    logger.info(f"Startup completed in {time.perf_counter() - _startup_clock:.2f}s"
+                + (f", RSS {rss:.0f} MB" if rss is not None else ""))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop extraction worker processes
+    from services.extraction_executor import extraction_executor
+    extraction_executor.shutdown()
+
 
 @app.get("/")
 def read_root():
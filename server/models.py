@@ -108,3 +108,56 @@ class EvaluationDetail(Base):
     # Relationships
     evaluation_result = relationship("EvaluationResult", back_populates="details")
 
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True, index=True)  # UUID job id returned to the client
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False, index=True)
+    request_data = Column(Text, nullable=False)  # JSON string of the GenerateRequest
+    total_files = Column(Integer, nullable=False, default=0)
+    completed_files = Column(Integer, nullable=False, default=0)
+    progress_data = Column(Text, nullable=True)  # JSON string of per-file progress and partial scores
+    result_data = Column(Text, nullable=True)  # JSON string of the final generate response
+    error = Column(Text, nullable=True)
+    assignment_id = Column(Integer, nullable=True)  # Saved assignment (not a FK: history deletion must not fail)
+    worker_id = Column(String, nullable=True, index=True)  # Lease owner while RUNNING (host:pid:nonce)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Lease renewal; stale leases are reclaimed
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class EvaluationCheckpoint(Base):
+    __tablename__ = "evaluation_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey("generation_jobs.id"), nullable=False, index=True)
+    file_index = Column(Integer, nullable=False)  # Position of the file in the batch
+    file_id = Column(String, nullable=True)
+    question_index = Column(Integer, nullable=False)
+    unit_key = Column(String, nullable=False)  # Hash of question + answer, guards against changed extraction
+    detail_data = Column(Text, nullable=False)  # JSON string of the graded EvalDetail
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class UploadedFile(Base):
+    __tablename__ = "uploaded_files"
+
+    file_id = Column(String, primary_key=True, index=True)  # UUID returned by /files/upload
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    original_filename = Column(String, nullable=False)
+    stored_path = Column(String, nullable=False)  # Path of the stored upload (link to its blob)
+    file_size = Column(Integer, nullable=True)  # Size in bytes
+    sha256 = Column(String(64), nullable=True, index=True)  # Content hash (blob key)
+    extension = Column(String, nullable=True)  # Lower-case extension, e.g. '.pdf'
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
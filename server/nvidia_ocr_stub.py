@@ -0,0 +1,64 @@
+"""
+Local stand-in for the NVIDIA OCR endpoint, for exercising OCR without the real service.
+
+    python nvidia_ocr_stub.py --port 8765 [--fail-every 3] [--batch]
+
+then run the server with NVIDIA_OCR_URL=http://127.0.0.1:8765/ocr NVIDIA_OCR_API_KEY=stub.
+Every image is answered with its size and a running request number; --fail-every makes
+every Nth request return 503 to exercise retries, and --batch accepts {"images": [...]}.
+tests/test_nvidia_ocr_client.py runs the client's batching and retry paths against it.
+"""
+import argparse
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+counter = {"requests": 0}
+lock = threading.Lock()
+
+
+def make_handler(fail_every: int, batch: bool):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible in the log
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            with lock:
+                counter["requests"] += 1
+                n = counter["requests"]
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+            if fail_every and n % fail_every == 0:
+                return self._reply(503, {"error": "stub failure"})
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._reply(401, {"error": "missing bearer token"})
+
+            if "images" in payload:
+                if not batch:
+                    return self._reply(400, {"error": "batch payloads disabled"})
+                texts = [f"stub text {len(base64.b64decode(i))} bytes (request {n})" for i in payload["images"]]
+                return self._reply(200, {"results": [{"text": t} for t in texts]})
+            image = base64.b64decode(payload.get("image", ""))
+            return self._reply(200, {"text": f"stub text {len(image)} bytes (request {n})"})
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--batch", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.fail_every, args.batch))
+    print(f"NVIDIA OCR stub listening on http://127.0.0.1:{args.port}/ocr", flush=True)
+    server.serve_forever()
@@ -5,6 +5,12 @@ from auth import get_current_user
 from services.file_processor import FileProcessor
 from services.gemini_service import GeminiService
 from services.determinism_config import DeterministicEvalConfig, EvaluationCache
+from services.qa_extractor import LocalQAExtractor
+from services.llm_scheduler import llm_scheduler
+from services.extraction_executor import extraction_executor
+from services.upload_manifest import UploadManifest
+from services.lazy_imports import import_stats, process_rss_mb
+from database import get_db
 import re
 import asyncio
 from pathlib import Path
@@ -13,83 +19,23 @@ router = APIRouter(prefix="/debug", tags=["debug"])
 
 # Initialize file processor
 file_processor = FileProcessor()
-
-# Create uploads directory for temporary file storage
-UPLOAD_DIR = Path("uploads")
+local_extractor = LocalQAExtractor()
 
 @router.get("/extracted/{file_id}")
-def debug_extracted(file_id: str, current_user: User = Depends(get_current_user)):
+async def debug_extracted(file_id: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Return the extracted text and a quick QA hint for a given uploaded file id for debugging extraction issues."""
-    file_path = None
-    for saved_file in UPLOAD_DIR.glob(f"{file_id}.*"):
-        if saved_file.name == f"{file_id}.meta.json":
-            continue
-        file_path = saved_file
-        break
-
-    if not file_path or not file_path.exists():
+    upload = await asyncio.to_thread(UploadManifest.resolve, db, file_id)
+    file_path = await asyncio.to_thread(UploadManifest.local_path, upload)
+
+    if not file_path:
         raise HTTPException(status_code=404, detail=f"File with ID {file_id} not found")
 
-    file_data = file_processor.read_file(str(file_path))
+    file_data = await extraction_executor.read_file(str(file_path), upload.get('sha256'))
     content = file_data.get('content', '') or ''
 
-    # Quick QA extractor (same heuristics as the main batch pipeline)
-    def extract_qa_pairs_local(text: str):
-        qa = []
-        if not text or not isinstance(text, str):
-            return qa
-        lines = [l.rstrip() for l in text.splitlines()]
-        i = 0
-        question_re = re.compile(r"^\s*(?:Question\b[:\s]*|Q\d*[:\s]*|Q\d+\b|\d+\s*[\.)\-:])", flags=re.IGNORECASE)
-        answer_marker_re = re.compile(r"\bAnswer\b[:\s]*", flags=re.IGNORECASE)
-
-        while i < len(lines):
-            line = lines[i].strip()
-            if not line:
-                i += 1
-                continue
-            if '\t' in line:
-                cells = [c.strip() for c in line.split('\t')]
-                lc = [c.lower() for c in cells]
-                if any('question' in c for c in lc) or any('answer' in c for c in lc) or any('q' == c for c in lc):
-                    q = cells[0]
-                    a = cells[1] if len(cells) > 1 else ''
-                    qa.append({'question': q, 'answer': a})
-                    i += 1
-                    continue
-            if question_re.search(line) or '?' in line:
-                qtext = re.sub(r"^\s*(?:Question\b[:\s]*|Q\d*[:\s]*|\d+\s*[\.)\-:]\s*)", '', line, flags=re.IGNORECASE)
-                ans_lines = []
-                j = i + 1
-                while j < len(lines):
-                    l = lines[j].strip()
-                    if not l:
-                        j += 1
-                        if j < len(lines) and question_re.search(lines[j]):
-                            break
-                        continue
-                    if question_re.search(l):
-                        break
-                    if answer_marker_re.search(l):
-                        a = answer_marker_re.sub('', l).strip()
-                        if a:
-                            ans_lines.append(a)
-                        j += 1
-                        while j < len(lines) and not question_re.search(lines[j]):
-                            if lines[j].strip():
-                                ans_lines.append(lines[j].strip())
-                            j += 1
-                        break
-                    ans_lines.append(l)
-                    j += 1
-                answer = ' '.join(ans_lines).strip()
-                qa.append({'question': qtext.strip() or line, 'answer': answer or None})
-                i = j
-                continue
-            i += 1
-        return qa
-
-    qa_pairs = extract_qa_pairs_local(content)
+    # Quick QA extractor (same local extractor as the main batch pipeline)
+    local = local_extractor.extract(content)
+    qa_pairs = local['qa_pairs']
     has_questions = bool(qa_pairs) or bool(re.search(r"\bQ(?:uestion)?\s*\d+\b|\bQ\d+\b|\bQuestion:\b|\bName:\b|\bStudent:\b|\bCandidate:\b|^\d+\.\s", content, flags=re.IGNORECASE | re.MULTILINE))
 
     return {
@@ -98,6 +44,8 @@ def debug_extracted(file_id: str, current_user: User = Depends(get_current_user)
         'file_type': file_data.get('file_type'),
         'content': content,
         'qa_pairs': qa_pairs,
+        'qa_format': local['format'],
+        'qa_confidence': local['confidence'],
         'has_questions': has_questions
     }
 
@@ -197,6 +145,34 @@ def cache_stats(current_user: User = Depends(get_current_user)):
     }
 
 
+@router.get("/extraction-stats")
+def extraction_stats(current_user: User = Depends(get_current_user)):
+    """Get local QA extraction hit rates per document format (LLM extraction calls saved)"""
+    return {
+        "local_extraction_enabled": DeterministicEvalConfig.ENABLE_LOCAL_EXTRACTION,
+        "min_confidence": DeterministicEvalConfig.LOCAL_EXTRACTION_MIN_CONFIDENCE,
+        "statistics": LocalQAExtractor.get_stats()
+    }
+
+
+@router.get("/scheduler-stats")
+def scheduler_stats(current_user: User = Depends(get_current_user)):
+    """Get LLM scheduler in-flight and queued call counts"""
+    return llm_scheduler.get_stats()
+
+
+@router.get("/extraction-executor-stats")
+def extraction_executor_stats(current_user: User = Depends(get_current_user)):
+    """Get extraction process pool counters (completed, inline, timeouts, worker crashes, recycles) and per-format handler timings"""
+    return extraction_executor.get_stats()
+
+
+@router.get("/import-stats")
+def lazy_import_stats(current_user: User = Depends(get_current_user)):
+    """Which heavy libraries have been imported so far (and how long each took), plus current RSS"""
+    return {"modules": import_stats(), "rss_mb": process_rss_mb()}
+
+
 @router.post("/cache-clear")
 def cache_clear(current_user: User = Depends(get_current_user)):
     """Clear all cached evaluation results (ADMIN ONLY)"""
@@ -221,6 +197,8 @@ def get_determinism_config(current_user: User = Depends(get_current_user)):
         "VALIDATE_CONTENT_HASH": DeterministicEvalConfig.VALIDATE_CONTENT_HASH,
         "ENABLE_RESULT_CACHE": DeterministicEvalConfig.ENABLE_RESULT_CACHE,
         "CACHE_TTL_DAYS": DeterministicEvalConfig.CACHE_TTL_DAYS,
+        "ENABLE_LOCAL_EXTRACTION": DeterministicEvalConfig.ENABLE_LOCAL_EXTRACTION,
+        "LOCAL_EXTRACTION_MIN_CONFIDENCE": DeterministicEvalConfig.LOCAL_EXTRACTION_MIN_CONFIDENCE,
         "SCORE_PRECISION": DeterministicEvalConfig.SCORE_PRECISION,
         "ALLOWED_VARIANCE": DeterministicEvalConfig.ALLOWED_VARIANCE
     }
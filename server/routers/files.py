@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Header
+from fastapi.responses import StreamingResponse, Response
 from sqlalchemy.orm import Session
 from models import User
 from auth import get_current_user
-from schemas.schemas import GenerateRequest, GenerateResponse
+from schemas.schemas import GenerateRequest, GenerateResponse, ResumableUploadCreate
 import json
 import os
 import uuid
+import asyncio
 from pathlib import Path
-from database import get_db
+from database import get_db, SessionLocal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,14 +17,15 @@ logger = logging.getLogger(__name__)
 # Import services
 from services.file_processor import FileProcessor
 from services.generate_service_complete import GenerateServiceComplete
+from services.job_service import JobService
+from services.upload_service import UploadService
+from services.upload_manifest import UploadManifest
+from services.resumable_upload import ResumableUploadService
 
 # Initialize services
 file_processor = FileProcessor()
 generate_service = GenerateServiceComplete()
-
-# Create uploads directory for temporary file storage
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+job_service = JobService(generate_service)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
@@ -30,7 +33,8 @@ router = APIRouter(prefix="/files", tags=["files"])
 @router.post("/upload")
 async def upload_files(
     files: list[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Upload multiple files temporarily
@@ -50,36 +54,28 @@ async def upload_files(
             # Generate unique file ID
             file_id = str(uuid.uuid4())
             
-            # Validate file size (max 30MB per file)
-            file_content = await file.read()
-            if len(file_content) > 30 * 1024 * 1024:  # 30MB
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} exceeds 30MB limit"
-                )
-            
-            # Save file temporarily
-            file_extension = Path(file.filename).suffix
-            saved_filename = f"{file_id}{file_extension}"
-            file_path = UPLOAD_DIR / saved_filename
-            
-            with open(file_path, "wb") as buffer:
-                buffer.write(file_content)
-            # Save original filename metadata
-            try:
-                meta_path = UPLOAD_DIR / f"{file_id}.meta.json"
-                with open(meta_path, "w", encoding="utf-8") as m:
-                    json.dump({"original_filename": file.filename}, m)
-            except Exception:
-                pass
+            # Copy the spooled upload in chunks (size limit checked here, after the request body was
+            # received); identical content is stored once and shared through the blob store
+            stored = await UploadService.store_upload(file, file_id)
+            # Index the upload (original filename, size, hash) for O(1) file_id lookups
+            UploadManifest.record(db, file_id, file.filename, stored["key"], stored["size"], stored["sha256"], user_id=current_user.id)
             
             file_ids.append(file_id)
             saved_files[file_id] = {
                 "filename": file.filename,
-                "path": str(file_path),
-                "size": len(file_content)
+                "path": str(stored["path"]),
+                "size": stored["size"],
+                "sha256": stored["sha256"],
+                "deduplicated": stored["deduplicated"]
             }
         
+        db.commit()
+        
+        # Extract in the background while the user fills in the description
+        for file_id, file_info in saved_files.items():
+            generate_service.preextraction.schedule(file_id, file_info["path"], file_info["filename"], user_id=current_user.id,
+                                                    sha256=file_info["sha256"])
+        
         return {
             "success": True,
             "file_ids": file_ids,
@@ -89,20 +85,78 @@ async def upload_files(
     
     except HTTPException:
         # Clean up on error
-        for file_id, file_info in saved_files.items():
-            file_path = Path(file_info["path"])
-            if file_path.exists():
-                file_path.unlink()
+        # Stored blobs may be shared with other uploads; unreferenced ones are garbage-collected
+        db.rollback()
         raise
     except Exception as e:
         # Clean up on error
-        for file_id, file_info in saved_files.items():
-            file_path = Path(file_info["path"])
-            if file_path.exists():
-                file_path.unlink()
+        # Stored blobs may be shared with other uploads; unreferenced ones are garbage-collected
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error uploading files: {str(e)}")
 
 
+@router.post("/uploads")
+def create_resumable_upload(
+    request: ResumableUploadCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Start a resumable (tus-style) upload for one file.
+    Send chunks with PATCH /files/uploads/{upload_id} and an Upload-Offset header (chunks may be
+    sent in parallel and retried), then POST /files/uploads/{upload_id}/finalize to get a file_id.
+    """
+    return ResumableUploadService.create(current_user.id, request.filename, request.size, request.sha256)
+
+
+@router.patch("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    current_user: User = Depends(get_current_user)
+):
+    """Store the request body as the chunk starting at Upload-Offset"""
+    status = await ResumableUploadService.write_chunk(upload_id, current_user.id, upload_offset, request.stream())
+    return Response(status_code=204, headers={"Upload-Offset": str(status["offset"]), "Upload-Length": str(status["size"])})
+
+
+@router.head("/uploads/{upload_id}")
+def upload_offset_head(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Contiguous bytes received so far (where a sequential client should resume)"""
+    status = ResumableUploadService.status(upload_id, current_user.id)
+    return Response(status_code=200, headers={
+        "Upload-Offset": str(status["offset"]),
+        "Upload-Length": str(status["size"]),
+        "Cache-Control": "no-store"
+    })
+
+
+@router.get("/uploads/{upload_id}")
+def upload_status(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Received byte ranges, for clients that upload chunks in parallel"""
+    return ResumableUploadService.status(upload_id, current_user.id)
+
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Assemble and verify the chunks; the file gets a file_id and enters extraction only now"""
+    stored = await ResumableUploadService.finalize(db, upload_id, current_user.id)
+    generate_service.preextraction.schedule(stored["file_id"], stored["path"], stored["filename"], user_id=current_user.id,
+                                            sha256=stored["sha256"])
+    return {"success": True, **stored}
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_upload(upload_id: str, current_user: User = Depends(get_current_user)):
+    """Discard an unfinished upload and its chunks"""
+    ResumableUploadService.abort(upload_id, current_user.id)
+    return {"success": True}
+
+
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_content(
     request: GenerateRequest,
@@ -114,3 +168,138 @@ async def generate_content(
     Saves assignment and results to database
     """
     return await generate_service.generate_content(request, current_user, db)
+
+
+@router.post("/generate/stream")
+async def generate_content_stream(
+    request: GenerateRequest,
+    include_questions: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming variant of /files/generate (Server-Sent Events).
+    Emits a 'file_completed' event with each file's score as soon as it is graded
+    ('question_completed' events too when include_questions=true), then a final 'result' event.
+    """
+    generate_service.validate_request(request)
+    
+    queue: asyncio.Queue = asyncio.Queue()
+    streamed_events = {"batch_started", "file_completed"}
+    if include_questions:
+        streamed_events.add("question_completed")
+    
+    async def on_progress(event: str, payload: dict):
+        if event in streamed_events:
+            await queue.put((event, payload))
+    
+    async def run_generate():
+        try:
+            # Own session: the request-scoped one may be closed while the response streams
+            with SessionLocal() as db:
+                result = await generate_service.generate_content(request, current_user, db, progress_callback=on_progress)
+            await queue.put(("result", result))
+        except HTTPException as e:
+            await queue.put(("error", {"success": False, "error": e.detail}))
+        except Exception as e:
+            logger.error(f"Streaming generate failed: {e}")
+            await queue.put(("error", {"success": False, "error": str(e)}))
+        finally:
+            await queue.put(None)
+    
+    async def event_stream():
+        task = asyncio.create_task(run_generate())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                event, payload = item
+                yield f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+        finally:
+            # Client went away: stop grading
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/generate/jobs")
+async def submit_generate_job(
+    request: GenerateRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queue a generate batch in the background and return its job id immediately.
+    Poll /files/jobs/{job_id} for per-file progress and partial scores.
+    """
+    job = job_service.submit(db, request, current_user)
+    return {
+        "success": True,
+        "job_id": job.id,
+        "status": job.status.value,
+        "message": f"Queued evaluation of {job.total_files} file(s)"
+    }
+
+
+@router.get("/jobs/{job_id}")
+def get_generate_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get job status, per-file progress and partial scores"""
+    job = job_service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True, "job": JobService.to_dict(job)}
+
+
+@router.get("/jobs/{job_id}/result", response_model=GenerateResponse)
+def get_generate_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the final generate result of a completed job"""
+    job = job_service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    data = JobService.to_dict(job, include_result=True)
+    if data["result"] is None:
+        raise HTTPException(status_code=409, detail=f"Job is {data['status']}, no result available yet")
+    return data["result"]
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_generate_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cancel a queued or running job"""
+    job = job_service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_service.cancel(db, job):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status.value}")
+    return {"success": True, "job_id": job.id, "message": "Cancellation requested"}
+
+
+@router.post("/jobs/{job_id}/resume")
+def resume_generate_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Re-run only the missing or failed (file, question) units of a finished job"""
+    job = job_service.get_job(db, job_id, current_user)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_service.resume(db, job):
+        raise HTTPException(status_code=409, detail=f"Job is still {job.status.value}")
+    return {"success": True, "job_id": job.id, "status": job.status.value, "message": "Job re-queued; graded questions are reused"}
@@ -4,12 +4,40 @@ from typing import List, Optional
 from database import get_db
 from models import Assignment, User, EvaluationResult
 from auth import get_current_user
+from services.storage import get_storage
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/history", tags=["history"])
 
+
+def _report_response(result, render):
+    """
+    Serve an evaluation report; render() writes the PDF and returns its path. With object storage
+    the report is uploaded once per version of the result and then fetched directly from there.
+    """
+    from fastapi.responses import FileResponse, RedirectResponse
+    from pathlib import Path
+
+    filename = f"Report_{result.student_name}.pdf"
+    storage = get_storage()
+    if storage.supports_presigned_urls:
+        key = f"reports/{result.id}.pdf"
+        stored_at = storage.modified(key)
+        updated_at = result.updated_at.timestamp() if result.updated_at else None
+        if stored_at is None or updated_at is None or stored_at < updated_at:
+            storage.put_file(key, Path(render()))
+        return RedirectResponse(storage.presigned_url(key, filename), status_code=307)
+
+    path = render()
+
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type="application/pdf"
+    )
+
 @router.get("")
 @router.get("/")
 def get_history(
@@ -82,9 +110,7 @@ def download_assignment_file(
     Verifies that the file belongs to an assignment owned by the current user.
     """
     from models import AssignmentFile
-    from fastapi.responses import FileResponse
-    import os
-    from pathlib import Path
+    from fastapi.responses import FileResponse, RedirectResponse
 
     # Security check: Ensure the file belongs to the user via Assignment link
     file_record = db.query(AssignmentFile).join(Assignment).filter(
@@ -95,19 +121,17 @@ def download_assignment_file(
     if not file_record:
         raise HTTPException(status_code=404, detail="File record not found or access denied")
 
-    # Find the physical file in uploads directory
-    UPLOAD_DIR = Path("uploads")
-    # File could have any extension (.pdf, .docx, .txt, etc)
-    matching_files = list(UPLOAD_DIR.glob(f"{file_id}.*"))
-    
-    # Filter out .meta.json files
-    target_file = None
-    for f in matching_files:
-        if f.suffix != ".json":
-            target_file = f
-            break
-            
-    if not target_file or not target_file.exists():
+    # Find the stored file via the upload manifest
+    from services.upload_manifest import UploadManifest
+    upload = UploadManifest.resolve(db, file_id)
+    storage = get_storage()
+
+    # Object storage: let the client download straight from the bucket
+    if upload and storage.supports_presigned_urls and storage.exists(upload['key']):
+        return RedirectResponse(storage.presigned_url(upload['key'], file_record.original_filename), status_code=307)
+
+    target_file = UploadManifest.local_path(upload)
+    if not target_file:
         raise HTTPException(status_code=404, detail="Physical file not found on server")
 
     return FileResponse(
@@ -127,7 +151,6 @@ def download_evaluation_report(
     """
     from services.report_service import ReportService
     from models import EvaluationDetail, EvaluationResult, Assignment
-    from fastapi.responses import FileResponse
     
     result = db.query(EvaluationResult).filter(EvaluationResult.id == evaluation_result_id).first()
     if not result:
@@ -142,13 +165,7 @@ def download_evaluation_report(
     
     try:
         report_service = ReportService()
-        path = report_service.generate_pdf_report(result, details)
-        
-        return FileResponse(
-            path=path,
-            filename=f"Report_{result.student_name}.pdf",
-            media_type="application/pdf"
-        )
+        return _report_response(result, lambda: report_service.generate_pdf_report(result, details))
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
@@ -254,7 +271,6 @@ def download_evaluation_report(
     """
     from services.report_service import ReportService
     from models import EvaluationDetail, EvaluationResult, Assignment  # Ensure imports
-    from fastapi.responses import FileResponse
     
     result = db.query(EvaluationResult).filter(EvaluationResult.id == evaluation_result_id).first()
     if not result:
@@ -268,12 +284,6 @@ def download_evaluation_report(
     details = db.query(EvaluationDetail).filter(EvaluationDetail.evaluation_result_id == result.id).order_by(EvaluationDetail.order_index).all()
     
     report_service = ReportService()
-    path = report_service.generate_pdf_report(result, details)
-    
-    return FileResponse(
-        path=path,
-        filename=f"Report_{result.student_name}.pdf",
-        media_type="application/pdf"
-    )
+    return _report_response(result, lambda: report_service.generate_pdf_report(result, details))
 
 
@@ -5,12 +5,17 @@ from auth import get_current_user
 from schemas.schemas import ReEvaluateRequest, ReEvaluateResponse
 from database import get_db
 import json
+import asyncio
 import logging
 from pathlib import Path
+from typing import Optional, Tuple
 from services.re_evaluator import ReEvaluator
 from services.gemini_service import GeminiService
 from services.ppt_evaluator import PPTEvaluator
 from services.ppt_design_evaluator import PPTDesignEvaluator
+from services.llm_scheduler import schedule_context, PRIORITY_INTERACTIVE
+from services.upload_manifest import UploadManifest
+from services.storage import get_storage
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +26,47 @@ ppt_design_evaluator = PPTDesignEvaluator(gemini_service)
 ppt_evaluator = PPTEvaluator(gemini_service)
 re_evaluator = ReEvaluator(gemini_service, ppt_evaluator, ppt_design_evaluator)
 
-# Create uploads directory for temporary file storage
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 router = APIRouter(prefix="/reevaluate", tags=["reevaluate"])
 
+# Text restored from the database for uploads that were cleaned up; expired by CleanupService
+RESTORED_PREFIX = "restored/"
+
+
+def _locate_file(db: Session, file_id: str) -> Tuple[Optional[Path], Optional[str]]:
+    """(local path, original filename) of an upload, restored from its stored extracted text if the upload is gone"""
+    file_path = None
+    original_filename = None
+
+    # Indexed manifest lookup
+    upload = UploadManifest.resolve(db, file_id)
+    if upload:
+        original_filename = upload['original_filename']
+        file_path = UploadManifest.local_path(upload)
+
+    if not file_path or not file_path.exists():
+        # Attempt to restore from database
+        assignment_file = db.query(AssignmentFile).filter(AssignmentFile.file_id == file_id).first()
+        if assignment_file and assignment_file.extracted_text:
+            # Determine extension
+            ext = ".txt" # Default to text for safety since we only have extracted text
+            if assignment_file.original_filename:
+                orig_ext = Path(assignment_file.original_filename).suffix.lower()
+                # Only preserve extension if it's code/text, otherwise valid text extracted from PDF/PPT should be .txt
+                if orig_ext in ['.py', '.js', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.ts', '.html', '.css', '.sql', '.txt', '.md', '.json', '.xml', '.yaml']:
+                    ext = orig_ext
+
+            restore_key = f"{RESTORED_PREFIX}{file_id}{ext}"
+            try:
+                storage = get_storage()
+                if not storage.exists(restore_key):
+                    logger.info(f"Restoring missing file {file_id} from DB as {restore_key}")
+                    storage.put_bytes(restore_key, assignment_file.extracted_text.encode("utf-8"))
+                file_path = storage.local_path(restore_key)
+            except Exception as e:
+                logger.error(f"Failed to restore file from DB: {e}")
+
+    return file_path, original_filename
+
 
 @router.post("", response_model=ReEvaluateResponse)
 async def reevaluate_single_file(
@@ -50,48 +90,8 @@ async def reevaluate_single_file(
         raise HTTPException(status_code=400, detail="File ID is required")
     
     try:
-        # Find the file
-        file_path = None
-        original_filename = None
-        
-        # Try to get original filename from metadata
-        try:
-            meta_path = UPLOAD_DIR / f"{file_id}.meta.json"
-            if meta_path.exists():
-                with open(meta_path, "r", encoding="utf-8") as m:
-                    md = json.load(m)
-                    if isinstance(md, dict):
-                        original_filename = md.get("original_filename")
-        except Exception:
-            pass
-        
-        # Find the actual file
-        for saved_file in UPLOAD_DIR.glob(f"{file_id}.*"):
-            if saved_file.name == f"{file_id}.meta.json":
-                continue
-            file_path = saved_file
-            break
-        
-        if not file_path or not file_path.exists():
-            # Attempt to restore from database
-            assignment_file = db.query(AssignmentFile).filter(AssignmentFile.file_id == file_id).first()
-            if assignment_file and assignment_file.extracted_text:
-                # Determine extension
-                ext = ".txt" # Default to text for safety since we only have extracted text
-                if assignment_file.original_filename:
-                    orig_ext = Path(assignment_file.original_filename).suffix.lower()
-                    # Only preserve extension if it's code/text, otherwise valid text extracted from PDF/PPT should be .txt
-                    if orig_ext in ['.py', '.js', '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.ts', '.html', '.css', '.sql', '.txt', '.md', '.json', '.xml', '.yaml']:
-                        ext = orig_ext
-                
-                restore_path = UPLOAD_DIR / f"{file_id}{ext}"
-                try:
-                    logger.info(f"Restoring missing file {file_id} from DB as {restore_path.name}")
-                    with open(restore_path, "w", encoding="utf-8") as f:
-                        f.write(assignment_file.extracted_text)
-                    file_path = restore_path
-                except Exception as e:
-                    logger.error(f"Failed to restore file from DB: {e}")
+        # Manifest query and storage calls block (S3 round trips), so they run off the event loop
+        file_path, original_filename = await asyncio.to_thread(_locate_file, db, file_id)
 
         if not file_path or not file_path.exists():
             return ReEvaluateResponse(
@@ -105,14 +105,17 @@ async def reevaluate_single_file(
         
         # Perform Re-evaluation
         # This will call the LLM and return a fresh score
-        result = await re_evaluator.re_evaluate_file(
-            file_path=str(file_path),
-            title=request.title,
-            description=request.description,
-            file_id=file_id,
-            db=db,
-            current_user=current_user
-        )
+        # Interactive priority: stays responsive while bulk grading runs
+        with schedule_context(user_id=current_user.id, batch_id=f"reevaluate:{file_id}", priority=PRIORITY_INTERACTIVE):
+            result = await re_evaluator.re_evaluate_file(
+                file_path=str(file_path),
+                title=request.title,
+                description=request.description,
+                file_id=file_id,
+                db=db,
+                current_user=current_user,
+                incremental=bool(request.incremental_regrade)
+            )
         
         return ReEvaluateResponse(
             success=result.get("success", False),
@@ -36,6 +36,13 @@ class GenerateRequest(BaseModel):
     file_ids: List[str]
     github_url: Optional[str] = None
     evaluate_design: Optional[bool] = False  # If True, evaluate visual design instead of content
+    incremental_regrade: Optional[bool] = False  # If True, reuse grades whose rubric section is unchanged
+
+
+class ResumableUploadCreate(BaseModel):
+    filename: str
+    size: int  # Total bytes of the file
+    sha256: Optional[str] = None  # If given, verified on finalize
 
 
 class GenerateResponse(BaseModel):
@@ -74,6 +81,7 @@ class ReEvaluateRequest(BaseModel):
     file_id: str
     title: str
     description: str
+    incremental_regrade: Optional[bool] = False  # If True, reuse grades whose rubric section is unchanged
 
 
 class ReEvaluateResponse(BaseModel):
@@ -0,0 +1,99 @@
+"""
+Blob Store
+Content-addressed storage for uploads: each distinct file is stored once under the storage
+key blobs/ab/cd/<sha256><ext>, and every file_id's manifest row points at its blob, so the
+number of manifest rows is the blob's reference count.
+"""
+import time
+import logging
+from pathlib import Path
+from typing import Optional
+from sqlalchemy.orm import Session
+
+from models import UploadedFile
+from .storage import get_storage, staging_path, STAGING_DIR
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "blobs/"
+
+# Unreferenced blobs (and abandoned staging files) younger than this are kept
+BLOB_GC_GRACE_SECONDS = 24 * 3600
+
+
+class BlobStore:
+    """Hash-sharded blobs in the configured storage backend, reference-counted by the upload manifest"""
+
+    @staticmethod
+    def blob_key(sha256: str, extension: str = "") -> str:
+        # The extension stays on the key so extractors can dispatch on the local copy's suffix
+        return f"{BLOB_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}{extension.lower()}"
+
+    @staticmethod
+    def temp_path(name: str) -> Path:
+        """Local staging path for an upload being written"""
+        return staging_path(name)
+
+    @staticmethod
+    def commit(temp_path: Path, sha256: str, extension: str = "") -> tuple:
+        """
+        Move a fully written temp file into the store. If the blob already exists the temp
+        file is dropped and the blob's modified time refreshed, so garbage collection treats
+        it as new until the caller's manifest row references it. Returns (blob key, deduplicated).
+        """
+        storage = get_storage()
+        key = BlobStore.blob_key(sha256, extension)
+        if storage.exists(key):
+            try:
+                storage.touch(key)
+            except FileNotFoundError:
+                # Collected between the two calls: store this copy instead
+                storage.put_file(key, temp_path)
+                return key, False
+            temp_path.unlink(missing_ok=True)
+            return key, True
+        storage.put_file(key, temp_path)
+        return key, False
+
+    @staticmethod
+    def refcount(db: Session, key: str) -> int:
+        """Number of uploads referencing a blob"""
+        return db.query(UploadedFile).filter(UploadedFile.stored_path == key).count()
+
+    @staticmethod
+    def find(sha256: str, extension: str = "") -> Optional[str]:
+        key = BlobStore.blob_key(sha256, extension)
+        return key if get_storage().exists(key) else None
+
+    @staticmethod
+    def collect_garbage(db: Session, grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+        """Delete blobs no manifest row references any more, plus abandoned staging files. Returns count removed."""
+        storage = get_storage()
+        cutoff = time.time() - grace_seconds
+        referenced = {
+            row.stored_path for row in
+            db.query(UploadedFile.stored_path).filter(UploadedFile.stored_path.like(f"{BLOB_PREFIX}%"))
+        }
+        removed = 0
+        for key, _, modified in list(storage.iter_keys(BLOB_PREFIX)):
+            if modified < cutoff and key not in referenced:
+                # The listing may be stale: an upload can have deduplicated onto (touched) this blob
+                # since, and its manifest row is committed only when the upload batch finishes
+                current = storage.modified(key)
+                if current is None or current >= cutoff or BlobStore.refcount(db, key) > 0:
+                    continue
+                try:
+                    storage.delete(key)
+                    removed += 1
+                except Exception as e:
+                    logger.warning(f"Could not delete blob {key}: {e}")
+
+        if STAGING_DIR.exists():
+            for path in STAGING_DIR.iterdir():
+                try:
+                    if path.is_file() and path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
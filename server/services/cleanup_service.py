@@ -4,7 +4,13 @@ import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from sqlalchemy.orm import Session
-from models import Assignment, AssignmentFile
+from models import Assignment, AssignmentFile, GenerationJob, EvaluationCheckpoint, JobStatus, UploadedFile
+from services.blob_store import BlobStore
+from services.storage import get_storage, UPLOAD_DIR
+from services.resumable_upload import ResumableUploadService
+from services.preextraction_service import PreExtractionService
+from services.file_processor import FileProcessor
+from services.upload_manifest import UploadManifest
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +24,67 @@ class CleanupService:
             cutoff_date = datetime.now() - timedelta(days=days)
             logger.info(f"Starting database and file cleanup. Cutoff: {cutoff_date}")
 
+            # Finished generation jobs and their question checkpoints
+            old_job_ids = [j.id for j in db.query(GenerationJob.id).filter(
+                GenerationJob.updated_at < cutoff_date,
+                GenerationJob.status.notin_([JobStatus.QUEUED, JobStatus.RUNNING])
+            ).all()]
+            if old_job_ids:
+                db.query(EvaluationCheckpoint).filter(EvaluationCheckpoint.job_id.in_(old_job_ids)).delete(synchronize_session=False)
+                db.query(GenerationJob).filter(GenerationJob.id.in_(old_job_ids)).delete(synchronize_session=False)
+                db.commit()
+                logger.info(f"Cleaned up {len(old_job_ids)} finished generation jobs.")
+
+            # Uploads from before the manifest existed get their rows (then they expire like the rest)
+            try:
+                UploadManifest.backfill_legacy(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Legacy upload backfill failed: {e}")
+
+            # Expired uploads: dropping the manifest row releases the blob reference
+            expired = db.query(UploadedFile.file_id, UploadedFile.sha256).filter(UploadedFile.created_at < cutoff_date).all()
+            expired_ids = [u.file_id for u in expired]
+            if expired_ids:
+                db.query(UploadedFile).filter(UploadedFile.file_id.in_(expired_ids)).delete(synchronize_session=False)
+                db.commit()
+                # Their pre-extracted text goes with them
+                for file_id in expired_ids:
+                    PreExtractionService.discard(file_id)
+                # Cached extractions too, unless a newer upload of the same content still uses them
+                for sha256 in {u.sha256 for u in expired if u.sha256}:
+                    if not db.query(UploadedFile.file_id).filter(UploadedFile.sha256 == sha256).first():
+                        FileProcessor.discard_cached_text(sha256)
+                logger.info(f"Removed {len(expired_ids)} expired upload manifest entries.")
+            FileProcessor.purge_cached_text(days * 24 * 3600)
+            # Artifacts of uploads removed some other way
+            purged_artifacts = PreExtractionService.purge_expired(days * 24 * 3600)
+            if purged_artifacts:
+                logger.info(f"Purged {purged_artifacts} expired pre-extraction artifacts.")
+
+            # Resumable uploads that were never finalized
+            stale_sessions = ResumableUploadService.cleanup_stale()
+            if stale_sessions:
+                logger.info(f"Removed {stale_sessions} abandoned resumable uploads.")
+
+            # Upload blobs no manifest entry references any more
+            removed_blobs = BlobStore.collect_garbage(db)
+            if removed_blobs:
+                logger.info(f"Removed {removed_blobs} unreferenced upload blobs.")
+
+            # Reports stored for direct download (object storage backends only) and files
+            # re-evaluation restored from their extracted text
+            storage = get_storage()
+            for prefix in ("reports/", "restored/"):
+                for key, _, modified in list(storage.iter_keys(prefix)):
+                    if modified < cutoff_date.timestamp():
+                        storage.delete(key)
+
+            # Local copies of remote objects (object storage backends only)
+            pruned_cache = storage.prune_cache(days * 24 * 3600)
+            if pruned_cache:
+                logger.info(f"Pruned {pruned_cache} cached storage objects.")
+
             # 1. Find assignments older than the cutoff
             old_assignments = db.query(Assignment).filter(Assignment.created_at < cutoff_date).all()
             
@@ -62,7 +129,7 @@ class CleanupService:
     def _cleanup_orphaned_files(days: int):
         """Clean up any files in uploads/ that are older than 'days' but not in DB."""
         try:
-            upload_dir = Path("uploads")
+            upload_dir = UPLOAD_DIR
             if not upload_dir.exists():
                 return
 
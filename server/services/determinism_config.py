@@ -2,9 +2,11 @@
 Determinism Configuration & Evaluation Caching
 Ensures reproducible, consistent evaluation results across multiple sessions
 """
+import glob
 import hashlib
 import json
 import logging
+import time
 from pathlib import Path
 from typing import Dict, Optional, Any
 from datetime import datetime
@@ -33,6 +35,15 @@ class DeterministicEvalConfig:
     ENABLE_RESULT_CACHE = True
     CACHE_TTL_DAYS = 365  # Cache results for 1 year (essentially permanent for university)
     
+    # Local QA extraction (skips the LLM extractor for clearly structured documents)
+    ENABLE_LOCAL_EXTRACTION = True
+    LOCAL_EXTRACTION_MIN_CONFIDENCE = 0.85
+    
+    # Chunked LLM extraction for long documents (each chunk cached on its own)
+    QA_EXTRACTION_CHUNK_CHARS = 12000
+    QA_EXTRACTION_CHUNK_OVERLAP = 800
+    QA_EXTRACTION_MAX_PARALLEL_CHUNKS = 4
+    
     # Scoring precision
     SCORE_PRECISION = 2  # Round to 2 decimal places
     ALLOWED_VARIANCE = 2.0  # Allow ±2% variance for edge cases
@@ -126,6 +137,48 @@ class EvaluationCache:
             logger.error(f"Error writing cache: {e}")
             return False
     
+    @staticmethod
+    def delete(content_hash: str, eval_type: str = "qa") -> bool:
+        """Remove one cached entry. Returns True if it existed."""
+        cache_file = EVALUATION_CACHE_DIR / eval_type / f"{content_hash}.json"
+        try:
+            cache_file.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.error(f"Error deleting cache entry: {e}")
+            return False
+
+    @staticmethod
+    def delete_prefix(prefix: str, eval_type: str = "qa") -> int:
+        """Remove every entry of one type whose hash starts with prefix. Returns count removed."""
+        count = 0
+        for cache_file in (EVALUATION_CACHE_DIR / eval_type).glob(f"{glob.escape(prefix)}*.json"):
+            try:
+                cache_file.unlink()
+                count += 1
+            except OSError:
+                continue
+        return count
+
+    @staticmethod
+    def purge_older_than(eval_type: str, max_age_seconds: float) -> int:
+        """Remove entries of one type last written more than max_age_seconds ago. Returns count removed."""
+        cache_subdir = EVALUATION_CACHE_DIR / eval_type
+        if not cache_subdir.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        count = 0
+        for cache_file in cache_subdir.glob('*.json'):
+            try:
+                if cache_file.stat().st_mtime < cutoff:
+                    cache_file.unlink()
+                    count += 1
+            except OSError:
+                continue
+        return count
+
     @staticmethod
     def clear_all() -> int:
         """Clear all cached evaluations (for admin/testing)"""
@@ -0,0 +1,201 @@
+"""
+DOCX Extractor
+Single-pass .docx reader: opens the package once and streams word/document.xml through an
+iterative XML parser, collecting paragraphs and tables (in document order), header/footer
+references and embedded image references in the same traversal. Embedded images are OCR'd
+from the same zip handle, and only when the document yields little text.
+"""
+import os
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Below this many extracted characters, embedded images are OCR'd (scanned pages pasted into Word)
+DOCX_OCR_MIN_TEXT_CHARS = int(os.getenv('DOCX_OCR_MIN_TEXT_CHARS', '50'))
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+MEDIA_PREFIX = "word/media/"
+# Image types the OCR engine can decode (EMF/WMF vector images are skipped)
+OCR_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff'}
+
+# OCR callback: encoded image bytes -> text per image (None if unreadable)
+OcrImages = Callable[[Sequence[bytes]], List[Optional[str]]]
+
+
+def _local(tag: str) -> str:
+    """Tag or attribute name without its namespace (also covers Strict OOXML namespaces)"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _rel_id(elem, name: str) -> Optional[str]:
+    """r:<name> attribute (relationships namespace) of an element"""
+    for key, value in elem.attrib.items():
+        if key.endswith('}' + name) and 'relationships' in key:
+            return value
+    return None
+
+
+class DocxExtractor:
+    """Streams a .docx package once; no python-docx object model is built"""
+
+    @staticmethod
+    def _relationships(archive: zipfile.ZipFile, rels_part: str = DOCUMENT_RELS) -> Dict[str, str]:
+        """Relationship id -> part name inside the package"""
+        try:
+            data = archive.read(rels_part)
+        except KeyError:
+            return {}
+        base = posixpath.dirname(posixpath.dirname(rels_part))
+        targets = {}
+        for rel in ET.fromstring(data):
+            if rel.get('TargetMode') == 'External' or not rel.get('Id') or not rel.get('Target'):
+                continue
+            target = rel.get('Target')
+            targets[rel.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base, target))
+        return targets
+
+    @staticmethod
+    def _stream_part(archive: zipfile.ZipFile, part: str) -> Dict:
+        """
+        One iterparse pass over a part (document body, header or footer).
+        Returns {"blocks": paragraph texts and "Table:" blocks in order, "sections": [(header id, footer id)],
+        "images": relationship ids of embedded images}.
+        """
+        blocks: List[str] = []
+        sections: List[tuple] = []
+        images: List[str] = []
+
+        stack: List[str] = []          # local tag names of open elements
+        elements: List = []            # the open elements themselves (to drop finished blocks)
+        paragraph_buffers: List[List[str]] = []
+        table_depth = 0
+        rows: List[str] = []
+        cells: List[str] = []
+        cell_paragraphs: List[str] = []
+        section_refs: Dict[str, str] = {}
+
+        # Containers whose finished children can be dropped from the tree
+        block_parents = {'body', 'hdr', 'ftr'}
+
+        with archive.open(part) as stream:
+            for event, elem in ET.iterparse(stream, events=('start', 'end')):
+                tag = _local(elem.tag)
+                if event == 'start':
+                    stack.append(tag)
+                    elements.append(elem)
+                    if tag == 'p':
+                        paragraph_buffers.append([])
+                    elif tag == 'tbl':
+                        table_depth += 1
+                        if table_depth == 1:
+                            rows = []
+                    elif tag == 'tr' and table_depth == 1:
+                        cells = []
+                    elif tag == 'tc' and table_depth == 1:
+                        cell_paragraphs = []
+                    elif tag == 'sectPr':
+                        section_refs = {}
+                    continue
+
+                stack.pop()
+                elements.pop()
+                parent = stack[-1] if stack else None
+
+                if tag == 't' and paragraph_buffers:
+                    paragraph_buffers[-1].append(elem.text or '')
+                elif tag == 'tab' and parent == 'r' and paragraph_buffers:
+                    paragraph_buffers[-1].append('\t')
+                elif tag in ('br', 'cr') and parent == 'r' and paragraph_buffers:
+                    paragraph_buffers[-1].append('\n')
+                elif tag == 'noBreakHyphen' and paragraph_buffers:
+                    paragraph_buffers[-1].append('-')
+                elif tag == 'p':
+                    text = ''.join(paragraph_buffers.pop()).rstrip()
+                    # Paragraphs inside another paragraph are textbox content (skipped, as before);
+                    # content controls (w:sdt) are unwrapped
+                    if paragraph_buffers:
+                        pass
+                    elif table_depth == 0:
+                        if text:
+                            blocks.append(text)
+                    elif table_depth == 1:
+                        cell_paragraphs.append(text)
+                elif tag == 'tc' and table_depth == 1:
+                    cells.append('\n'.join(cell_paragraphs).rstrip())
+                elif tag == 'tr' and table_depth == 1:
+                    rows.append('\t'.join(cells))
+                elif tag == 'tbl':
+                    table_depth -= 1
+                    if table_depth == 0 and rows and not paragraph_buffers:
+                        blocks.append("Table:\n" + "\n".join(rows))
+                elif tag == 'blip':
+                    rel = _rel_id(elem, 'embed')
+                    if rel:
+                        images.append(rel)
+                elif tag == 'imagedata':
+                    rel = _rel_id(elem, 'id')
+                    if rel:
+                        images.append(rel)
+                elif tag in ('headerReference', 'footerReference'):
+                    ref_type = next((v for k, v in elem.attrib.items() if _local(k) == 'type'), 'default')
+                    rel = _rel_id(elem, 'id')
+                    if ref_type == 'default' and rel:
+                        section_refs[tag] = rel
+                elif tag == 'sectPr':
+                    sections.append((section_refs.get('headerReference'), section_refs.get('footerReference')))
+
+                # Finished top-level blocks are not needed any more: keep memory flat on long documents
+                if parent in block_parents and elements:
+                    elements[-1].remove(elem)
+
+        return {"blocks": blocks, "sections": sections, "images": images}
+
+    @staticmethod
+    def read(file_path: str, ocr_images: Optional[OcrImages] = None,
+             min_text_chars: int = DOCX_OCR_MIN_TEXT_CHARS) -> str:
+        """
+        Text of a .docx: body paragraphs and tables in document order, then "Header: " / "Footer: "
+        lines per section. When the text is shorter than min_text_chars, embedded images are OCR'd
+        with ocr_images and their text appended. Raises on a damaged package.
+        """
+        with zipfile.ZipFile(file_path) as archive:
+            rels = DocxExtractor._relationships(archive)
+            body = DocxExtractor._stream_part(archive, DOCUMENT_PART)
+            parts = list(body["blocks"])
+
+            # Headers and footers; sections that share a part contribute it once
+            seen = set()
+            for header_id, footer_id in body["sections"]:
+                for rel_id, label in ((header_id, "Header: "), (footer_id, "Footer: ")):
+                    part = rels.get(rel_id)
+                    if not part or part in seen or part not in archive.NameToInfo:
+                        continue
+                    seen.add(part)
+                    try:
+                        lines = DocxExtractor._stream_part(archive, part)["blocks"]
+                    except ET.ParseError:
+                        continue
+                    parts.extend(label + line.strip() for line in lines if line.strip())
+
+            extracted = "\n\n".join(parts).strip()
+            if len(extracted) >= min_text_chars or ocr_images is None:
+                return extracted
+
+            media = [rels[r] for r in dict.fromkeys(body["images"]) if r in rels]
+            ocr_text = DocxExtractor._ocr_media(archive, media, ocr_images)
+        if ocr_text:
+            return f"{extracted}\n\n{ocr_text}" if extracted else ocr_text
+        return extracted
+
+    @staticmethod
+    def _ocr_media(archive: zipfile.ZipFile, media: List[str], ocr_images: OcrImages) -> Optional[str]:
+        """OCR images from an open package; all of word/media when no references are given"""
+        if not media:
+            media = [name for name in archive.namelist() if name.startswith(MEDIA_PREFIX)]
+        media = [name for name in media if posixpath.splitext(name)[1].lower() in OCR_IMAGE_EXTENSIONS and name in archive.NameToInfo]
+        if not media:
+            return None
+        texts = [t.strip() for t in ocr_images([archive.read(name) for name in media]) if t and t.strip()]
+        return '\n\n'.join(texts) if texts else None
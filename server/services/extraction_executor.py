@@ -0,0 +1,214 @@
+"""
+Extraction Executor
+Runs FileProcessor extraction (pdfplumber, pandas, DOCX, OCR) in a process pool so
+parsing uses every available core and never blocks the event loop. Each task has a timeout;
+a hung worker's pool is replaced and drained rather than killed under the other extractions.
+Formats whose handler is cheap (plain text, CSV) are read on a thread instead of paying the
+process round trip.
+"""
+import os
+import asyncio
+import logging
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Set
+
+from .file_processor import FileProcessor
+from .format_registry import format_registry, COST_CHEAP
+
+logger = logging.getLogger(__name__)
+
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: affinity mask, capped by a cgroup v2 CPU quota (containers)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) // int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+# Worker processes (defaults to one per available CPU)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or available_cpus()
+# Seconds a single file may take before its worker is abandoned
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "300"))
+# Opt-in address-space limit per worker in MB (0 = off). RLIMIT_AS counts reserved virtual memory
+# (BLAS and malloc arenas reserve far more than they use), so set it well above the expected RSS.
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", "0"))
+# Files a worker extracts before it is replaced (returns memory leaked by native parsers)
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", "50"))
+
+
+def _mp_context():
+    """forkserver (or spawn): forking the threaded event-loop process can deadlock the child on inherited locks"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _limit_ocr_threads():
+    """One OpenMP thread per tesseract process; parallelism comes from the OCR pools instead"""
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _init_worker(memory_limit_mb: int):
+    """Process pool initializer: OCR threading limit and optional address-space cap"""
+    _limit_ocr_threads()
+    if memory_limit_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logging.getLogger(__name__).warning(f"Could not set extraction memory limit: {e}")
+
+
+def _extract(file_path: str, detected: Optional[str], sha256: Optional[str] = None) -> Dict:
+    return FileProcessor.read_file(file_path, detected, sha256)
+
+
+def _error_result(file_path: str, message: str) -> Dict:
+    """Same shape FileProcessor.read_file returns when a file cannot be read"""
+    path = Path(file_path)
+    return {
+        'filename': path.name,
+        'content': f"[Error reading file: {message}]",
+        'file_type': 'error',
+        'extension': path.suffix.lower()
+    }
+
+
+class ExtractionExecutor:
+    """Async front-end to a process pool running FileProcessor.read_file"""
+
+    def __init__(self, workers: int = EXTRACTION_WORKERS, timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+                 memory_limit_mb: int = EXTRACTION_MEMORY_LIMIT_MB):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._generation = 0
+        # In-flight futures of the current pool, so a retired pool can drain before it is torn down
+        self._in_flight: Set[asyncio.Future] = set()
+        self._stats = {"completed": 0, "inline": 0, "timeouts": 0, "crashes": 0, "recycles": 0}
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self._pool is None:
+            try:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_mp_context(),
+                    initializer=_init_worker,
+                    initargs=(self.memory_limit_mb,),
+                    max_tasks_per_child=EXTRACTION_MAX_TASKS_PER_CHILD or None,
+                )
+                self._generation += 1
+                self._in_flight = set()
+            except (OSError, NotImplementedError) as e:
+                # No multiprocessing support on this host: fall back to the default thread pool
+                logger.warning(f"Process pool unavailable ({e}); extracting in threads.")
+                _limit_ocr_threads()
+                return None
+        return self._pool
+
+    def _recycle(self, generation: int, hung: bool = False):
+        """
+        Swap in a fresh pool for new work. The old one keeps running its other extractions;
+        when a worker is hung it is terminated only after those have drained (or timed out).
+        """
+        if self._pool is None or generation != self._generation:
+            return
+        pool, in_flight = self._pool, self._in_flight
+        self._pool, self._in_flight = None, set()
+        self._stats["recycles"] += 1
+        if hung:
+            asyncio.get_running_loop().create_task(self._drain(pool, in_flight))
+        else:
+            # Broken pool: its workers are gone already
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _drain(self, pool: ProcessPoolExecutor, in_flight: Set[asyncio.Future]):
+        others = [f for f in in_flight if not f.done()]
+        if others:
+            await asyncio.wait(others, timeout=self.timeout)
+        # A hung worker never returns; ProcessPoolExecutor has no public way to stop one
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def read_file(self, file_path: str, sha256: Optional[str] = None) -> Dict:
+        """
+        Extract a file off the event loop. Timeouts and worker crashes become error results.
+        sha256 (from the upload manifest) spares the worker hashing the file for the extraction cache.
+        """
+        # Sniffed once here; the worker reuses the result instead of reading the file's header again
+        detected = format_registry.sniff(file_path)
+        if format_registry.cost_class(file_path, detected) == COST_CHEAP:
+            result = await asyncio.to_thread(_extract, file_path, detected, sha256)
+            self._stats["inline"] += 1
+            return result
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._get_pool()
+            generation = self._generation
+            future = loop.run_in_executor(pool, _extract, file_path, detected, sha256)
+            if pool is not None:
+                in_flight = self._in_flight
+                in_flight.add(future)
+                future.add_done_callback(in_flight.discard)
+            try:
+                result = await asyncio.wait_for(future, timeout=self.timeout)
+                self._stats["completed"] += 1
+                if pool is not None:
+                    self._record_handler(result)
+                return result
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+                logger.error(f"Extraction of {Path(file_path).name} timed out after {self.timeout}s; replacing the worker pool.")
+                self._recycle(generation, hung=True)
+                return _error_result(file_path, f"extraction timed out after {int(self.timeout)}s")
+            except BrokenProcessPool:
+                # Worker died (memory limit, segfault in a native parser); retry once on a fresh pool
+                self._stats["crashes"] += 1
+                self._recycle(generation)
+                if attempt == 0:
+                    continue
+                logger.error(f"Extraction worker crashed on {Path(file_path).name}.")
+                return _error_result(file_path, "extraction worker crashed (file too large or corrupt)")
+        return _error_result(file_path, "extraction failed")
+
+    @staticmethod
+    def _record_handler(result: Dict):
+        """Handler timings measured in a worker process are aggregated here, in the parent"""
+        metadata = result.get('metadata') or {}
+        if metadata.get('handler') and not metadata.get('cached'):
+            format_registry.record(metadata['handler'], metadata.get('handler_seconds', 0.0),
+                                   error=result.get('file_type') == 'error')
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict:
+        return dict(self._stats, workers=self.workers, timeout_seconds=self.timeout, memory_limit_mb=self.memory_limit_mb,
+                    max_tasks_per_child=EXTRACTION_MAX_TASKS_PER_CHILD,
+                    handlers=format_registry.get_stats())
+
+
+# Shared by every service in this process
+extraction_executor = ExtractionExecutor()
@@ -9,76 +9,71 @@ from pathlib import Path
 from typing import Dict, List, Optional
 import os
 import io
-import base64
-import requests
-
-# Optional imports for different file types
-try:
-    import PyPDF2
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-
-try:
-    import pdfplumber
-    PDFPLUMBER_AVAILABLE = True
-except ImportError:
-    PDFPLUMBER_AVAILABLE = False
-
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-
-# Optional alternate DOCX extraction libraries
-try:
-    import docx2txt
-    DOCX2TXT_AVAILABLE = True
-except Exception:
-    DOCX2TXT_AVAILABLE = False
-
-try:
-    import mammoth
-    MAMMOTH_AVAILABLE = True
-except Exception:
-    MAMMOTH_AVAILABLE = False
+import time
+import hashlib
+import threading
+
+from .determinism_config import EvaluationCache
+from .ocr_engine import OCREngine
+from .docx_extractor import DocxExtractor
+from .tabular_extractor import TabularExtractor, CSV_SNIFF_BYTES
+from .text_decoding import read_text, detect_file_encoding
+
+from .lazy_imports import lazy_import, lazy_available
+from .format_registry import format_registry, FormatHandler, SNIFF, COST_CHEAP, COST_PARSE, COST_OCR
+
+# Optional libraries for different file types, imported on first use (keeps startup light);
+# testing a *_AVAILABLE flag imports them, and a library that fails to import counts as missing
+PyPDF2 = lazy_import("PyPDF2")
+PDF_AVAILABLE = lazy_available(PyPDF2)
+
+pdfplumber = lazy_import("pdfplumber")
+PDFPLUMBER_AVAILABLE = lazy_available(pdfplumber)
+
+# DOCX is read with the stdlib (see DocxExtractor); these are fallbacks for damaged packages
+docx2txt = lazy_import("docx2txt")
+DOCX2TXT_AVAILABLE = lazy_available(docx2txt)
+
+mammoth = lazy_import("mammoth")
+MAMMOTH_AVAILABLE = lazy_available(mammoth)
 
 # Optional Windows COM automation for legacy .doc
-try:
-    import win32com.client  # type: ignore
-    WIN32COM_AVAILABLE = True
-except Exception:
-    WIN32COM_AVAILABLE = False
-
-try:
-    import openpyxl
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
-
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+win32com_client = lazy_import("win32com.client")
+WIN32COM_AVAILABLE = lazy_available(win32com_client)
+
+openpyxl = lazy_import("openpyxl")
+EXCEL_AVAILABLE = lazy_available(openpyxl)
+
+pd = lazy_import("pandas")
+PANDAS_AVAILABLE = lazy_available(pd)
 
 import zipfile
 import io as _io
+import xml.etree.ElementTree as ET
 
 # Optional OCR for scanned PDFs
-try:
-    from pdf2image import convert_from_path
-    from PIL import Image
-    PDF2IMAGE_AVAILABLE = True
-except ImportError:
-    PDF2IMAGE_AVAILABLE = False
+pdf2image = lazy_import("pdf2image")
+PDF2IMAGE_AVAILABLE = lazy_available(pdf2image, lazy_import("PIL"))
+
+
+# Rendering resolution for OCR
+OCR_DPI = 200
+# Peak memory for rendered page images during OCR; pages are rendered in windows that fit
+OCR_MAX_MEMORY_MB = int(os.getenv('OCR_MAX_MEMORY_MB', '256'))
+
+# Per-page PDF classification: pages with little text but mostly covered by images are OCR'd
+PDF_PAGE_MIN_TEXT_CHARS = int(os.getenv('PDF_PAGE_MIN_TEXT_CHARS', '30'))
+PDF_PAGE_MIN_IMAGE_COVERAGE = float(os.getenv('PDF_PAGE_MIN_IMAGE_COVERAGE', '0.3'))
+
+# Extracted text cache (EvaluationCache type); entries are keyed <sha256>-<extension>-v<extractor version>
+TEXT_CACHE_TYPE = "text_extraction"
 
-try:
-    import pytesseract
-    PYTESSERACT_AVAILABLE = True
-except ImportError:
-    PYTESSERACT_AVAILABLE = False
+# Reasons the extraction running on this thread is partial (see FileProcessor._mark_incomplete)
+_extraction_state = threading.local()
+
+# Per-process OCR engine (thread pools do not survive a fork, so it is keyed by pid)
+_ocr_engine: Optional[OCREngine] = None
+_ocr_engine_pid: Optional[int] = None
 
 
 class FileProcessor:
@@ -93,89 +88,242 @@ class FileProcessor:
         '.cs', '.vb', '.asm', '.s', '.asmx', '.vue', '.svelte', '.tsx', '.jsx'
     }
 
+    # Bump whenever extraction output changes so cached extractions are not reused
+    EXTRACTOR_VERSION = 11
+
     @staticmethod
-    def _call_nvidia_ocr(image_bytes: bytes) -> str:
-        """Send image bytes to configured NVIDIA OCR endpoint and return extracted text if available."""
-        nv_key = os.getenv('NVIDIA_OCR_API_KEY')
-        nv_url = os.getenv('NVIDIA_OCR_URL')
-        if not nv_key or not nv_url:
-            return None
+    def _mark_incomplete(reason: str):
+        """Record that the running extraction fell back or lost part of the file; it is then not cached"""
+        reasons = getattr(_extraction_state, 'incomplete', None)
+        if reasons is not None:
+            reasons.append(reason)
+
+    @staticmethod
+    def _is_status_message(content) -> bool:
+        """Readers report failures and missing libraries as one bracketed line, e.g. "[Error reading PDF: ...]" """
+        if not isinstance(content, str):
+            return False
+        content = content.strip()
+        return content.startswith('[') and content.endswith(']') and '\n' not in content
+
+    @staticmethod
+    def _ocr_window_size(pdf_path: str, poppler_path: Optional[str]) -> tuple:
+        """(page count, pages per render window) so a window's RGB images fit in OCR_MAX_MEMORY_MB"""
+        info = pdf2image.pdfinfo_from_path(pdf_path, poppler_path=poppler_path)
+        pages = int(info.get('Pages', 0))
+        page_bytes = 3 * 1700 * 2200  # Letter at 200 dpi
         try:
-            img_b64 = base64.b64encode(image_bytes).decode('utf-8')
-            payload = {"image": img_b64}
-            headers = {
-                "Authorization": f"Bearer {nv_key}",
-                "Content-Type": "application/json",
-            }
-            resp = requests.post(nv_url, json=payload, headers=headers, timeout=60)
-            if resp.status_code == 200:
-                data = resp.json()
-                text = data.get('text') or data.get('result') or ''
-                if text and text.strip():
-                    return text
-        except Exception:
+            width_pts, height_pts = [float(v) for v in str(info.get('Page size', '')).split(' pts')[0].split(' x ')]
+            page_bytes = int(3 * (width_pts / 72 * OCR_DPI) * (height_pts / 72 * OCR_DPI))
+        except (ValueError, TypeError):
             pass
-        return None
+        # Rendered image plus its PNG encoding while it is being OCR'd
+        per_page = max(1, page_bytes * 2)
+        return pages, max(1, (OCR_MAX_MEMORY_MB * 1024 * 1024) // per_page)
 
     @staticmethod
-    def force_ocr(file_path: str) -> str:
-        """Force OCR extraction for a file using NVIDIA OCR (if available) or local pytesseract as fallback.
+    def _ocr_engine() -> OCREngine:
+        """Parallel OCR engine for this process (NVIDIA OCR first, tesseract pool fallback)"""
+        global _ocr_engine, _ocr_engine_pid
+        if _ocr_engine is None or _ocr_engine_pid != os.getpid():
+            _ocr_engine = OCREngine()
+            _ocr_engine_pid = os.getpid()
+        return _ocr_engine
 
-        Returns extracted text or None if nothing found.
+    @staticmethod
+    def _iter_pdf_page_windows(pdf_path: str, page_numbers: Optional[List[int]] = None):
         """
-        file_path_obj = Path(file_path)
-        ext = file_path_obj.suffix.lower()
+        Yield (page numbers, rendered images) one window at a time instead of rendering the
+        whole document. page_numbers (1-based) restricts rendering to those pages.
+        """
+        poppler_path = os.getenv('POPPLER_PATH') or None
+        pages, window = FileProcessor._ocr_window_size(pdf_path, poppler_path)
+        wanted = sorted(set(page_numbers)) if page_numbers is not None else list(range(1, pages + 1))
+
+        # Contiguous runs of wanted pages, split to the window size
+        runs = []
+        for number in wanted:
+            if runs and number == runs[-1][-1] + 1 and len(runs[-1]) < window:
+                runs[-1].append(number)
+            else:
+                runs.append([number])
 
-        if ext == '.pdf':
-            # Use pdf2image to convert pages to images and then call NVIDIA OCR or tesseract
-            if not PDF2IMAGE_AVAILABLE:
-                return None
+        for run in runs:
+            images = pdf2image.convert_from_path(pdf_path, dpi=OCR_DPI, poppler_path=poppler_path, first_page=run[0], last_page=run[-1])
             try:
-                poppler_path = os.getenv('POPPLER_PATH') or None
-                images = convert_from_path(file_path, dpi=200, poppler_path=poppler_path)
-                parts = []
+                yield run[:len(images)], images
+            finally:
                 for img in images:
-                    # Try NVIDIA OCR first
-                    try:
-                        buf = io.BytesIO()
-                        img.save(buf, format='PNG')
-                        bytes_data = buf.getvalue()
-                        text = FileProcessor._call_nvidia_ocr(bytes_data)
-                        if text:
-                            parts.append(text)
-                            continue
-                    except Exception:
-                        pass
-
-                    # Fallback to local pytesseract
-                    if PYTESSERACT_AVAILABLE:
-                        try:
-                            parts.append(pytesseract.image_to_string(img))
-                        except Exception:
-                            pass
-
-                if parts:
-                    joined = '\n\n'.join(p for p in parts if p and p.strip())
-                    return joined if joined.strip() else None
-            except Exception:
-                return None
-            return None
+                    img.close()
+                del images
+
+    @staticmethod
+    def _ocr_pdf_pages(pdf_path: str, page_numbers: Optional[List[int]] = None) -> Dict[int, str]:
+        """
+        OCR a PDF (or only page_numbers) window by window, pages within a window in parallel.
+        Peak memory is bounded by OCR_MAX_MEMORY_MB. Returns {page number: text}.
+        """
+        page_texts = {}
+        engine = FileProcessor._ocr_engine()
+        for numbers, images in FileProcessor._iter_pdf_page_windows(pdf_path, page_numbers):
+            for number, text in zip(numbers, engine.ocr_images(images)):
+                if text:
+                    page_texts[number] = str(text)
+        return page_texts
 
-        if ext == '.docx':
-            return FileProcessor._ocr_docx_images(file_path)
+    @staticmethod
+    def _ocr_pdf(pdf_path: str) -> Optional[str]:
+        """OCR every page of a PDF; text stays in page order"""
+        page_texts = FileProcessor._ocr_pdf_pages(pdf_path)
+        joined = '\n\n'.join(page_texts[n] for n in sorted(page_texts))
+        return joined if joined.strip() else None
 
-        if ext == '.doc':
-            # Try to convert .doc to images and OCR them
-            return FileProcessor._ocr_doc_images(file_path)
+    @staticmethod
+    def _classify_pdf_page(page) -> str:
+        """'text', 'scanned' (image-only, needs OCR) or 'blank' from text density and image coverage"""
+        char_count = len(page.chars)
+        if char_count >= PDF_PAGE_MIN_TEXT_CHARS:
+            return 'text'
+
+        page_area = float(page.width * page.height) or 1.0
+        covered = 0.0
+        for img in page.images:
+            # Clip to the page box; images can extend past the edges
+            width = max(0.0, min(float(img['x1']), float(page.width)) - max(float(img['x0']), 0.0))
+            height = max(0.0, min(float(img['bottom']), float(page.height)) - max(float(img['top']), 0.0))
+            covered += width * height
+        if min(1.0, covered / page_area) >= PDF_PAGE_MIN_IMAGE_COVERAGE:
+            return 'scanned'
+        return 'text' if char_count else 'blank'
 
-        # For other file types, no OCR performed
-        return None
-    
     @staticmethod
-    def read_file(file_path: str) -> Dict[str, any]:
+    def _read_pdf_by_page(file_path: str) -> str:
         """
-        Read file content based on file extension
-        Returns dict with filename, content, and file_type
+        Extract text page by page: text pages via pdfplumber, image-only pages via OCR,
+        blank pages skipped. Results are merged in page order.
+        """
+        page_texts = {}
+        scanned_pages = []
+        # Whatever text layer a scanned page has (stamps, headers); used if its OCR fails
+        direct_texts = {}
+        with pdfplumber.open(file_path) as pdf:
+            for number, page in enumerate(pdf.pages, 1):
+                kind = FileProcessor._classify_pdf_page(page)
+                if kind == 'scanned':
+                    scanned_pages.append(number)
+                    if page.chars:
+                        direct_texts[number] = page.extract_text() or ''
+                elif kind == 'text':
+                    text = page.extract_text()
+                    if text:
+                        page_texts[number] = text
+                page.flush_cache()
+
+        if scanned_pages and PDF2IMAGE_AVAILABLE:
+            page_texts.update(FileProcessor._ocr_scanned_pages(file_path, scanned_pages))
+        elif scanned_pages:
+            FileProcessor._mark_incomplete("scanned pages not OCR'd (pdf2image unavailable)")
+        for number in scanned_pages:
+            if number not in page_texts and direct_texts.get(number, '').strip():
+                page_texts[number] = direct_texts[number]
+        return '\n\n'.join(page_texts[n] for n in sorted(page_texts))
+
+    @staticmethod
+    def _ocr_scanned_pages(file_path: str, page_numbers: List[int]) -> Dict[int, str]:
+        """
+        OCR the given pages window by window. When a window fails (e.g. poppler missing, a page
+        that will not render) its pages and the rest are retried one at a time, so one bad page
+        costs only its own OCR text. Returns {page number: text} for the pages that were read.
+        """
+        page_texts = {}
+        attempted = set()
+        engine = FileProcessor._ocr_engine()
+        try:
+            for numbers, images in FileProcessor._iter_pdf_page_windows(file_path, page_numbers):
+                texts = engine.ocr_images(images)
+                attempted.update(numbers)
+                for number, text in zip(numbers, texts):
+                    if text:
+                        page_texts[number] = str(text)
+        except Exception:
+            for number in page_numbers:
+                if number in attempted:
+                    continue
+                try:
+                    page_texts.update(FileProcessor._ocr_pdf_pages(file_path, [number]))
+                except Exception as e:
+                    FileProcessor._mark_incomplete(f"OCR of page {number} failed: {e}")
+        return page_texts
+
+    @staticmethod
+    def file_sha256(file_path: str) -> str:
+        """SHA-256 of the file bytes, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def read_file(file_path: str, detected=SNIFF, sha256: Optional[str] = None) -> Dict[str, any]:
+        """
+        Read file content, served from the extraction cache when the same bytes were
+        already extracted by this extractor version. detected is format_registry.sniff()'s
+        result when the caller already sniffed the file; sha256 the content hash when the
+        upload manifest already has it (otherwise the file is hashed).
+        Only complete extractions are cached: no error or status message, no fallback reader,
+        no page whose OCR failed.
+        Returns dict with filename, content, file_type and extraction metadata
+        """
+        file_path_obj = Path(file_path)
+        if not file_path_obj.exists():
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        extension = file_path_obj.suffix.lower()
+        if not sha256:
+            try:
+                sha256 = FileProcessor.file_sha256(file_path)
+            except OSError:
+                return FileProcessor._read_file_uncached(file_path, detected)
+
+        cache_key = FileProcessor._text_cache_key(sha256, extension)
+        cached = EvaluationCache.get(cache_key, eval_type=TEXT_CACHE_TYPE)
+        if cached is not None:
+            return dict(cached, filename=file_path_obj.name, metadata=dict(cached.get('metadata', {}), cached=True))
+
+        started = time.perf_counter()
+        result = FileProcessor._read_file_uncached(file_path, detected)
+        result['metadata'] = {
+            **result.get('metadata', {}),
+            'sha256': sha256,
+            'size': file_path_obj.stat().st_size,
+            'extractor_version': FileProcessor.EXTRACTOR_VERSION,
+            'extraction_seconds': round(time.perf_counter() - started, 3),
+        }
+        if result['metadata'].get('complete'):
+            EvaluationCache.set(cache_key, {k: v for k, v in result.items() if k != 'filename'}, eval_type=TEXT_CACHE_TYPE)
+        return result
+
+    @staticmethod
+    def _text_cache_key(sha256: str, extension: str) -> str:
+        # Extension is part of the key because it selects the reader
+        return f"{sha256}-{extension.lstrip('.') or 'none'}-v{FileProcessor.EXTRACTOR_VERSION}"
+
+    @staticmethod
+    def discard_cached_text(sha256: str) -> int:
+        """Drop every cached extraction of a content hash (all extensions and versions); called when its uploads expire"""
+        return EvaluationCache.delete_prefix(f"{sha256}-", eval_type=TEXT_CACHE_TYPE)
+
+    @staticmethod
+    def purge_cached_text(max_age_seconds: float) -> int:
+        """Drop cached extractions older than the upload retention period. Returns count removed."""
+        return EvaluationCache.purge_older_than(TEXT_CACHE_TYPE, max_age_seconds)
+
+    @staticmethod
+    def _read_file_uncached(file_path: str, detected=SNIFF) -> Dict[str, any]:
+        """
+        Read file content with the format handler picked by magic bytes (extension as fallback)
+        Returns dict with filename, content, file_type and the handler that read it
         """
         file_path_obj = Path(file_path)
         
@@ -184,145 +332,61 @@ class FileProcessor:
         
         filename = file_path_obj.name
         extension = file_path_obj.suffix.lower()
+        handler, detected_by = format_registry.resolve(file_path, detected)
         
+        _extraction_state.incomplete = []
         try:
-            # Text files
-            if extension in FileProcessor.TEXT_EXTENSIONS:
-                content = FileProcessor._read_text_file(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'text',
-                    'extension': extension
-                }
-            
-            # PDF files
-            elif extension == '.pdf':
-                content = FileProcessor._read_pdf(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'pdf',
-                    'extension': extension
-                }
-            
-            # Word .docx
-            elif extension == '.docx':
-                content = FileProcessor._read_docx(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'docx',
-                    'extension': extension
-                }
-            # Legacy Word .doc (Windows COM fallback)
-            elif extension == '.doc':
-                content = FileProcessor._read_doc(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'doc',
-                    'extension': extension
-                }
-            
-            # Excel files
-            elif extension in ['.xlsx', '.xls']:
-                content = FileProcessor._read_excel(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'excel',
-                    'extension': extension
-                }
-            
-            # CSV files
-            elif extension == '.csv':
-                content = FileProcessor._read_csv(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'csv',
-                    'extension': extension
-                }
-            
-            # JSON files
-            elif extension == '.json':
-                content = FileProcessor._read_json(file_path)
-                return {
-                    'filename': filename,
-                    'content': content,
-                    'file_type': 'json',
-                    'extension': extension
-                }
-            
-            # PowerPoint files
-            elif extension in ['.ppt', '.pptx', '.pptm']:
-                content = FileProcessor._read_ppt(file_path)
+            content, seconds = format_registry.run(handler, file_path)
+            file_type = handler.name
+        except Exception as e:
+            if detected_by != 'default':
                 return {
                     'filename': filename,
-                    'content': content,
-                    'file_type': 'ppt',
+                    'content': f"[Error reading file: {str(e)}]",
+                    'file_type': 'error',
                     'extension': extension
                 }
-            
-            # Default: try to read as text
-            else:
-                try:
-                    content = FileProcessor._read_text_file(file_path)
-                    return {
-                        'filename': filename,
-                        'content': content,
-                        'file_type': 'text',
-                        'extension': extension
-                    }
-                except:
-                    return {
-                        'filename': filename,
-                        'content': f"[Binary file - {extension} - Cannot read as text]",
-                        'file_type': 'binary',
-                        'extension': extension
-                    }
+            # Unknown extension that is not readable as text
+            content, seconds = f"[Binary file - {extension} - Cannot read as text]", 0.0
+            file_type = 'binary'
+        finally:
+            incomplete, _extraction_state.incomplete = _extraction_state.incomplete, None
         
-        except Exception as e:
-            return {
-                'filename': filename,
-                'content': f"[Error reading file: {str(e)}]",
-                'file_type': 'error',
-                'extension': extension
+        return {
+            'filename': filename,
+            'content': content,
+            'file_type': file_type,
+            'extension': extension,
+            'metadata': {
+                'handler': handler.name,
+                'detected_by': detected_by,
+                'cost': handler.cost,
+                'handler_seconds': round(seconds, 3),
+                # False when the text is a status message or the reader fell back / lost pages
+                'complete': not incomplete and file_type != 'binary' and not FileProcessor._is_status_message(content),
             }
+        }
     
     @staticmethod
     def _read_text_file(file_path: str) -> str:
-        """Read text file with encoding detection"""
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        
-        for encoding in encodings:
-            try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except UnicodeDecodeError:
-                continue
-        
-        # If all encodings fail, read as binary and decode with errors='replace'
-        with open(file_path, 'rb') as f:
-            return f.read().decode('utf-8', errors='replace')
+        """Read text file once, decoding with the detected encoding (see text_decoding)"""
+        text, _ = read_text(file_path)
+        return text
     
     @staticmethod
     def _read_pdf(file_path: str) -> str:
         """Extract text from PDF file"""
+        # Set once every page has been classified (and image-only pages OCR'd)
+        pages_classified = False
         if PDFPLUMBER_AVAILABLE:
             try:
-                text_content = []
-                with pdfplumber.open(file_path) as pdf:
-                    for page in pdf.pages:
-                        text = page.extract_text()
-                        if text:
-                            text_content.append(text)
-                extracted = '\n\n'.join(text_content)
+                # Per-page: text where there is text, OCR only for image-only pages
+                extracted = FileProcessor._read_pdf_by_page(file_path)
+                pages_classified = True
                 if extracted.strip():
                     return extracted
             except Exception as e:
-                pass
+                FileProcessor._mark_incomplete(f"pdfplumber failed: {e}")
         
         if PDF_AVAILABLE:
             try:
@@ -339,46 +403,15 @@ class FileProcessor:
             except Exception as e:
                 return f"[Error reading PDF: {str(e)}]"
         
-        # If we reach here, try OCR fallback for scanned PDFs
-        if PDF2IMAGE_AVAILABLE:
+        # If we reach here, try OCR fallback for scanned PDFs (pages already classified as
+        # blank or OCR'd per page are not OCR'd again)
+        if PDF2IMAGE_AVAILABLE and not pages_classified:
             try:
-                poppler_path = os.getenv('POPPLER_PATH') or None
-                images = convert_from_path(file_path, dpi=200, poppler_path=poppler_path)
-                ocr_text_parts = []
-                for img in images:
-                    text = None
-                    # Prefer NVIDIA OCR if configured
-                    try:
-                        nv_key = os.getenv('NVIDIA_OCR_API_KEY')
-                        nv_url = os.getenv('NVIDIA_OCR_URL')
-                        if nv_key and nv_url:
-                            buf = io.BytesIO()
-                            img.save(buf, format='PNG')
-                            img_b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-                            payload = {"image": img_b64}
-                            headers = {
-                                "Authorization": f"Bearer {nv_key}",
-                                "Content-Type": "application/json",
-                            }
-                            resp = requests.post(nv_url, json=payload, headers=headers, timeout=60)
-                            if resp.status_code == 200:
-                                data = resp.json()
-                                text = data.get('text') or data.get('result') or ''
-                    except Exception:
-                        text = None
-                    # Fallback to local Tesseract if NVIDIA not configured or failed
-                    if (not text or not str(text).strip()) and PYTESSERACT_AVAILABLE:
-                        try:
-                            text = pytesseract.image_to_string(img)
-                        except Exception:
-                            text = None
-                    if text:
-                        ocr_text_parts.append(str(text))
-                ocr_text = '\n\n'.join(ocr_text_parts)
-                if ocr_text.strip():
+                ocr_text = FileProcessor._ocr_pdf(file_path)
+                if ocr_text:
                     return ocr_text
-            except Exception:
-                pass
+            except Exception as e:
+                FileProcessor._mark_incomplete(f"OCR failed: {e}")
 
         # Libraries not available or OCR failed
         if not (PDFPLUMBER_AVAILABLE or PDF_AVAILABLE):
@@ -387,43 +420,6 @@ class FileProcessor:
             return "[No extractable text found. Enable OCR by installing pdf2image & pillow. For local OCR also install pytesseract and set POPPLER_PATH on Windows]"
         return "[No extractable text found in PDF]"
     
-    @staticmethod
-    def _ocr_docx_images(file_path: str) -> str:
-        """Extract images from .docx and run OCR on them using NVIDIA OCR (if configured) or pytesseract."""
-        try:
-            texts = []
-            with zipfile.ZipFile(file_path, 'r') as z:
-                for name in z.namelist():
-                    if name.startswith('word/media/'):
-                        try:
-                            data = z.read(name)
-                            # Try NVIDIA OCR first
-                            try:
-                                nvinf = FileProcessor._call_nvidia_ocr(data)
-                                if nvinf and nvinf.strip():
-                                    texts.append(nvinf.strip())
-                                    continue
-                            except Exception:
-                                pass
-
-                            # Fallback to local tesseract if available
-                            if PYTESSERACT_AVAILABLE:
-                                try:
-                                    from PIL import Image
-                                    img = Image.open(_io.BytesIO(data))
-                                    text = pytesseract.image_to_string(img)
-                                    if text and text.strip():
-                                        texts.append(text.strip())
-                                except Exception:
-                                    continue
-                        except Exception:
-                            continue
-            if texts:
-                return '\n\n'.join(texts)
-        except Exception:
-            return None
-        return None
-
     @staticmethod
     def _ocr_doc_images(file_path: str) -> str:
         """Convert .doc to PDF using win32com, then convert PDF to images and run OCR."""
@@ -436,7 +432,7 @@ class FileProcessor:
         if not PDF2IMAGE_AVAILABLE:
             # Try one more time with COM to extract text
             try:
-                word = win32com.client.Dispatch("Word.Application")
+                word = win32com_client.Dispatch("Word.Application")
                 word.Visible = False
                 doc = word.Documents.Open(str(Path(file_path).absolute()))
                 try:
@@ -468,7 +464,7 @@ class FileProcessor:
             pdf_path = os.path.join(temp_dir, "temp_doc.pdf")
             
             try:
-                word = win32com.client.Dispatch("Word.Application")
+                word = win32com_client.Dispatch("Word.Application")
                 word.Visible = False
                 doc = word.Documents.Open(str(Path(file_path).absolute()))
                 
@@ -489,35 +485,10 @@ class FileProcessor:
                     if not os.path.exists(pdf_path):
                         return None
                     
-                    # Convert PDF pages to images and OCR
-                    poppler_path = os.getenv('POPPLER_PATH') or None
-                    images = convert_from_path(pdf_path, dpi=200, poppler_path=poppler_path)
-                    texts = []
-                    
-                    for img in images:
-                        # Try NVIDIA OCR first
-                        try:
-                            buf = io.BytesIO()
-                            img.save(buf, format='PNG')
-                            bytes_data = buf.getvalue()
-                            text = FileProcessor._call_nvidia_ocr(bytes_data)
-                            if text and text.strip():
-                                texts.append(text)
-                                continue
-                        except Exception:
-                            pass
-                        
-                        # Fallback to local pytesseract
-                        if PYTESSERACT_AVAILABLE:
-                            try:
-                                text = pytesseract.image_to_string(img)
-                                if text and text.strip():
-                                    texts.append(text)
-                            except Exception:
-                                pass
-                    
-                    if texts:
-                        return '\n\n'.join(texts)
+                    # OCR the exported PDF in bounded page windows
+                    ocr_text = FileProcessor._ocr_pdf(pdf_path)
+                    if ocr_text:
+                        return ocr_text
                         
                 finally:
                     doc.Close(False)
@@ -537,108 +508,46 @@ class FileProcessor:
             return None
         return None
 
+    @staticmethod
     def _read_docx(file_path: str) -> str:
-        """Extract text from Word document, including paragraphs, tables, headers and footers.
+        """Extract text from Word document: paragraphs and tables in document order, headers and footers.
 
-        This function tries multiple strategies in order:
-        1. python-docx structured extraction (paragraphs, tables, headers/footers)
-        2. docx2txt extraction (if installed)
-        3. mammoth extraction (if installed)
-        4. OCR images embedded in the .docx (if pytesseract is installed)
+        The package is opened once and word/document.xml is streamed (see DocxExtractor);
+        embedded images are OCR'd only when the text yield is low. docx2txt and mammoth are
+        tried only when the package cannot be parsed.
         """
-        if not DOCX_AVAILABLE:
-            # Fall back to docx2txt or mammoth if python-docx not installed
-            if DOCX2TXT_AVAILABLE:
-                try:
-                    text = docx2txt.process(file_path)
-                    if text and text.strip():
-                        return text
-                except Exception:
-                    pass
-            if MAMMOTH_AVAILABLE:
-                try:
-                    with open(file_path, 'rb') as f:
-                        result = mammoth.extract_raw_text(f)
-                        text = (result.value or '').strip() if result else ''
-                        if text:
-                            return text
-                except Exception:
-                    pass
-            return "[python-docx library not available]"
-
         try:
-            doc = Document(file_path)
-            parts = []
+            extracted = DocxExtractor.read(file_path, ocr_images=lambda images: FileProcessor._ocr_engine().ocr_images(images))
+            return extracted if extracted else "[No text extracted from DOCX]"
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            parse_error = e
+        except Exception as e:
+            return f"[Error reading DOCX: {str(e)}]"
 
-            # Paragraphs
-            for para in doc.paragraphs:
-                text = (para.text or "").rstrip()
-                if text:
-                    parts.append(text)
-
-            # Tables (preserve cell text in readable rows)
-            for table in doc.tables:
-                table_rows = []
-                for row in table.rows:
-                    cells = [ (cell.text or "").rstrip() for cell in row.cells ]
-                    table_rows.append('\t'.join(cells))
-                if table_rows:
-                    parts.append("Table:\n" + "\n".join(table_rows))
-
-            # Headers and Footers
+        if DOCX2TXT_AVAILABLE:
             try:
-                for section in doc.sections:
-                    header = section.header
-                    for para in header.paragraphs:
-                        h = (para.text or "").strip()
-                        if h:
-                            parts.append("Header: " + h)
-                    footer = section.footer
-                    for para in footer.paragraphs:
-                        f = (para.text or "").strip()
-                        if f:
-                            parts.append("Footer: " + f)
+                text = docx2txt.process(file_path)
+                if text and text.strip():
+                    return text
             except Exception:
-                # Some docs may not expose section header/footer reliably; ignore failures
                 pass
-
-            extracted = "\n\n".join(parts).strip()
-
-            # If nothing found, try alternate extractors
-            if not extracted:
-                # Try docx2txt
-                if DOCX2TXT_AVAILABLE:
-                    try:
-                        t = docx2txt.process(file_path)
-                        if t and t.strip():
-                            return t
-                    except Exception:
-                        pass
-                # Try mammoth
-                if MAMMOTH_AVAILABLE:
-                    try:
-                        with open(file_path, 'rb') as f:
-                            result = mammoth.extract_raw_text(f)
-                            t = (result.value or '').strip() if result else ''
-                            if t:
-                                return t
-                    except Exception:
-                        pass
-                # Try OCR on images embedded in docx
-                ocr_text = FileProcessor._ocr_docx_images(file_path)
-                if ocr_text:
-                    return ocr_text
-
-            return extracted if extracted else "[No text extracted from DOCX]"
-        except Exception as e:
-            return f"[Error reading DOCX: {str(e)}]"
+        if MAMMOTH_AVAILABLE:
+            try:
+                with open(file_path, 'rb') as f:
+                    result = mammoth.extract_raw_text(f)
+                    text = (result.value or '').strip() if result else ''
+                    if text:
+                        return text
+            except Exception:
+                pass
+        return f"[Error reading DOCX: {str(parse_error)}]"
 
     @staticmethod
     def _read_doc(file_path: str) -> str:
         """Extract text from legacy .doc using Windows Word COM if available, with OCR fallback"""
         if WIN32COM_AVAILABLE:
             try:
-                word = win32com.client.Dispatch("Word.Application")
+                word = win32com_client.Dispatch("Word.Application")
                 word.Visible = False
                 doc = word.Documents.Open(str(Path(file_path).absolute()))
                 try:
@@ -684,41 +593,25 @@ class FileProcessor:
     
     @staticmethod
     def _read_excel(file_path: str) -> str:
-        """Extract text from Excel file"""
-        if PANDAS_AVAILABLE:
-            try:
-                df = pd.read_excel(file_path, sheet_name=None)
-                content_parts = []
-                for sheet_name, sheet_df in df.items():
-                    content_parts.append(f"Sheet: {sheet_name}\n{sheet_df.to_string()}\n")
-                return '\n'.join(content_parts)
-            except Exception as e:
-                pass
-        
-        if EXCEL_AVAILABLE:
-            try:
-                workbook = openpyxl.load_workbook(file_path, data_only=True)
-                content_parts = []
-                for sheet_name in workbook.sheetnames:
-                    sheet = workbook[sheet_name]
-                    content_parts.append(f"Sheet: {sheet_name}\n")
-                    for row in sheet.iter_rows(values_only=True):
-                        content_parts.append('\t'.join(str(cell) if cell is not None else '' for cell in row))
-                    content_parts.append('\n')
-                return '\n'.join(content_parts)
-            except Exception as e:
-                return f"[Error reading Excel: {str(e)}]"
-        
-        return "[Excel library not available. Install pandas or openpyxl]"
+        """Extract a bounded summary of every sheet (streamed; see TabularExtractor)"""
+        if not EXCEL_AVAILABLE and not PANDAS_AVAILABLE:
+            return "[Excel library not available. Install pandas or openpyxl]"
+        try:
+            # Legacy BIFF workbooks are not zip packages; openpyxl cannot stream them
+            legacy = format_registry.sniff(file_path) == 'xls'
+            return TabularExtractor.read_excel(file_path, legacy=legacy)
+        except Exception as e:
+            return f"[Error reading Excel: {str(e)}]"
     
     @staticmethod
     def _read_csv(file_path: str) -> str:
-        """Read CSV file"""
+        """Extract a bounded summary of a CSV file (rows streamed; see TabularExtractor)"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = [','.join(row) for row in reader]
-                return '\n'.join(rows)
+            encoding = detect_file_encoding(file_path)
+            with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
+                sample = f.read(CSV_SNIFF_BYTES)
+                f.seek(0)
+                return TabularExtractor.read_csv(f, sample)
         except Exception as e:
             return f"[Error reading CSV: {str(e)}]"
     
@@ -726,9 +619,8 @@ class FileProcessor:
     def _read_json(file_path: str) -> str:
         """Read and format JSON file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return json.dumps(data, indent=2)
+            text, _ = read_text(file_path)
+            return json.dumps(json.loads(text), indent=2)
         except Exception as e:
             return f"[Error reading JSON: {str(e)}]"
     
@@ -737,7 +629,14 @@ class FileProcessor:
         """Extract text from PowerPoint file"""
         try:
             from .ppt_processor import PPTProcessor
-            result = PPTProcessor.process_ppt_file(file_path)
+            # Dispatch on the content, not the extension (misnamed uploads)
+            detected = format_registry.sniff(file_path)
+            if detected == 'pptx':
+                result = PPTProcessor.extract_text_from_pptx(file_path)
+            elif detected == 'ppt':
+                result = PPTProcessor.extract_text_from_ppt(file_path)
+            else:
+                result = PPTProcessor.process_ppt_file(file_path)
             return result.get('slides_text', '[No text extracted from PPT]')
         except ImportError:
             return "[PPT processor not available]"
@@ -842,4 +741,16 @@ class FileProcessor:
         return results
 
 
+def _register_formats():
+    """FileProcessor's readers as format-registry plugins (first claim on an extension wins)"""
+    fp = FileProcessor
+    format_registry.register(FormatHandler('text', fp._read_text_file, COST_CHEAP, fp.TEXT_EXTENSIONS), default=True)
+    format_registry.register(FormatHandler('pdf', fp._read_pdf, COST_OCR, ['.pdf'], ['pdf']))
+    format_registry.register(FormatHandler('docx', fp._read_docx, COST_PARSE, ['.docx'], ['docx']))
+    format_registry.register(FormatHandler('doc', fp._read_doc, COST_OCR, ['.doc'], ['doc']))
+    format_registry.register(FormatHandler('excel', fp._read_excel, COST_PARSE, ['.xlsx', '.xls'], ['xlsx', 'xls']))
+    format_registry.register(FormatHandler('csv', fp._read_csv, COST_CHEAP, ['.csv']))
+    format_registry.register(FormatHandler('ppt', fp._read_ppt, COST_PARSE, ['.ppt', '.pptx', '.pptm'], ['pptx', 'ppt']))
+
 
+_register_formats()
@@ -0,0 +1,255 @@
+"""
+Format Registry
+Extractor plugins chosen by the file's magic bytes, with the extension as a fallback, so a PDF
+saved as .txt is still read as a PDF. Each handler declares a cost class that the extraction
+executor uses for routing, and every handler run is timed.
+"""
+import time
+import struct
+import logging
+import zipfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cost classes: cheap handlers run inline on a thread; parse/ocr handlers go to the process pool
+COST_CHEAP = "cheap"
+COST_PARSE = "parse"
+COST_OCR = "ocr"
+
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_MAGIC = b"PK\x03\x04"
+# Leading bytes read for sniffing
+SNIFF_BYTES = 1024
+# Root-level stream of a legacy Office (OLE) file that names its format, highest priority first
+# (a presentation or document can embed a workbook, but only in a sub-storage)
+OLE_MAIN_STREAMS = (
+    ("WordDocument", "doc"),
+    ("PowerPoint Document", "ppt"),
+    ("Workbook", "xls"),
+    ("Book", "xls"),
+)
+# Bounds for walking a (possibly corrupt) OLE directory
+OLE_MAX_DIRECTORY_SECTORS = 4096
+OLE_MAX_ENTRIES = 100000
+
+# Sentinel: resolve()/cost_class() sniff the file themselves unless given sniff()'s result
+SNIFF = object()
+
+
+class FormatHandler:
+    """One extractor plugin: reader(file_path) -> text"""
+
+    def __init__(self, name: str, reader: Callable[[str], str], cost: str,
+                 extensions: Iterable[str] = (), magic_formats: Iterable[str] = ()):
+        self.name = name
+        self.reader = reader
+        self.cost = cost
+        self.extensions = {e.lower() for e in extensions}
+        # Formats reported by sniff() that this handler reads
+        self.magic_formats = set(magic_formats)
+
+
+class FormatRegistry:
+    """Handler lookup (magic bytes first, then extension) and per-handler timing"""
+
+    def __init__(self):
+        self._handlers: Dict[str, FormatHandler] = {}
+        self._by_extension: Dict[str, FormatHandler] = {}
+        self._by_magic: Dict[str, FormatHandler] = {}
+        self._default: Optional[FormatHandler] = None
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def register(self, handler: FormatHandler, default: bool = False) -> FormatHandler:
+        """Add a handler; an extension or magic format keeps the first handler that claimed it"""
+        self._handlers[handler.name] = handler
+        for extension in handler.extensions:
+            self._by_extension.setdefault(extension, handler)
+        for magic in handler.magic_formats:
+            self._by_magic.setdefault(magic, handler)
+        if default:
+            self._default = handler
+        return handler
+
+    @staticmethod
+    def sniff(file_path: str) -> Optional[str]:
+        """
+        Container format from the file's leading bytes: 'pdf', 'docx', 'xlsx', 'pptx', 'zip',
+        'doc', 'xls', 'ppt', 'ole', or None when there is no recognizable signature.
+        """
+        try:
+            with open(file_path, "rb") as f:
+                head = f.read(SNIFF_BYTES)
+                # Tolerate leading whitespace / BOM, but not text that merely mentions %PDF-
+                if head.lstrip(b" \t\r\n\x00\xef\xbb\xbf").startswith(b"%PDF-"):
+                    return "pdf"
+                if head.startswith(ZIP_MAGIC):
+                    return FormatRegistry._sniff_zip(file_path)
+                if head.startswith(OLE_MAGIC):
+                    return FormatRegistry._sniff_ole(f)
+        except OSError:
+            return None
+        return None
+
+    @staticmethod
+    def _sniff_zip(file_path: str) -> str:
+        """Office Open XML packages are zips told apart by their main part"""
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                names = set(archive.namelist())
+        except (zipfile.BadZipFile, OSError):
+            return "zip"
+        if "word/document.xml" in names:
+            return "docx"
+        if "xl/workbook.xml" in names:
+            return "xlsx"
+        if "ppt/presentation.xml" in names:
+            return "pptx"
+        return "zip"
+
+    @staticmethod
+    def _sniff_ole(f) -> str:
+        """Legacy Office files are OLE compound documents named by their main root-level stream"""
+        try:
+            names = FormatRegistry._ole_root_streams(f)
+        except (OSError, ValueError, struct.error):
+            return "ole"
+        for stream, format_name in OLE_MAIN_STREAMS:
+            if stream in names:
+                return format_name
+        return "ole"
+
+    @staticmethod
+    def _ole_root_streams(f) -> set:
+        """
+        Names of the streams directly under the root storage of an OLE file: the directory
+        sector chain is followed through the FAT and the root's child tree is walked, so names
+        inside embedded objects (an .xls in a .ppt) are not seen. Reads only header, FAT and
+        directory sectors.
+        """
+        f.seek(0)
+        header = f.read(512)
+        if len(header) < 512:
+            raise ValueError("truncated OLE header")
+        sector_size = 1 << struct.unpack_from("<H", header, 30)[0]
+        if sector_size not in (512, 4096):
+            raise ValueError("bad OLE sector size")
+        first_dir_sector = struct.unpack_from("<I", header, 48)[0]
+        difat_sector, difat_count = struct.unpack_from("<II", header, 68)
+        per_sector = sector_size // 4
+
+        def read_sector(number: int) -> bytes:
+            f.seek((number + 1) * sector_size)
+            data = f.read(sector_size)
+            if len(data) < sector_size:
+                raise ValueError("OLE sector past end of file")
+            return data
+
+        # FAT sector locations: 109 in the header, the rest in the DIFAT chain
+        fat_sectors = [s for s in struct.unpack_from("<109I", header, 76) if s < 0xFFFFFFFA]
+        for _ in range(min(difat_count, OLE_MAX_DIRECTORY_SECTORS)):
+            if difat_sector >= 0xFFFFFFFA:
+                break
+            entries = struct.unpack(f"<{per_sector}I", read_sector(difat_sector))
+            fat_sectors.extend(s for s in entries[:-1] if s < 0xFFFFFFFA)
+            difat_sector = entries[-1]
+
+        def next_sector(number: int) -> int:
+            index, offset = divmod(number, per_sector)
+            if index >= len(fat_sectors):
+                raise ValueError("OLE sector outside the FAT")
+            return struct.unpack_from("<I", read_sector(fat_sectors[index]), offset * 4)[0]
+
+        directory = b""
+        sector = first_dir_sector
+        for _ in range(OLE_MAX_DIRECTORY_SECTORS):
+            if sector >= 0xFFFFFFFA:
+                break
+            directory += read_sector(sector)
+            sector = next_sector(sector)
+
+        def entry(sid: int) -> tuple:
+            """(name, type, left sibling, right sibling, child) of directory entry sid"""
+            raw = directory[sid * 128:(sid + 1) * 128]
+            if len(raw) < 128:
+                raise ValueError("OLE directory entry out of range")
+            name_length = struct.unpack_from("<H", raw, 64)[0]
+            name = raw[:max(0, min(name_length, 64) - 2)].decode("utf-16-le", errors="replace")
+            return (name, raw[66]) + struct.unpack_from("<III", raw, 68)
+
+        # Entry 0 is the root storage; its children form a red-black tree linked by siblings
+        names = set()
+        pending = [entry(0)[4]]
+        seen = set()
+        while pending and len(seen) < OLE_MAX_ENTRIES:
+            sid = pending.pop()
+            if sid >= 0xFFFFFFFA or sid in seen:
+                continue
+            seen.add(sid)
+            name, kind, left, right, _ = entry(sid)
+            if kind == 2:  # stream
+                names.add(name)
+            pending.extend((left, right))
+        return names
+
+    def resolve(self, file_path: str, detected=SNIFF) -> Tuple[FormatHandler, str]:
+        """
+        (handler, how it was chosen: 'magic' | 'extension' | 'default'). detected is sniff()'s
+        result when the caller already has it.
+        """
+        extension = Path(file_path).suffix.lower()
+        by_extension = self._by_extension.get(extension)
+        if detected is SNIFF:
+            detected = self.sniff(file_path)
+        by_magic = self._by_magic.get(detected)
+        if by_magic is not None:
+            if by_extension is not None and by_extension is not by_magic:
+                logger.info(f"{Path(file_path).name} has {extension} extension but {by_magic.name} content; using the {by_magic.name} reader.")
+            return by_magic, "magic"
+        if by_extension is not None:
+            return by_extension, "extension"
+        return self._default, "default"
+
+    def cost_class(self, file_path: str, detected=SNIFF) -> str:
+        handler, _ = self.resolve(file_path, detected)
+        return handler.cost if handler else COST_PARSE
+
+    def run(self, handler: FormatHandler, file_path: str) -> Tuple[str, float]:
+        """Run a handler and record its timing. Returns (content, seconds); exceptions propagate."""
+        started = time.perf_counter()
+        try:
+            content = handler.reader(file_path)
+        except Exception:
+            self.record(handler.name, time.perf_counter() - started, error=True)
+            raise
+        seconds = time.perf_counter() - started
+        self.record(handler.name, seconds)
+        return content, seconds
+
+    def record(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                name: dict(
+                    stats,
+                    cost=self._handlers[name].cost if name in self._handlers else None,
+                    total_seconds=round(stats["total_seconds"], 3),
+                    max_seconds=round(stats["max_seconds"], 3),
+                    avg_seconds=round(stats["total_seconds"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                )
+                for name, stats in sorted(self._stats.items())
+            }
+
+
+# Handlers are registered by FileProcessor
+format_registry = FormatRegistry()
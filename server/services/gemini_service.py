@@ -4,11 +4,17 @@ import logging
 import asyncio
 from typing import Dict, List, Optional, Any
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 from pydantic import BaseModel, Field
 
 from .determinism_config import DeterministicEvalConfig, EvaluationCache
+from .qa_extractor import LocalQAExtractor, split_for_extraction, merge_chunk_pairs
+from .llm_scheduler import llm_scheduler, estimate_tokens
+from .rubric_sections import section_cache_key
+from .lazy_imports import lazy_import
+
+# The Gemini SDK is large; it is imported on the first LLM call rather than at startup
+genai = lazy_import("google.genai")
+types = lazy_import("google.genai.types")
 
 load_dotenv()
 
@@ -25,6 +31,7 @@ class ExtractedQA(BaseModel):
     question: str = Field(description="The question text extracted from the document")
     student_answer: str = Field(description="The student's answer text extracted from the document")
     is_answer_present: bool = Field(description="Whether an answer was found for this question")
+    question_number: Optional[int] = Field(None, description="The question's own number as written in the document (e.g. 2 for 'Q2'), null if unnumbered")
 
 class ExtractedQAList(BaseModel):
     qa_pairs: List[ExtractedQA] = Field(description="List of question-answer pairs extracted from the document")
@@ -98,10 +105,9 @@ class GeminiService:
         self.max_retries = MAX_LLM_RETRIES
         self.backoff_base = BACKOFF_BASE
         
-        if self.api_key:
-            self.client = genai.Client(api_key=self.api_key)
-        else:
-            self.client = None
+        # Created on first use (see _get_client)
+        self.client = None
+        if not self.api_key:
             logger.warning("GEMINI_API_KEY not found in environment")
 
     def _get_client(self):
@@ -111,7 +117,7 @@ class GeminiService:
                 self.client = genai.Client(api_key=self.api_key)
         return self.client
 
-    async def _call_gemini_core(self, contents: Any, config: types.GenerateContentConfig, response_schema: Optional[Any] = None, operation_name: str = "LLM Call") -> Dict:
+    async def _call_gemini_core(self, contents: Any, config: "types.GenerateContentConfig", response_schema: Optional[Any] = None, operation_name: str = "LLM Call") -> Dict:
         """
         Robust core wrapper for Gemini SDK with exponential retry and standardized error handling.
         """
@@ -149,15 +155,14 @@ class GeminiService:
                         else: print(f"[Binary Part: {type(part)}]")
                 print("-" * 50)
 
-                # Use thread pool for blocking SDK call
-                loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(
-                    None,
+                # Blocking SDK call on the fair scheduler's thread pool; it bounds in-flight calls
+                response = await llm_scheduler.run(
                     lambda: client.models.generate_content(
                         model=self.model,
                         contents=contents,
                         config=config
-                    )
+                    ),
+                    estimate_tokens(contents)
                 )
 
                 # Successful execution
@@ -236,8 +241,54 @@ class GeminiService:
     async def extract_qa_structured(self, text: str) -> Dict:
         """
         Uses Gemini structured output to extract QA pairs with standardized return.
+        Long documents are split into overlapping chunks that are extracted concurrently
+        and merged in order.
         DETERMINISTIC: Uses content hashing and caching to ensure same results.
         """
+        if len(text) <= DeterministicEvalConfig.QA_EXTRACTION_CHUNK_CHARS:
+            return await self._extract_qa_single(text)
+
+        content_hash = DeterministicEvalConfig.get_content_hash(text)
+        cached_result = EvaluationCache.get(content_hash, eval_type="qa_extraction")
+        if cached_result is not None:
+            return cached_result
+
+        chunks = split_for_extraction(text, DeterministicEvalConfig.QA_EXTRACTION_CHUNK_CHARS, DeterministicEvalConfig.QA_EXTRACTION_CHUNK_OVERLAP)
+        logger.info(f"Extracting QA pairs from {len(chunks)} chunks ({len(text)} chars)")
+
+        semaphore = asyncio.Semaphore(DeterministicEvalConfig.QA_EXTRACTION_MAX_PARALLEL_CHUNKS)
+
+        async def _extract_chunk(chunk: str) -> Dict:
+            async with semaphore:
+                return await self._extract_qa_single(chunk)
+
+        results = await asyncio.gather(*[_extract_chunk(c) for c in chunks])
+
+        failed = [i for i, r in enumerate(results) if not r.get("success")]
+        if len(failed) == len(results):
+            return results[0]
+
+        chunk_pairs = []
+        local_extractor = LocalQAExtractor()
+        for chunk, r in zip(chunks, results):
+            if r.get("success"):
+                chunk_pairs.append(r.get("response", []))
+            else:
+                # Only the failed chunk falls back to local extraction
+                logger.warning(f"Chunk extraction failed: {r.get('error')}. Using local extraction for that chunk.")
+                chunk_pairs.append([
+                    {"question": p["question"], "student_answer": p["student_answer"], "is_answer_present": p["is_answer_present"],
+                     "question_number": p["question_number"]}
+                    for p in local_extractor.extract(chunk)["qa_pairs"]
+                ])
+
+        res = {"success": True, "response": merge_chunk_pairs(chunk_pairs)}
+        if not failed:
+            EvaluationCache.set(content_hash, res, eval_type="qa_extraction")
+        return res
+
+    async def _extract_qa_single(self, text: str) -> Dict:
+        """Single-prompt structured QA extraction, cached by content hash."""
         # Generate content hash for caching
         content_hash = DeterministicEvalConfig.get_content_hash(text)
         
@@ -283,19 +334,33 @@ Analyze and extract Question–Answer pairs from the provided text.
         
         return res
 
-    async def evaluate_one_qa(self, description: str, question: str, student_answer: str, question_index: int = 1) -> Dict:
+    async def evaluate_one_qa(self, description: str, question: str, student_answer: str, question_index: int = 1, incremental: bool = False,
+                              question_number: Optional[int] = None) -> Dict:
         """
         Standardized per-question evaluation using strict atomic call with structured output.
         DETERMINISTIC: Uses content hashing, caching, and consensus voting.
+        incremental=True (rubric-diffing regrade) also accepts a cached result whose global and
+        per-question rubric sections are unchanged, even if other parts of the description changed.
+        question_number is the student's own numbering (rubric section lookup); question_index is the position.
         """
         # Create deterministic content hash for caching
         combined_input = f"{description}|||{question}|||{student_answer}|||{question_index}"
         content_hash = DeterministicEvalConfig.get_content_hash(combined_input)
+        section_hash = section_cache_key(description, question, student_answer, question_index, question_number)
         
         # Check cache first
         cached_result = EvaluationCache.get(content_hash, eval_type="qa_evaluation")
         if cached_result is not None:
             return cached_result
+        if incremental and section_hash:
+            cached_result = EvaluationCache.get(section_hash, eval_type="qa_evaluation")
+            if cached_result is not None:
+                return cached_result
+        
+        def _cache_result(result: Dict):
+            EvaluationCache.set(content_hash, result, eval_type="qa_evaluation")
+            if section_hash:
+                EvaluationCache.set(section_hash, result, eval_type="qa_evaluation")
         
         # Standardized, deterministic prompt with exact scoring rules
         prompt = f"""### ROLE: You are a strict and consistent academic grader.
@@ -402,30 +467,30 @@ Evaluate the student's answer based ONLY on the provided rubric and question.
                     # Quantize check
                     if s >= 0.75 and winner_score == 1.0:
                         resp_consensus = {"success": True, "response": resp.model_dump()}
-                        EvaluationCache.set(content_hash, resp_consensus, eval_type="qa_evaluation")
+                        _cache_result(resp_consensus)
                         logger.info(f"✓ Consensus Result: {votes} -> Winner: {winner_score} (Call #{idx+1})")
                         return resp_consensus
                     elif 0.25 <= s < 0.75 and winner_score == 0.5:
                         resp_consensus = {"success": True, "response": resp.model_dump()}
-                        EvaluationCache.set(content_hash, resp_consensus, eval_type="qa_evaluation")
+                        _cache_result(resp_consensus)
                         logger.info(f"✓ Consensus Result: {votes} -> Winner: {winner_score} (Call #{idx+1})")
                         return resp_consensus
                     elif s < 0.25 and winner_score == 0.0:
                         resp_consensus = {"success": True, "response": resp.model_dump()}
-                        EvaluationCache.set(content_hash, resp_consensus, eval_type="qa_evaluation")
+                        _cache_result(resp_consensus)
                         logger.info(f"✓ Consensus Result: {votes} -> Winner: {winner_score} (Call #{idx+1})")
                         return resp_consensus
                 
                 # Fallback: return first response
                 resp_consensus = {"success": True, "response": valid_responses[0].model_dump()}
-                EvaluationCache.set(content_hash, resp_consensus, eval_type="qa_evaluation")
+                _cache_result(resp_consensus)
                 return resp_consensus
             else:
                 # Single call (if consensus disabled)
                 result = await self._call_gemini_core(prompt, config, EvalDetail, "Question Evaluation")
                 if result["success"]:
                     result["response"] = result["response"].model_dump()
-                    EvaluationCache.set(content_hash, result, eval_type="qa_evaluation")
+                    _cache_result(result)
                 return result
 
         finally:
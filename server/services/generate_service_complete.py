@@ -7,7 +7,7 @@ import re
 import os
 import uuid
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Awaitable
 import logging
 import asyncio
 from sqlalchemy.orm import Session
@@ -20,13 +20,21 @@ from services.ppt_processor import PPTProcessor
 from services.ppt_evaluator import PPTEvaluator
 from services.ppt_design_evaluator import PPTDesignEvaluator
 from services.re_evaluator import ReEvaluator
+from services.qa_extractor import LocalQAExtractor
+from services.preextraction_service import PreExtractionService
+from services.extraction_executor import extraction_executor
+from services.upload_manifest import UploadManifest
+from services.determinism_config import DeterministicEvalConfig
+from services.llm_scheduler import schedule_context, PRIORITY_BULK
 from models import Assignment, AssignmentFile, EvaluationResult, EvaluationDetail, AssignmentStatus, EvaluationType
 
 logger = logging.getLogger(__name__)
 
-# Create uploads directory for temporary file storage
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Async listener for batch progress events: (event, payload)
+ProgressCallback = Callable[[str, Dict], Awaitable[None]]
+
+# Files extracted and graded concurrently within one batch
+MAX_CONCURRENT_FILES = int(os.getenv("MAX_CONCURRENT_FILES", "8"))
 
 
 class GenerateServiceComplete:
@@ -40,6 +48,8 @@ class GenerateServiceComplete:
         self.ppt_evaluator = PPTEvaluator(self.gemini_service)
         self.ppt_design_evaluator = PPTDesignEvaluator(self.gemini_service)
         self.re_evaluator = ReEvaluator(self.gemini_service, self.ppt_evaluator, self.ppt_design_evaluator)
+        self.local_extractor = LocalQAExtractor()
+        self.preextraction = PreExtractionService(self.file_processor, self.extract_qa_pairs)
     
     def calculate_score_from_details(self, details: list, partial_credit: bool = True) -> float:
         """
@@ -84,55 +94,13 @@ class GenerateServiceComplete:
     
     async def extract_qa_pairs(self, text: str) -> List[Dict]:
         """
-        Smarter extraction utilizing Gemini structured extraction.
+        Smarter extraction: local structured extraction first, Gemini structured extraction
+        only for documents the local extractor is not confident about.
         """
-        if not text or not isinstance(text, str) or len(text.strip()) < 10:
-            return []
-
-        try:
-            logger.info("Performing structured extraction for file content...")
-            res = await self.gemini_service.extract_qa_structured(text)
-
-            if not res.get("success"):
-                logger.warning(f"Structured extraction failed: {res.get('error')}. Falling back to basic regex.")
-                return self._fallback_extract_qa(text)
-
-            extracted_pairs = res.get("response", [])
-            
-            # Map internal keys back to format expected by evaluator
-            for p in extracted_pairs:
-                if 'answer' not in p and 'student_answer' in p:
-                    p['answer'] = p['student_answer']
-            
-            logger.info(f"Successfully extracted {len(extracted_pairs)} QA pairs.")
-            return extracted_pairs
-
-        except Exception as e:
-            logger.error(f"Error in extraction: {e}")
-            return self._fallback_extract_qa(text)
+        return await self.local_extractor.extract_or_escalate(text, self.gemini_service.extract_qa_structured)
 
-    def _fallback_extract_qa(self, text: str) -> List[Dict]:
-        """Basic regex-based extraction as a safety fallback."""
-        qa = []
-        lines = [l.rstrip() for l in text.splitlines()]
-        question_re = re.compile(r"^\s*(?:Question\s*\d+|Q\d+|Q|Qus|Ques)\s*[:\.\)]", flags=re.IGNORECASE)
-        current_q = None
-        current_a = []
-        
-        for line in lines:
-            if question_re.search(line):
-                if current_q:
-                    qa.append({"question": current_q, "answer": "\n".join(current_a).strip() or None})
-                current_q = question_re.sub("", line).strip()
-                current_a = []
-            else:
-                current_a.append(line)
-        if current_q:
-            qa.append({"question": current_q, "answer": "\n".join(current_a).strip() or None})
-        return qa
-    
-    async def generate_content(self, request, current_user, db: Optional[Session] = None):
-        """Complete generate content method"""
+    def validate_request(self, request) -> Optional[str]:
+        """Validate a generate request; returns the GitHub URL to evaluate (if any)"""
         if not request.description.strip():
             from fastapi import HTTPException
             raise HTTPException(status_code=400, detail="Description is required")
@@ -145,7 +113,38 @@ class GenerateServiceComplete:
         if not request.file_ids and not github_url:
             from fastapi import HTTPException
             raise HTTPException(status_code=400, detail="Provide at least one file or GitHub URL")
+        return github_url
+
+    @staticmethod
+    async def _notify(progress_callback: Optional[ProgressCallback], event: str, payload: Dict) -> None:
+        """Send a progress event; a failing listener never breaks the evaluation"""
+        if not progress_callback:
+            return
+        try:
+            await progress_callback(event, payload)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for '{event}': {e}")
+    
+    @staticmethod
+    def checkpoint_key(question: str, answer: str) -> str:
+        """Identity of one (question, answer) grading unit for checkpoint matching"""
+        return DeterministicEvalConfig.get_content_hash(f"{question}|||{answer}")
+    
+    async def generate_content(self, request, current_user, db: Optional[Session] = None, progress_callback: Optional[ProgressCallback] = None, checkpoints: Optional[Dict] = None):
+        """
+        Complete generate content method.
+        progress_callback(event, payload) is awaited with 'batch_started', 'file_started',
+        'file_extracted', 'question_completed' and 'file_completed' events as the batch progresses.
+        checkpoints maps (file_index, question_index, unit_key) to an already graded detail;
+        those units are reused instead of re-evaluated.
+        """
+        github_url = self.validate_request(request)
         
+        # Every LLM call of this batch is fair-queued under this user and batch
+        with schedule_context(user_id=getattr(current_user, 'id', None), batch_id=str(uuid.uuid4()), priority=PRIORITY_BULK):
+            return await self._generate_content(request, current_user, db, github_url, progress_callback, checkpoints)
+    
+    async def _generate_content(self, request, current_user, db: Optional[Session], github_url: Optional[str], progress_callback: Optional[ProgressCallback], checkpoints: Optional[Dict] = None):
         try:
             file_contents = []
             file_paths_to_cleanup = []
@@ -165,64 +164,86 @@ class GenerateServiceComplete:
                     })
                     file_basenames.append(path_obj.stem)
             
-            for file_id in request.file_ids:
-                file_path = None
-                original_filename = None
-                for saved_file in UPLOAD_DIR.glob(f"{file_id}.*"):
-                    if saved_file.name == f"{file_id}.meta.json": continue
-                    file_path = saved_file
-                    break
-                
-                if not file_path: continue
-                
-                try:
-                    meta_path = UPLOAD_DIR / f"{file_id}.meta.json"
-                    if meta_path.exists():
-                        with open(meta_path, "r", encoding="utf-8") as m:
-                            md = json.load(m)
-                            original_filename = md.get("original_filename")
-                except Exception: pass
+            # One indexed manifest query for the batch, off the event loop
+            uploads = await asyncio.to_thread(UploadManifest.resolve_many, db, request.file_ids or [])
 
-                file_data = self.file_processor.read_file(str(file_path))
-                if original_filename: file_data['filename'] = original_filename
-                # determine display name (Student Name)
-                extracted_name = FileProcessor.extract_name_from_content(file_data.get('content', ''))
-                fallback_name = Path(original_filename or file_path.name).stem
-                
-                # Use extracted name if found, otherwise use filename
-                final_display_name = extracted_name if extracted_name else fallback_name
+            async def load_upload(file_id):
+                upload = uploads.get(file_id)
+                # Local copy of the stored object (downloaded when storage is remote)
+                file_path = await asyncio.to_thread(UploadManifest.local_path, upload)
+                if not file_path: return None
+                original_filename = upload['original_filename']
+
+                # Start from the upload-time artifact when one is ready (or still being extracted)
+                artifact = await self.preextraction.get(file_id, upload.get('sha256'))
+                if artifact:
+                    file_data = dict(artifact['file_data'])
+                    if artifact.get('qa_pairs') is not None:
+                        file_data['preextracted_qa_pairs'] = artifact['qa_pairs']
+                    final_display_name = artifact['display_name']
+                else:
+                    # Parsed in the extraction process pool, so files extract in parallel off the event loop
+                    file_data = await extraction_executor.read_file(str(file_path), upload.get('sha256'))
+                    if original_filename: file_data['filename'] = original_filename
+                    # determine display name (Student Name)
+                    extracted_name = FileProcessor.extract_name_from_content(file_data.get('content', ''))
+                    fallback_name = Path(original_filename or file_path.name).stem
+                    
+                    # Use extracted name if found, otherwise use filename
+                    final_display_name = extracted_name if extracted_name else fallback_name
                 
                 # IMPORTANT: Save back to file_data so it travels with the obj
                 file_data['display_name'] = final_display_name
-                
+                return file_id, file_path, file_data, final_display_name
+            
+            loaded_uploads = await asyncio.gather(*[load_upload(file_id) for file_id in request.file_ids])
+            for loaded in loaded_uploads:
+                if loaded is None: continue
+                file_id, file_path, file_data, final_display_name = loaded
                 file_contents.append(file_data)
                 file_paths_to_cleanup.append(file_path)
                 file_ids_by_index.append(file_id)
                 file_basenames.append(final_display_name)
             
             # PPT Logic
+            await self._notify(progress_callback, "batch_started", {
+                "files": [
+                    {"index": i, "file_id": file_ids_by_index[i] if i < len(file_ids_by_index) else None, "name": file_basenames[i] if i < len(file_basenames) else 'Unknown'}
+                    for i in range(len(file_contents))
+                ]
+            })
+            
             all_ppt_files = all(fd.get('file_type') == 'ppt' for fd in file_contents)
             if all_ppt_files and file_contents:
-                ppt_tasks = []
-                for i, fd in enumerate(file_contents):
-                    file_path = str(file_paths_to_cleanup[i])
-                    ppt_tasks.append(self._evaluate_single_ppt(fd, file_path, file_ids_by_index[i], request.title, request.description))
+                def ppt_failure_score(i, result):
+                    err_info = result.get("error") if isinstance(result, dict) else str(result)
+                    return {
+                        "name": file_contents[i].get('display_name', 'Unknown'),
+                        "file_id": file_ids_by_index[i],
+                        "score_percent": 0.0,
+                        "reasoning": "Evaluation could not be completed because the LLM service was temporarily unavailable. Please try again later.",
+                        "details": [],
+                        "error": err_info
+                    }
+                
+                async def evaluate_ppt_with_progress(i, fd):
+                    await self._notify(progress_callback, "file_started", {"index": i, "file_id": file_ids_by_index[i]})
+                    try:
+                        result = await self._evaluate_single_ppt(fd, str(file_paths_to_cleanup[i]), file_ids_by_index[i], request.title, request.description)
+                    except Exception as e:
+                        result = e
+                    failed = isinstance(result, Exception) or (isinstance(result, dict) and "error" in result and result.get("is_llm_fail"))
+                    await self._notify(progress_callback, "file_completed", {"index": i, "file_id": file_ids_by_index[i], "score": ppt_failure_score(i, result) if failed else result['score']})
+                    return result
                 
+                ppt_tasks = [evaluate_ppt_with_progress(i, fd) for i, fd in enumerate(file_contents)]
                 ppt_results = await asyncio.gather(*ppt_tasks, return_exceptions=True)
                 final_scores = []
                 final_result_parts = []
                 
                 for i, result in enumerate(ppt_results):
                     if isinstance(result, Exception) or (isinstance(result, dict) and "error" in result and result.get("is_llm_fail")):
-                        err_info = result.get("error") if isinstance(result, dict) else str(result)
-                        final_scores.append({
-                            "name": file_contents[i].get('display_name', 'Unknown'),
-                            "file_id": file_ids_by_index[i],
-                            "score_percent": 0.0,
-                            "reasoning": "Evaluation could not be completed because the LLM service was temporarily unavailable. Please try again later.",
-                            "details": [],
-                            "error": err_info
-                        })
+                        final_scores.append(ppt_failure_score(i, result))
                         final_result_parts.append(f"LLM Unavailable for {file_contents[i].get('filename')}")
                     else:
                         final_scores.append(result['score'])
@@ -234,20 +255,21 @@ class GenerateServiceComplete:
                 
                 return {"success": True, "result": "\n\n".join(final_result_parts), "scores": final_scores, "file_ids": file_ids_by_index, "assignment_id": assignment_id}
 
-            return await self.evaluate_with_complete_logic(request, file_contents, file_basenames, {}, file_ids_by_index, file_paths_to_cleanup, current_user, db)
+            return await self.evaluate_with_complete_logic(request, file_contents, file_basenames, {}, file_ids_by_index, file_paths_to_cleanup, current_user, db, progress_callback=progress_callback, checkpoints=checkpoints)
             
         except Exception as e:
             logger.error(f"Error: {e}", exc_info=True)
             from fastapi import HTTPException
             raise HTTPException(status_code=500, detail=str(e))
     
-    async def evaluate_with_complete_logic(self, request, file_contents, file_basenames, file_ids_map, file_ids_by_index, file_paths_to_cleanup=None, current_user=None, db: Optional[Session] = None):
+    async def evaluate_with_complete_logic(self, request, file_contents, file_basenames, file_ids_map, file_ids_by_index, file_paths_to_cleanup=None, current_user=None, db: Optional[Session] = None, progress_callback: Optional[ProgressCallback] = None, checkpoints: Optional[Dict] = None):
         """Standard evaluation with per-question deterministic logic & robust error handling."""
         try:
-            prepared = []
-            for idx, fd in enumerate(file_contents):
+            async def prepare_file(idx, fd):
                 content = str(fd.get('content', ''))
-                qa_pairs = await self.extract_qa_pairs(content)
+                qa_pairs = fd.get('preextracted_qa_pairs')
+                if qa_pairs is None:
+                    qa_pairs = await self.extract_qa_pairs(content)
                 
                 # FALLBACK: If no QA pairs were found (common for code files or simple essays),
                 # treat the entire content as a single answer to the assignment prompt.
@@ -262,35 +284,66 @@ class GenerateServiceComplete:
                 fd_copy['qa_pairs'] = qa_pairs
                 fd_copy['display_name'] = file_basenames[idx] if idx < len(file_basenames) else 'Unknown'
                 fd_copy['file_id'] = file_ids_by_index[idx] if idx < len(file_ids_by_index) else None
-                prepared.append(fd_copy)
+                return fd_copy
             
-            async def evaluate_file(fd):
+            async def evaluate_file(fd, idx):
                 details = []
                 qa_pairs = fd.get('qa_pairs', [])
                 
+                async def evaluate_question(question, answer, idx_q, number=None):
+                    unit_key = self.checkpoint_key(question, answer)
+                    checkpointed = checkpoints.get((idx, idx_q, unit_key)) if checkpoints else None
+                    if checkpointed is not None:
+                        return {"success": True, "response": checkpointed}
+                    
+                    res = await self.gemini_service.evaluate_one_qa(
+                        request.description, question, answer, question_index=idx_q,
+                        incremental=bool(getattr(request, 'incremental_regrade', False)),
+                        question_number=number
+                    )
+                    await self._notify(progress_callback, "question_completed", {
+                        "index": idx,
+                        "file_id": fd['file_id'],
+                        "question_index": idx_q,
+                        "unit_key": unit_key,
+                        "success": bool(res.get("success")),
+                        "detail": res.get("response") if res.get("success") else None,
+                        "error": res.get("error")
+                    })
+                    return res
+                
                 eval_tasks = []
                 for idx_q, qa in enumerate(qa_pairs, 1):
                     question = qa.get('question', '')
                     answer = qa.get('answer') or qa.get('student_answer', '')
-                    eval_tasks.append(self.gemini_service.evaluate_one_qa(request.description, question, answer, question_index=idx_q))
+                    eval_tasks.append(evaluate_question(question, answer, idx_q, qa.get('question_number')))
                 
                 eval_results = await asyncio.gather(*eval_tasks)
                 
-                for res in eval_results:
+                failed_questions = []
+                last_error = None
+                for idx_q, res in enumerate(eval_results, 1):
                     if not res.get("success"):
-                        # Graceful failure handling for LLM unavailability
-                        return {
-                            "name": fd['display_name'],
-                            "file_id": fd['file_id'],
-                            "score_percent": 0.0,
-                            "reasoning": "Evaluation could not be completed because the LLM service was temporarily unavailable. Please try again later.",
-                            "details": [],
-                            "error": res.get("error")
-                        }
+                        # Keep the questions that were graded; only the failed ones need a retry
+                        failed_questions.append(idx_q)
+                        last_error = res.get("error")
+                        continue
                     
                     detail_model = res.get("response")
                     details.append(detail_model)
                 
+                if failed_questions:
+                    # Graceful failure handling for LLM unavailability
+                    return {
+                        "name": fd['display_name'],
+                        "file_id": fd['file_id'],
+                        "score_percent": 0.0,
+                        "reasoning": f"Evaluation could not be completed because the LLM service was temporarily unavailable ({len(failed_questions)} of {len(qa_pairs)} questions not graded). Please try again later.",
+                        "details": details,
+                        "failed_questions": failed_questions,
+                        "error": last_error
+                    }
+                
                 score_percent = self.calculate_score_from_details(details)
                 return {
                     "name": fd['display_name'],
@@ -300,7 +353,20 @@ class GenerateServiceComplete:
                     "score_percent": score_percent,
                 }
 
-            file_tasks = [evaluate_file(fd) for fd in prepared]
+            # Pipeline: each file goes straight from extraction to grading, bounded per batch
+            file_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+
+            async def process_file(idx, fd):
+                async with file_semaphore:
+                    file_id = file_ids_by_index[idx] if idx < len(file_ids_by_index) else None
+                    await self._notify(progress_callback, "file_started", {"index": idx, "file_id": file_id})
+                    prepared = await prepare_file(idx, fd)
+                    await self._notify(progress_callback, "file_extracted", {"index": idx, "file_id": file_id, "total_questions": len(prepared['qa_pairs'])})
+                    score = await evaluate_file(prepared, idx)
+                    await self._notify(progress_callback, "file_completed", {"index": idx, "file_id": file_id, "score": score})
+                    return score
+
+            file_tasks = [process_file(idx, fd) for idx, fd in enumerate(file_contents)]
             final_scores = await asyncio.gather(*file_tasks)
             
             assignment_id = None
@@ -0,0 +1,436 @@
+"""
+Generation Job Service
+Runs /files/generate batches in a background worker pool with persisted, pollable progress.
+Jobs are claimed through a lease (worker_id + heartbeat_at) with a conditional UPDATE, so with
+several uvicorn workers or instances each job runs in exactly one place; stale leases are reclaimed.
+"""
+import os
+import json
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import GenerationJob, JobStatus, User, EvaluationCheckpoint, Assignment
+from schemas.schemas import GenerateRequest
+
+logger = logging.getLogger(__name__)
+
+# Number of batches processed concurrently per server instance
+JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", "2"))
+# A RUNNING job whose heartbeat is older than this is considered orphaned and re-claimed
+JOB_LEASE_SECONDS = int(os.getenv("GENERATION_JOB_LEASE_SECONDS", "60"))
+# How often the owning worker renews its lease and checks the row for cancellation
+JOB_HEARTBEAT_SECONDS = int(os.getenv("GENERATION_JOB_HEARTBEAT_SECONDS", "10"))
+# Idle workers poll the table for jobs queued elsewhere or with expired leases
+JOB_POLL_SECONDS = int(os.getenv("GENERATION_JOB_POLL_SECONDS", "5"))
+# Progress of a running job is written at most this often (its final state always is)
+JOB_PROGRESS_FLUSH_SECONDS = float(os.getenv("GENERATION_JOB_PROGRESS_FLUSH_SECONDS", "1"))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class _ProgressWriter:
+    """
+    Coalesces a running job's progress updates and checkpoints: the latest values and the new
+    checkpoint rows are written in one commit at most every JOB_PROGRESS_FLUSH_SECONDS (and as
+    soon as a file completes), in a worker thread, through the job's progress session.
+    Writes run in their own tasks under one lock, so cancelling the job never leaves the
+    session in use by a thread while another write starts.
+    """
+
+    def __init__(self, service: "JobService", db: Session, job_id: str):
+        self.service = service
+        self.db = db
+        self.job_id = job_id
+        self._values: Dict = {}
+        self._checkpoints: List[EvaluationCheckpoint] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def update(self, values: Dict, urgent: bool = False) -> None:
+        self._values.update(values)
+        self._schedule(urgent)
+
+    def add_checkpoint(self, checkpoint: EvaluationCheckpoint) -> None:
+        self._checkpoints.append(checkpoint)
+        self._schedule()
+
+    def _schedule(self, urgent: bool = False) -> None:
+        if self._task is None or self._task.done():
+            self._wake.clear()
+            self._task = asyncio.create_task(self._write_later())
+        if urgent:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        """Write everything pending now and wait until no write is in flight"""
+        while self._values or self._checkpoints or (self._task is not None and not self._task.done()):
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._write_later())
+            self._wake.set()
+            await asyncio.shield(self._task)
+        async with self._lock:
+            pass
+
+    async def _write_later(self) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=JOB_PROGRESS_FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        async with self._lock:
+            values, self._values = self._values, {}
+            checkpoints, self._checkpoints = self._checkpoints, []
+            if not values and not checkpoints:
+                return
+            try:
+                await asyncio.to_thread(self._write, values, checkpoints)
+            except Exception as e:
+                logger.warning(f"Progress update for generation job {self.job_id} failed: {e}")
+                await asyncio.to_thread(self.db.rollback)
+
+    def _write(self, values: Dict, checkpoints: List[EvaluationCheckpoint]) -> None:
+        # Checkpoints are kept even when the lease is gone: a resumed run reuses them
+        self.db.add_all(checkpoints)
+        if values:
+            self.service._update(self.db, self.job_id, values)  # commits the checkpoints too
+        else:
+            self.db.commit()
+
+
+class JobService:
+    """Background job queue for generate requests; job state lives in the generation_jobs table"""
+
+    def __init__(self, generate_service, workers: int = JOB_WORKERS):
+        self.generate_service = generate_service
+        self.workers = max(1, workers)
+        # Identifies this process as lease owner
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Wake-up hints for local workers; the table is the source of truth
+        self._queue: Optional[asyncio.Queue] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancel_requested: Set[str] = set()
+        self._worker_tasks = []
+
+    async def start(self):
+        """Start the worker pool. Jobs interrupted elsewhere are claimed once their lease expires."""
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        for _ in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker()))
+        logger.info(f"Generation job workers started ({self.workers}, worker id {self.worker_id}).")
+
+    def submit(self, db: Session, request: GenerateRequest, current_user: User) -> GenerationJob:
+        """Validate and persist a new job, then queue it"""
+        if self._queue is None:
+            # Checked before inserting, so no QUEUED row is left behind
+            raise HTTPException(status_code=503, detail="Job service is not running")
+        self.generate_service.validate_request(request)
+
+        job = GenerationJob(
+            id=str(uuid.uuid4()),
+            user_id=current_user.id,
+            status=JobStatus.QUEUED,
+            request_data=json.dumps(request.model_dump()),
+            total_files=len(request.file_ids),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get_job(self, db: Session, job_id: str, current_user: User) -> Optional[GenerationJob]:
+        return db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.user_id == current_user.id
+        ).first()
+
+    def cancel(self, db: Session, job: GenerationJob) -> bool:
+        """
+        Cancel a queued or running job. Returns False if the job already finished.
+        The row is marked CANCELLED here; a worker in another process sees that on its next heartbeat.
+        """
+        updated = db.query(GenerationJob).filter(
+            GenerationJob.id == job.id,
+            GenerationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+        ).update({GenerationJob.status: JobStatus.CANCELLED}, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+        if not updated:
+            return False
+        task = self._running.get(job.id)
+        if task:
+            self._cancel_requested.add(job.id)
+            task.cancel()
+        return True
+
+    def resume(self, db: Session, job: GenerationJob) -> bool:
+        """
+        Re-queue a finished job. Questions already checkpointed are reused, so only the
+        missing or failed (file, question) units are evaluated again.
+        """
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Job service is not running")
+        updated = db.query(GenerationJob).filter(
+            GenerationJob.id == job.id,
+            GenerationJob.status.notin_([JobStatus.QUEUED, JobStatus.RUNNING])
+        ).update({GenerationJob.status: JobStatus.QUEUED, GenerationJob.error: None,
+                  GenerationJob.worker_id: None, GenerationJob.heartbeat_at: None}, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+        if not updated:
+            return False
+        self._queue.put_nowait(job.id)
+        return True
+
+    @staticmethod
+    def to_dict(job: GenerationJob, include_result: bool = False) -> Dict:
+        progress = json.loads(job.progress_data) if job.progress_data else {"files": []}
+        data = {
+            "job_id": job.id,
+            "status": job.status.value if isinstance(job.status, JobStatus) else job.status,
+            "total_files": job.total_files,
+            "completed_files": job.completed_files,
+            "files": progress.get("files", []),
+            "partial_scores": [f["score"] for f in progress.get("files", []) if f.get("score")],
+            "incomplete_files": sum(1 for f in progress.get("files", []) if f.get("status") in ("incomplete", "failed")),
+            "assignment_id": job.assignment_id,
+            "error": job.error,
+            "created_at": job.created_at.strftime("%Y-%m-%d %H:%M:%S") if job.created_at else None,
+            "updated_at": job.updated_at.strftime("%Y-%m-%d %H:%M:%S") if job.updated_at else None,
+        }
+        if include_result:
+            data["result"] = json.loads(job.result_data) if job.result_data else None
+        return data
+
+
+    def _claim_next(self, db: Session) -> Optional[str]:
+        """
+        Claim the oldest QUEUED job, or a RUNNING one whose lease expired, with a conditional
+        UPDATE; only one worker's UPDATE matches. Returns the job id or None.
+        """
+        cutoff = _now() - timedelta(seconds=JOB_LEASE_SECONDS)
+        claimable = or_(
+            GenerationJob.status == JobStatus.QUEUED,
+            and_(GenerationJob.status == JobStatus.RUNNING,
+                 or_(GenerationJob.heartbeat_at.is_(None), GenerationJob.heartbeat_at < cutoff)),
+        )
+        candidates = db.query(GenerationJob.id).filter(claimable).order_by(GenerationJob.created_at).limit(self.workers * 2).all()
+        for (job_id,) in candidates:
+            claimed = db.query(GenerationJob).filter(GenerationJob.id == job_id, claimable).update({
+                GenerationJob.status: JobStatus.RUNNING,
+                GenerationJob.worker_id: self.worker_id,
+                GenerationJob.heartbeat_at: _now(),
+            }, synchronize_session=False)
+            db.commit()
+            if claimed:
+                return job_id
+        return None
+
+    def _update(self, db: Session, job_id: str, values: Dict) -> bool:
+        """Write job fields only while this worker still holds the RUNNING lease"""
+        updated = db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.worker_id == self.worker_id,
+            GenerationJob.status == JobStatus.RUNNING
+        ).update(values, synchronize_session=False)
+        db.commit()
+        return bool(updated)
+
+    async def _worker(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._queue.get(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            while True:
+                try:
+                    with SessionLocal() as db:
+                        job_id = self._claim_next(db)
+                except Exception as e:
+                    logger.error(f"Failed to claim a generation job: {e}")
+                    job_id = None
+                if job_id is None:
+                    break
+                await self._execute(job_id)
+
+    async def _execute(self, job_id: str):
+        task = asyncio.create_task(self._run_job(job_id))
+        self._running[job_id] = task
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        except Exception as e:
+            logger.error(f"Generation job {job_id} crashed: {e}", exc_info=True)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+
+    async def _heartbeat(self, job_id: str, task: asyncio.Task):
+        """Renew the lease; stop the job when its row was cancelled (possibly by another worker) or the lease was lost"""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                with SessionLocal() as db:
+                    renewed = db.query(GenerationJob).filter(
+                        GenerationJob.id == job_id,
+                        GenerationJob.worker_id == self.worker_id,
+                        GenerationJob.status == JobStatus.RUNNING
+                    ).update({GenerationJob.heartbeat_at: _now()}, synchronize_session=False)
+                    db.commit()
+                    status = None if renewed else db.query(GenerationJob.status).filter(GenerationJob.id == job_id).scalar()
+            except Exception as e:
+                logger.warning(f"Heartbeat for generation job {job_id} failed: {e}")
+                continue
+            if renewed:
+                continue
+            if status == JobStatus.CANCELLED:
+                self._cancel_requested.add(job_id)
+            else:
+                logger.warning(f"Generation job {job_id} lease lost (status {status}); stopping here.")
+            task.cancel()
+            return
+
+    async def _run_job(self, job_id: str):
+        # Progress and checkpoint commits use their own session, separate from the one
+        # generate_content saves the assignment with
+        with SessionLocal() as db, SessionLocal() as progress_db:
+            job = db.query(GenerationJob).filter(
+                GenerationJob.id == job_id,
+                GenerationJob.worker_id == self.worker_id
+            ).first()
+            if not job or job.status != JobStatus.RUNNING:
+                return
+
+            user = db.query(User).filter(User.id == job.user_id).first()
+            if not user:
+                await asyncio.to_thread(self._update, db, job_id, {GenerationJob.status: JobStatus.FAILED, GenerationJob.error: "User not found"})
+                return
+
+            progress = {"files": []}
+            previous_assignment_id = job.assignment_id
+            request_data = job.request_data
+            writer = _ProgressWriter(self, progress_db, job_id)
+            writer.update({
+                GenerationJob.completed_files: 0,
+                GenerationJob.error: None,
+                GenerationJob.progress_data: json.dumps(progress),
+            }, urgent=True)
+
+            # Graded questions from earlier (interrupted or partially failed) runs
+            checkpoints = {
+                (c.file_index, c.question_index, c.unit_key): json.loads(c.detail_data)
+                for c in db.query(EvaluationCheckpoint).filter(EvaluationCheckpoint.job_id == job_id).all()
+            }
+            if checkpoints:
+                logger.info(f"Resuming generation job {job_id} with {len(checkpoints)} checkpointed questions.")
+
+            async def on_progress(event: str, payload: Dict):
+                values = {}
+                urgent = event == "batch_started"
+                if event == "batch_started":
+                    progress["files"] = [dict(f, status="pending", score=None) for f in payload.get("files", [])]
+                    values[GenerationJob.total_files] = len(progress["files"])
+                else:
+                    idx = payload.get("index")
+                    if idx is None or idx >= len(progress["files"]):
+                        return
+                    entry = progress["files"][idx]
+                    if event == "file_started":
+                        entry["status"] = "extracting"
+                    elif event == "file_extracted":
+                        entry["status"] = "grading"
+                        entry["total_questions"] = payload.get("total_questions")
+                    elif event == "question_completed":
+                        # Checkpoint each graded question (written with the next progress batch)
+                        if not payload.get("success"):
+                            return
+                        key = (idx, payload.get("question_index"), payload.get("unit_key"))
+                        if key in checkpoints:
+                            return
+                        checkpoints[key] = payload.get("detail")
+                        writer.add_checkpoint(EvaluationCheckpoint(
+                            job_id=job_id,
+                            file_index=idx,
+                            file_id=payload.get("file_id"),
+                            question_index=payload.get("question_index"),
+                            unit_key=payload.get("unit_key"),
+                            detail_data=json.dumps(payload.get("detail"), default=str)
+                        ))
+                        return
+                    elif event == "file_completed":
+                        urgent = True
+                        score = payload.get("score") or {}
+                        if score.get("failed_questions"):
+                            entry["status"] = "incomplete"
+                        else:
+                            entry["status"] = "failed" if score.get("error") else "completed"
+                        entry["score"] = score
+                        values[GenerationJob.completed_files] = sum(
+                            1 for f in progress["files"] if f["status"] in ("completed", "incomplete", "failed")
+                        )
+                    else:
+                        return
+                values[GenerationJob.progress_data] = json.dumps(progress, default=str)
+                writer.update(values, urgent=urgent)
+
+            try:
+                request = GenerateRequest(**json.loads(request_data))
+                result = await self.generate_service.generate_content(request, user, db, progress_callback=on_progress, checkpoints=checkpoints)
+                await writer.flush()
+                assignment_id = result.get("assignment_id")
+                values = {
+                    GenerationJob.result_data: json.dumps(result, default=str),
+                    GenerationJob.assignment_id: assignment_id,
+                }
+                if result.get("success", False):
+                    values[GenerationJob.status] = JobStatus.COMPLETED
+                else:
+                    values[GenerationJob.status] = JobStatus.FAILED
+                    values[GenerationJob.error] = str(result.get("error"))
+                if not await asyncio.to_thread(self._update, db, job_id, values):
+                    logger.warning(f"Generation job {job_id} was cancelled or re-claimed; result not recorded.")
+                    return
+                if previous_assignment_id and assignment_id and previous_assignment_id != assignment_id:
+                    # A resumed run replaces the history record of the earlier, incomplete run
+                    previous = db.query(Assignment).filter(Assignment.id == previous_assignment_id).first()
+                    if previous:
+                        db.delete(previous)
+                        db.commit()
+            except asyncio.CancelledError:
+                await writer.flush()
+                db.rollback()
+                progress_db.rollback()
+                if job_id in self._cancel_requested:
+                    # cancel() already marked the row CANCELLED
+                    logger.info(f"Generation job {job_id} cancelled.")
+                else:
+                    # Shutdown or lost lease: hand the job back so another worker resumes it from its checkpoints
+                    await asyncio.to_thread(self._update, progress_db, job_id, {
+                        GenerationJob.status: JobStatus.QUEUED,
+                        GenerationJob.worker_id: None,
+                        GenerationJob.heartbeat_at: None,
+                    })
+                raise
+            except Exception as e:
+                await writer.flush()
+                db.rollback()
+                error = getattr(e, "detail", None) or str(e)
+                await asyncio.to_thread(self._update, db, job_id, {GenerationJob.status: JobStatus.FAILED, GenerationJob.error: error})
+                logger.error(f"Generation job {job_id} failed: {error}")
@@ -0,0 +1,140 @@
+"""
+Lazy Imports
+Registry of heavy optional libraries (PDF/Office parsers, OCR, pandas, the Gemini SDK) that are
+imported on first use instead of at startup. Whether a library is installed is checked without
+importing it; a library that is installed but fails to import counts as unavailable, so callers
+take their fallback path instead of failing inside extraction.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import importlib
+import importlib.util
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Stands in for a module; the real import happens on first attribute access or availability check"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._installed: Optional[bool] = None
+        self._import_error: Optional[Exception] = None
+        self._import_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def installed(self) -> bool:
+        """Whether the module is found on sys.path (cheap; does not import it)"""
+        if self._installed is None:
+            try:
+                self._installed = importlib.util.find_spec(self._name) is not None
+            except (ImportError, ValueError):
+                self._installed = False
+        return self._installed
+
+    @property
+    def available(self) -> bool:
+        """Whether the module can be used: installed and importable. Imports it on the first check."""
+        if self._module is not None:
+            return True
+        if not self.installed or self._import_error is not None:
+            return False
+        try:
+            self.load()
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    if self._import_error is not None:
+                        raise ImportError(f"{self._name} failed to import: {self._import_error}")
+                    start = time.perf_counter()
+                    try:
+                        module = importlib.import_module(self._name)
+                    except Exception as e:
+                        # Broken install (missing native library, incompatible version): treat as absent
+                        self._import_error = e
+                        logger.warning(f"{self._name} is installed but failed to import: {e}")
+                        raise ImportError(f"{self._name} failed to import: {e}") from e
+                    self._import_seconds = time.perf_counter() - start
+                    logger.info(f"Imported {self._name} on first use in {self._import_seconds:.2f}s")
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+    def stats(self) -> Dict:
+        return {
+            "installed": self.installed,
+            "loaded": self.loaded,
+            "import_error": str(self._import_error) if self._import_error is not None else None,
+            "import_seconds": round(self._import_seconds, 3) if self._import_seconds is not None else None,
+        }
+
+
+class LazyAvailable:
+    """
+    Availability flag for one or more lazy modules, e.g. PDF_AVAILABLE = lazy_available(PyPDF2).
+    Truthy only when every module imports; evaluated when tested, so defining it imports nothing.
+    """
+
+    def __init__(self, *modules: LazyModule):
+        self._modules = modules
+
+    def __bool__(self) -> bool:
+        return all(module.available for module in self._modules)
+
+    def __repr__(self) -> str:
+        return f"LazyAvailable({', '.join(m._name for m in self._modules)})"
+
+
+_registry: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Shared lazy handle for a module, e.g. pdfplumber = lazy_import("pdfplumber")"""
+    module = _registry.get(name)
+    if module is None:
+        module = _registry[name] = LazyModule(name)
+    return module
+
+
+def lazy_available(*modules: LazyModule) -> LazyAvailable:
+    """Flag that is true when all of modules are installed and import cleanly"""
+    return LazyAvailable(*modules)
+
+
+def import_stats() -> Dict[str, Dict]:
+    """Install state, load state, import errors and first-import time of every registered module"""
+    return {name: module.stats() for name, module in sorted(_registry.items())}
+
+
+def process_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (None where it cannot be read)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Peak RSS: kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except (ImportError, OSError):
+        return None
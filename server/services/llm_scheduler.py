@@ -0,0 +1,203 @@
+"""
+LLM Call Scheduler
+Hierarchical fair queuing for LLM calls: interactive before bulk, round-robin across users,
+round-robin across a user's batches, shortest-job-first inside a batch.
+"""
+import os
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0  # single-file /reevaluate, debug calls
+PRIORITY_BULK = 1         # /files/generate batches and jobs
+
+# In-flight limits per level
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+LLM_MAX_IN_FLIGHT_PER_USER = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_USER", "8"))
+LLM_MAX_IN_FLIGHT_PER_BATCH = int(os.getenv("LLM_MAX_IN_FLIGHT_PER_BATCH", "6"))
+# Slots bulk work can never take, so interactive calls start immediately
+LLM_INTERACTIVE_RESERVED = int(os.getenv("LLM_INTERACTIVE_RESERVED", "2"))
+
+
+class ScheduleContext:
+    """Who a unit of LLM work belongs to"""
+
+    def __init__(self, user_id: Optional[Any] = None, batch_id: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE):
+        self.user_id = user_id
+        self.batch_id = batch_id
+        self.priority = priority
+
+
+_current_context: ContextVar[Optional[ScheduleContext]] = ContextVar("llm_schedule_context", default=None)
+
+
+@contextmanager
+def schedule_context(user_id: Optional[Any] = None, batch_id: Optional[str] = None, priority: int = PRIORITY_INTERACTIVE):
+    """Attribute all LLM calls made inside this block (including spawned tasks) to a user/batch"""
+    token = _current_context.set(ScheduleContext(user_id, batch_id, priority))
+    try:
+        yield
+    finally:
+        _current_context.reset(token)
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Rough prompt size (~4 characters per token); used for shortest-job-first ordering"""
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, list):
+        return max(1, sum(len(p) // 4 if isinstance(p, str) else 1000 for p in contents))
+    return 1
+
+
+class FairScheduler:
+    """Grants LLM call slots fairly across users and batches with bounded in-flight work per level"""
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, max_per_user: int = LLM_MAX_IN_FLIGHT_PER_USER,
+                 max_per_batch: int = LLM_MAX_IN_FLIGHT_PER_BATCH, interactive_reserved: int = LLM_INTERACTIVE_RESERVED):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_per_user = max(1, max_per_user)
+        self.max_per_batch = max(1, max_per_batch)
+        self.interactive_reserved = min(max(0, interactive_reserved), self.max_in_flight - 1)
+
+        # lane (priority) -> user -> batch -> heap of (cost, seq, future)
+        self._lanes: Dict[int, "OrderedDict[Any, OrderedDict[Any, list]]"] = {
+            PRIORITY_INTERACTIVE: OrderedDict(),
+            PRIORITY_BULK: OrderedDict(),
+        }
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._user_in_flight: Dict[Any, int] = {}
+        self._batch_in_flight: Dict[Any, int] = {}
+        self._granted = 0
+        # In-flight calls never exceed max_in_flight, so neither do the threads running them
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="llm-call")
+
+    async def run(self, func: Callable[[], Any], cost: int = 1) -> Any:
+        """
+        Run a blocking LLM call on the scheduler's thread pool while holding one slot.
+        The slot is released when the call itself finishes, not when the awaiting coroutine
+        does, so cancelled callers (SSE disconnects, job cancels) cannot push the number of
+        calls actually in flight past the limits.
+        """
+        ctx = _current_context.get() or ScheduleContext()
+        await self._acquire(ctx, cost)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func)
+        except BaseException:
+            self._release(ctx)
+            raise
+        # Runs in the worker thread (or in the loop, if a queued call is cancelled before it starts)
+        future.add_done_callback(lambda _: self._release_threadsafe(loop, ctx))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, ctx: ScheduleContext):
+        try:
+            loop.call_soon_threadsafe(self._release, ctx)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+    async def _acquire(self, ctx: ScheduleContext, cost: int):
+        future = asyncio.get_running_loop().create_future()
+        lane = self._lanes[ctx.priority if ctx.priority in self._lanes else PRIORITY_BULK]
+        batches = lane.setdefault(ctx.user_id, OrderedDict())
+        heapq.heappush(batches.setdefault(ctx.batch_id, []), (cost, next(self._seq), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted at the same moment the caller was cancelled: give the slot back
+                self._release(ctx)
+            raise
+
+    def _release(self, ctx: ScheduleContext):
+        self._in_flight -= 1
+        self._decrement(self._user_in_flight, ctx.user_id)
+        self._decrement(self._batch_in_flight, (ctx.user_id, ctx.batch_id))
+        self._dispatch()
+
+    @staticmethod
+    def _decrement(counter: Dict, key):
+        counter[key] = counter.get(key, 1) - 1
+        if counter[key] <= 0:
+            counter.pop(key, None)
+
+    def _dispatch(self):
+        while self._in_flight < self.max_in_flight:
+            if not self._grant_next():
+                break
+
+    def _grant_next(self) -> bool:
+        for priority, lane in self._lanes.items():
+            if priority == PRIORITY_BULK and self._in_flight >= self.max_in_flight - self.interactive_reserved:
+                continue
+            for user_id in list(lane.keys()):
+                batches = lane[user_id]
+                if priority == PRIORITY_BULK and self._user_in_flight.get(user_id, 0) >= self.max_per_user:
+                    continue
+                for batch_id in list(batches.keys()):
+                    heap = batches[batch_id]
+                    # Drop waiters that were cancelled while queued
+                    while heap and heap[0][2].done():
+                        heapq.heappop(heap)
+                    if not heap:
+                        del batches[batch_id]
+                        continue
+                    if priority == PRIORITY_BULK and self._batch_in_flight.get((user_id, batch_id), 0) >= self.max_per_batch:
+                        continue
+
+                    _, _, future = heapq.heappop(heap)
+                    if not heap:
+                        del batches[batch_id]
+                    else:
+                        batches.move_to_end(batch_id)
+                    if not batches:
+                        del lane[user_id]
+                    else:
+                        lane.move_to_end(user_id)
+
+                    self._in_flight += 1
+                    self._granted += 1
+                    self._user_in_flight[user_id] = self._user_in_flight.get(user_id, 0) + 1
+                    self._batch_in_flight[(user_id, batch_id)] = self._batch_in_flight.get((user_id, batch_id), 0) + 1
+                    future.set_result(True)
+                    return True
+                if user_id in lane and not lane[user_id]:
+                    del lane[user_id]
+        return False
+
+    def get_stats(self) -> Dict:
+        waiting = {
+            "interactive" if priority == PRIORITY_INTERACTIVE else "bulk": sum(
+                sum(1 for item in heap if not item[2].done()) for batches in lane.values() for heap in batches.values()
+            )
+            for priority, lane in self._lanes.items()
+        }
+        return {
+            "in_flight": self._in_flight,
+            "waiting": waiting,
+            "active_users": len(self._user_in_flight),
+            "active_batches": len(self._batch_in_flight),
+            "total_granted": self._granted,
+            "limits": {
+                "max_in_flight": self.max_in_flight,
+                "max_per_user": self.max_per_user,
+                "max_per_batch": self.max_per_batch,
+                "interactive_reserved": self.interactive_reserved,
+            },
+        }
+
+
+# Shared by every GeminiService instance in this process
+llm_scheduler = FairScheduler()
@@ -0,0 +1,123 @@
+"""
+NVIDIA OCR Client
+Keep-alive HTTP client for the NVIDIA OCR endpoint: pooled connections, retry with backoff,
+bounded concurrency and optional multi-image batch payloads.
+"""
+import os
+import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .lazy_imports import lazy_import
+
+# Only needed when NVIDIA OCR is configured
+requests = lazy_import("requests")
+urllib3_retry = lazy_import("urllib3.util.retry")
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests to the endpoint (also the connection pool size)
+NVIDIA_OCR_CONCURRENCY = int(os.getenv("NVIDIA_OCR_CONCURRENCY", "4"))
+# Images per request; 1 sends the original single-image payload
+NVIDIA_OCR_BATCH_SIZE = int(os.getenv("NVIDIA_OCR_BATCH_SIZE", "1"))
+NVIDIA_OCR_MAX_RETRIES = int(os.getenv("NVIDIA_OCR_MAX_RETRIES", "3"))
+NVIDIA_OCR_BACKOFF_SECONDS = float(os.getenv("NVIDIA_OCR_BACKOFF_SECONDS", "0.5"))
+NVIDIA_OCR_TIMEOUT_SECONDS = float(os.getenv("NVIDIA_OCR_TIMEOUT_SECONDS", "60"))
+
+
+class NvidiaOCRClient:
+    """Thread-safe OCR client; one instance per process reuses its TLS connections"""
+
+    def __init__(self, url: str, api_key: str, concurrency: int = NVIDIA_OCR_CONCURRENCY,
+                 batch_size: int = NVIDIA_OCR_BATCH_SIZE, max_retries: int = NVIDIA_OCR_MAX_RETRIES,
+                 backoff: float = NVIDIA_OCR_BACKOFF_SECONDS, timeout: float = NVIDIA_OCR_TIMEOUT_SECONDS):
+        self.url = url
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.timeout = (min(10.0, timeout), timeout)
+
+        retry = urllib3_retry.Retry(
+            total=max_retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="nvidia-ocr")
+
+    @staticmethod
+    def _text_from(data) -> Optional[str]:
+        if isinstance(data, str):
+            text = data
+        elif isinstance(data, dict):
+            text = data.get('text') or data.get('result') or ''
+        else:
+            return None
+        return text if text and text.strip() else None
+
+    def _post(self, payload: Dict) -> Optional[Dict]:
+        try:
+            resp = self.session.post(self.url, json=payload, timeout=self.timeout)
+            if resp.status_code == 200:
+                return resp.json()
+            logger.warning(f"NVIDIA OCR returned HTTP {resp.status_code}")
+        except Exception as e:
+            logger.warning(f"NVIDIA OCR request failed: {e}")
+        return None
+
+    def ocr(self, image_bytes: bytes) -> Optional[str]:
+        """OCR one image; None if the endpoint returned no text"""
+        data = self._post({"image": base64.b64encode(image_bytes).decode('utf-8')})
+        return self._text_from(data) if data is not None else None
+
+    def _ocr_batch(self, images: List[bytes]) -> List[Optional[str]]:
+        if len(images) == 1:
+            return [self.ocr(images[0])]
+        data = self._post({"images": [base64.b64encode(b).decode('utf-8') for b in images]})
+        results = None
+        if isinstance(data, dict):
+            results = data.get('results') or data.get('texts')
+        if isinstance(results, list) and len(results) == len(images):
+            return [self._text_from(r) for r in results]
+        # Endpoint does not support batches (or failed): one image per request
+        return [self.ocr(b) for b in images]
+
+    def ocr_many(self, images: List[bytes]) -> List[Optional[str]]:
+        """OCR images concurrently (batched when NVIDIA_OCR_BATCH_SIZE > 1); keeps input order"""
+        batches = [images[i:i + self.batch_size] for i in range(0, len(images), self.batch_size)]
+        results: List[Optional[str]] = []
+        for batch_result in self._pool.map(self._ocr_batch, batches):
+            results.extend(batch_result)
+        return results
+
+
+_client: Optional[NvidiaOCRClient] = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def get_nvidia_ocr_client() -> Optional[NvidiaOCRClient]:
+    """Shared client for this process, or None when NVIDIA_OCR_URL / NVIDIA_OCR_API_KEY are unset"""
+    global _client, _client_key
+    url, api_key = os.getenv('NVIDIA_OCR_URL'), os.getenv('NVIDIA_OCR_API_KEY')
+    if not url or not api_key:
+        return None
+    # Sessions are not shared across forked extraction workers
+    key = (url, api_key, os.getpid())
+    with _client_lock:
+        if _client is None or _client_key != key:
+            _client = NvidiaOCRClient(url, api_key)
+            _client_key = key
+        return _client
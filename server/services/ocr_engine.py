@@ -0,0 +1,92 @@
+"""
+OCR Engine
+Parallel OCR for page images: pooled/batched NVIDIA OCR requests when configured, otherwise
+(or for pages NVIDIA could not read) a pool of tesseract processes. Results keep page order.
+"""
+import os
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence
+
+from .nvidia_ocr_client import get_nvidia_ocr_client
+from .lazy_imports import lazy_import, lazy_available
+
+pytesseract = lazy_import("pytesseract")
+PYTESSERACT_AVAILABLE = lazy_available(pytesseract)
+
+logger = logging.getLogger(__name__)
+
+# Concurrent tesseract processes per extraction process (0 = its share of the CPUs, see OCREngine)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+# Seconds tesseract may spend on one page before it is killed
+OCR_PAGE_TIMEOUT_SECONDS = float(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", "120"))
+
+# Page image (PIL image) or encoded image bytes (e.g. DOCX media)
+PageImage = Any
+
+
+class OCREngine:
+    """
+    OCRs a window of pages in parallel.
+
+    pytesseract runs one tesseract process per call, so a thread pool here keeps several
+    tesseract processes busy without a second process pool inside the extraction workers.
+    Every extraction worker has its own engine, so each gets an equal share of the CPUs
+    (available CPUs / extraction workers, at least 1) and the host total stays at about one
+    tesseract per core. The extraction pool initializer pins tesseract's OpenMP threading to
+    one thread per process.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, page_timeout: float = OCR_PAGE_TIMEOUT_SECONDS):
+        self.page_timeout = page_timeout
+        if workers <= 0:
+            # Imported here: extraction_executor imports this module through file_processor
+            from .extraction_executor import available_cpus, EXTRACTION_WORKERS
+            workers = available_cpus() // max(1, EXTRACTION_WORKERS)
+        self.workers = max(1, workers)
+        self._tesseract_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-tesseract")
+
+    @staticmethod
+    def _to_png_bytes(image: PageImage) -> bytes:
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        buf = io.BytesIO()
+        image.save(buf, format='PNG')
+        return buf.getvalue()
+
+    def _tesseract(self, image: PageImage) -> Optional[str]:
+        try:
+            if isinstance(image, (bytes, bytearray)):
+                from PIL import Image
+                image = Image.open(io.BytesIO(image))
+            text = pytesseract.image_to_string(image, timeout=self.page_timeout)
+            return text if text and text.strip() else None
+        except RuntimeError as e:
+            # pytesseract raises RuntimeError when the timeout kills tesseract
+            logger.warning(f"Tesseract page OCR failed or timed out: {e}")
+            return None
+        except Exception:
+            return None
+
+    def ocr_images(self, images: Sequence[PageImage]) -> List[Optional[str]]:
+        """OCR every image concurrently; result i is the text of images[i] (None if unreadable)"""
+        results: List[Optional[str]] = [None] * len(images)
+        pending = list(range(len(images)))
+
+        nvidia = get_nvidia_ocr_client()
+        if nvidia and pending:
+            try:
+                # PNG encoding runs in parallel; the client pools, batches and retries requests
+                encoded = list(self._tesseract_pool.map(self._to_png_bytes, [images[i] for i in pending]))
+                for i, text in zip(pending, nvidia.ocr_many(encoded)):
+                    results[i] = text
+            except Exception as e:
+                logger.warning(f"NVIDIA OCR failed, falling back to tesseract: {e}")
+            pending = [i for i in pending if not results[i]]
+
+        if PYTESSERACT_AVAILABLE and pending:
+            for i, text in zip(pending, self._tesseract_pool.map(self._tesseract, [images[i] for i in pending])):
+                results[i] = text
+
+        return results
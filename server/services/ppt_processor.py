@@ -6,22 +6,19 @@ import base64
 from pathlib import Path
 from typing import Dict, List, Optional
 
-# Optional import for PPTX processing
-try:
-    from pptx import Presentation
-    PPTX_AVAILABLE = True
-except ImportError:
-    PPTX_AVAILABLE = False
+from .lazy_imports import lazy_import, lazy_available
+
+# Optional import for PPTX processing (imported on first use)
+pptx = lazy_import("pptx")
+PPTX_AVAILABLE = lazy_available(pptx)
+if not pptx.installed:
     import logging
     logger = logging.getLogger(__name__)
     logger.warning("python-pptx library not available. Install with: pip install python-pptx")
 
 # Optional import for legacy PPT files (requires comtypes on Windows)
-try:
-    import comtypes.client
-    COMTYPES_AVAILABLE = True
-except ImportError:
-    COMTYPES_AVAILABLE = False
+comtypes_client = lazy_import("comtypes.client")
+COMTYPES_AVAILABLE = lazy_available(comtypes_client)
 
 
 class PPTProcessor:
@@ -54,7 +51,7 @@ class PPTProcessor:
             logger = logging.getLogger(__name__)
             logger.info(f"Attempting to extract text from PPTX file: {file_path}")
             
-            prs = Presentation(file_path)
+            prs = pptx.Presentation(file_path)
             slides_text = []
             slide_details = []
             
@@ -148,7 +145,7 @@ class PPTProcessor:
             }
         
         try:
-            powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
+            powerpoint = comtypes_client.CreateObject("PowerPoint.Application")
             powerpoint.Visible = 1
             
             try:
@@ -245,7 +242,7 @@ class PPTProcessor:
             logger = logging.getLogger(__name__)
             logger.info(f"Converting PPTX slides to images: {file_path}")
             
-            prs = Presentation(file_path)
+            prs = pptx.Presentation(file_path)
             slide_images = []
             
             # Try to use COM automation on Windows to export slides as images
@@ -255,7 +252,7 @@ class PPTProcessor:
                     import os
                     temp_dir = tempfile.mkdtemp()
                     
-                    powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
+                    powerpoint = comtypes_client.CreateObject("PowerPoint.Application")
                     powerpoint.Visible = 0  # Don't show PowerPoint
                     
                     try:
@@ -329,7 +326,7 @@ class PPTProcessor:
                     temp_dir = tempfile.mkdtemp()
                     slide_images = []
                     
-                    powerpoint = comtypes.client.CreateObject("PowerPoint.Application")
+                    powerpoint = comtypes_client.CreateObject("PowerPoint.Application")
                     powerpoint.Visible = 0
                     
                     try:
@@ -394,7 +391,7 @@ class PPTProcessor:
             logger = logging.getLogger(__name__)
             logger.info(f"Extracting design metadata from PPTX file: {file_path}")
             
-            prs = Presentation(file_path)
+            prs = pptx.Presentation(file_path)
             design_details = []
             design_parts = []
             
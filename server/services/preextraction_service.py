@@ -0,0 +1,123 @@
+"""
+Pre-Extraction Service
+Extracts uploaded files in the background right after /files/upload so that /files/generate
+starts from ready artifacts (text, file type, display name and optionally QA pairs).
+"""
+import os
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Callable, Awaitable
+
+from .file_processor import FileProcessor
+from .determinism_config import EvaluationCache
+from .llm_scheduler import schedule_context, PRIORITY_BULK
+from .extraction_executor import extraction_executor
+
+logger = logging.getLogger(__name__)
+
+# Upload extractions running at the same time
+PREEXTRACT_MAX_CONCURRENT = int(os.getenv("PREEXTRACT_MAX_CONCURRENT", "2"))
+# Also run QA extraction (may call the LLM) at upload time
+PREEXTRACT_QA = os.getenv("PREEXTRACT_QA", "false").lower() in ("1", "true", "yes")
+
+ARTIFACT_CACHE_TYPE = "upload_extraction"
+
+QAExtractor = Callable[[str], Awaitable[List[Dict]]]
+
+
+class PreExtractionService:
+    """Schedules upload-time extraction and hands the artifacts to generate / re-evaluate"""
+
+    # Shared across instances so every service sees extractions still in flight
+    _pending: Dict[str, asyncio.Task] = {}
+    _semaphore: Optional[asyncio.Semaphore] = None
+
+    def __init__(self, file_processor: Optional[FileProcessor] = None, qa_extractor: Optional[QAExtractor] = None):
+        self.file_processor = file_processor or FileProcessor()
+        self.qa_extractor = qa_extractor
+
+    def schedule(self, file_id: str, file_path: str, original_filename: Optional[str] = None, user_id=None,
+                 sha256: Optional[str] = None) -> None:
+        """Queue background extraction for a freshly uploaded file (sha256: its manifest content hash)"""
+        if file_id in PreExtractionService._pending:
+            return
+        task = asyncio.create_task(self._run(file_id, file_path, original_filename, user_id, sha256))
+        PreExtractionService._pending[file_id] = task
+        task.add_done_callback(lambda _: PreExtractionService._pending.pop(file_id, None))
+
+    async def get(self, file_id: str, sha256: Optional[str] = None) -> Optional[Dict]:
+        """
+        Artifact for a file: waits for an extraction still in flight, otherwise reads the stored one.
+        sha256 is the upload's manifest hash; an artifact extracted from other content, or by
+        another FileProcessor.EXTRACTOR_VERSION, is ignored.
+        Returns None when nothing usable exists; callers then extract inline as before.
+        """
+        task = PreExtractionService._pending.get(file_id)
+        if task is not None:
+            try:
+                # Shielded: a cancelled generate must not cancel the shared extraction
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                return None
+
+        artifact = EvaluationCache.get(file_id, eval_type=ARTIFACT_CACHE_TYPE)
+        if not artifact:
+            return None
+        # Keyed on content, not on the local path / mtime (blob paths and cached copies change)
+        if not sha256 or artifact.get("sha256") != sha256:
+            return None
+        if artifact.get("extractor_version") != FileProcessor.EXTRACTOR_VERSION:
+            return None
+        return artifact
+
+    @staticmethod
+    def discard(file_id: str) -> None:
+        """Drop a file's artifact (it holds student text); called when the upload expires"""
+        EvaluationCache.delete(file_id, eval_type=ARTIFACT_CACHE_TYPE)
+
+    @staticmethod
+    def purge_expired(max_age_seconds: float) -> int:
+        """Drop artifacts older than the upload retention period. Returns count removed."""
+        return EvaluationCache.purge_older_than(ARTIFACT_CACHE_TYPE, max_age_seconds)
+
+    async def _run(self, file_id: str, file_path: str, original_filename: Optional[str], user_id, sha256: Optional[str]) -> None:
+        if PreExtractionService._semaphore is None:
+            PreExtractionService._semaphore = asyncio.Semaphore(max(1, PREEXTRACT_MAX_CONCURRENT))
+
+        async with PreExtractionService._semaphore:
+            try:
+                file_data = await extraction_executor.read_file(file_path, sha256)
+                if file_data.get('file_type') == 'error':
+                    # Leave failures (e.g. timeouts) to be retried at generate time
+                    logger.warning(f"Pre-extraction of {file_id} failed: {file_data.get('content')}")
+                    return
+                if not file_data.get('metadata', {}).get('complete'):
+                    # e.g. an OCR page failed: keep it out, generate extracts again
+                    logger.warning(f"Pre-extraction of {file_id} is incomplete; not stored.")
+                    return
+                if original_filename:
+                    file_data['filename'] = original_filename
+
+                extracted_name = FileProcessor.extract_name_from_content(file_data.get('content', ''))
+                display_name = extracted_name or Path(original_filename or file_path).stem
+                file_data['display_name'] = display_name
+
+                qa_pairs = None
+                if PREEXTRACT_QA and self.qa_extractor and file_data.get('file_type') != 'ppt':
+                    # Upload-time QA extraction competes with grading as bulk work
+                    with schedule_context(user_id=user_id, batch_id=f"preextract:{file_id}", priority=PRIORITY_BULK):
+                        qa_pairs = await self.qa_extractor(str(file_data.get('content', '')))
+
+                EvaluationCache.set(file_id, {
+                    "file_data": file_data,
+                    "display_name": display_name,
+                    "qa_pairs": qa_pairs,
+                    "sha256": sha256,
+                    "extractor_version": FileProcessor.EXTRACTOR_VERSION,
+                }, eval_type=ARTIFACT_CACHE_TYPE)
+                logger.info(f"Pre-extracted upload {file_id} ({file_data.get('file_type')}, qa_pairs={'yes' if qa_pairs is not None else 'no'}).")
+            except Exception as e:
+                logger.warning(f"Pre-extraction failed for {file_id}: {e}. It will be extracted at generate time.")
@@ -0,0 +1,377 @@
+"""
+Local QA Extractor
+Deterministic, regex-based Question/Answer extraction with a confidence score.
+Runs before the LLM extractor so clearly structured documents skip the LLM call.
+"""
+import re
+import hashlib
+import threading
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .determinism_config import DeterministicEvalConfig
+
+logger = logging.getLogger(__name__)
+
+# "Q1:", "Q.", "Q)", "Question 2:", "Ques 3.", "Qus-4"
+QUESTION_MARKER_RE = re.compile(r"^\s*Q(?:uestion|ues|us)?\s*\.?\s*(\d+)?\s*[:\.\)\-]\s*", flags=re.IGNORECASE)
+# "Q1 What is..." (number directly after Q, no punctuation)
+QUESTION_NUMBER_RE = re.compile(r"^\s*Q(\d+)\s+", flags=re.IGNORECASE)
+# "Ans:", "Answer 1.", "A:" (a bare "A" needs a colon so MCQ options like "A)" are not answers)
+ANSWER_MARKER_RE = re.compile(r"^\s*(?:(?:Answer|Ans)\s*\.?\s*\d*\s*[:\.\)\-]|A\s*\d*\s*:)\s*", flags=re.IGNORECASE)
+INLINE_ANSWER_RE = re.compile(r"\s(?:Answer|Ans)\s*[:\.\-]\s*", flags=re.IGNORECASE)
+
+# Heuristic patterns (loose format: numbered lines, "?" lines, "Answer" anywhere)
+HEURISTIC_QUESTION_RE = re.compile(r"^\s*(?:Question\b[:\s]*|Q\d*[:\s]*|Q\d+\b|\d+\s*[\.)\-:])", flags=re.IGNORECASE)
+HEURISTIC_STRIP_RE = re.compile(r"^\s*(?:Question\b[:\s]*|Q\d*[:\s]*|\d+\s*[\.)\-:]\s*)", flags=re.IGNORECASE)
+HEURISTIC_ANSWER_RE = re.compile(r"\bAnswer\b[:\s]*", flags=re.IGNORECASE)
+# "2. What is Z?", "3) Explain..." inside an answer (a numbered question without a Q marker)
+EMBEDDED_QUESTION_RE = re.compile(r"^\s*\d+\s*[\.\)]\s+\S")
+
+
+class LocalQAExtractor:
+    """Unified local extractor returning QA pairs, detected format and a confidence score (0.0-1.0)"""
+
+    # Detected formats, most to least structured
+    FORMAT_QA_LABELED = "qa_labeled"      # Q markers with explicit answer markers
+    FORMAT_Q_LABELED = "q_labeled"        # Q markers, answers are the text that follows
+    FORMAT_TABULAR = "tabular"            # Tab separated question/answer rows
+    FORMAT_HEURISTIC = "heuristic"        # Numbered / "?" lines
+    FORMAT_NONE = "none"
+
+    _stats_lock = threading.Lock()
+    _stats: Dict[str, Dict[str, int]] = {}
+
+    def extract(self, text: str) -> Dict:
+        """
+        Extract QA pairs locally.
+        Returns dict with qa_pairs, format and confidence.
+        """
+        if not text or not isinstance(text, str) or not text.strip():
+            return {"qa_pairs": [], "format": self.FORMAT_NONE, "confidence": 0.0}
+
+        lines = [l.rstrip() for l in text.splitlines()]
+
+        pairs, answered, numbers = self._extract_labeled(lines)
+        if pairs:
+            if answered == len(pairs):
+                # Only a run of at least two sequentially numbered pairs is trusted enough to skip the LLM;
+                # a single "Q" marker may be prose ("Q-learning") or the one labeled question of a mixed list
+                confidence = 0.95 if len(pairs) >= 2 and self._is_sequential(numbers) else 0.7
+                if any(not p["is_answer_present"] for p in pairs):
+                    confidence -= 0.1
+                if any(self._has_embedded_question(p["student_answer"]) for p in pairs):
+                    confidence = min(confidence, 0.6)
+                return {"qa_pairs": pairs, "format": self.FORMAT_QA_LABELED, "confidence": round(confidence, 2)}
+
+            confidence = 0.5 + 0.3 * (answered / len(pairs))
+            return {"qa_pairs": pairs, "format": self.FORMAT_Q_LABELED, "confidence": round(confidence, 2)}
+
+        pairs, table_rows = self._extract_heuristic(lines)
+        if pairs:
+            if table_rows == len(pairs):
+                return {"qa_pairs": pairs, "format": self.FORMAT_TABULAR, "confidence": 0.5}
+            return {"qa_pairs": pairs, "format": self.FORMAT_HEURISTIC, "confidence": 0.3}
+
+        return {"qa_pairs": [], "format": self.FORMAT_NONE, "confidence": 0.0}
+
+    @staticmethod
+    def _make_pair(question: str, answer: Optional[str], number: Optional[int] = None) -> Dict:
+        answer = (answer or "").strip()
+        return {
+            "question": question.strip(),
+            "answer": answer or None,
+            "student_answer": answer,
+            "is_answer_present": bool(answer),
+            "question_number": number,
+        }
+
+    @staticmethod
+    def _has_embedded_question(answer: str) -> bool:
+        """Numbered lines or lines ending in '?' inside an answer: questions the markers missed"""
+        return any(EMBEDDED_QUESTION_RE.match(line) or line.rstrip().endswith('?') for line in answer.splitlines())
+
+    @staticmethod
+    def _is_sequential(numbers: List[Optional[int]]) -> bool:
+        if not numbers or any(n is None for n in numbers):
+            return False
+        return numbers == list(range(numbers[0], numbers[0] + len(numbers)))
+
+    def _extract_labeled(self, lines: List[str]):
+        """Q-marker based extraction. Returns (pairs, number of pairs with answer markers, question numbers)."""
+        pairs = []
+        numbers = []
+        answered = 0
+        current = None
+
+        def flush():
+            nonlocal answered
+            if current is None:
+                return
+            if current["has_marker"]:
+                answered += 1
+                question = "\n".join(current["q_lines"]).strip()
+                answer = "\n".join(current["a_lines"])
+            else:
+                # No answer marker: first line is the question, the rest is the answer
+                q_lines = current["q_lines"]
+                question = q_lines[0].strip() if q_lines else ""
+                answer = "\n".join(q_lines[1:])
+            if question:
+                pairs.append(self._make_pair(question, answer, current["number"]))
+                numbers.append(current["number"])
+
+        for line in lines:
+            match = QUESTION_MARKER_RE.match(line) or QUESTION_NUMBER_RE.match(line)
+            if match:
+                flush()
+                rest = line[match.end():]
+                current = {
+                    "number": int(match.group(1)) if match.group(1) else None,
+                    "q_lines": [],
+                    "a_lines": [],
+                    "has_marker": False,
+                }
+                inline = INLINE_ANSWER_RE.search(rest)
+                if inline:
+                    current["q_lines"].append(rest[:inline.start()])
+                    current["a_lines"].append(rest[inline.end():])
+                    current["has_marker"] = True
+                else:
+                    current["q_lines"].append(rest)
+                continue
+
+            if current is None:
+                # Preamble (name, roll number, title...)
+                continue
+
+            if not current["has_marker"]:
+                answer_match = ANSWER_MARKER_RE.match(line)
+                if answer_match:
+                    current["has_marker"] = True
+                    current["a_lines"].append(line[answer_match.end():])
+                    continue
+                current["q_lines"].append(line)
+            else:
+                current["a_lines"].append(line)
+
+        flush()
+        return pairs, answered, numbers
+
+    def _extract_heuristic(self, lines: List[str]):
+        """
+        Loose extraction: tab separated table rows, numbered lines, lines containing '?'
+        and optional 'Answer' markers. Returns (pairs, number of pairs taken from table rows).
+        """
+        qa = []
+        table_rows = 0
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            if not line:
+                i += 1
+                continue
+            if '\t' in line:
+                cells = [c.strip() for c in line.split('\t')]
+                lc = [c.lower() for c in cells]
+                if any('question' in c for c in lc) or any('answer' in c for c in lc) or any('q' == c for c in lc):
+                    qa.append(self._make_pair(cells[0], cells[1] if len(cells) > 1 else ''))
+                    table_rows += 1
+                    i += 1
+                    continue
+            if HEURISTIC_QUESTION_RE.search(line) or '?' in line:
+                qtext = HEURISTIC_STRIP_RE.sub('', line)
+                ans_lines = []
+                j = i + 1
+                while j < len(lines):
+                    l = lines[j].strip()
+                    if not l:
+                        j += 1
+                        if j < len(lines) and HEURISTIC_QUESTION_RE.search(lines[j]):
+                            break
+                        continue
+                    if HEURISTIC_QUESTION_RE.search(l):
+                        break
+                    if HEURISTIC_ANSWER_RE.search(l):
+                        a = HEURISTIC_ANSWER_RE.sub('', l).strip()
+                        if a:
+                            ans_lines.append(a)
+                        j += 1
+                        while j < len(lines) and not HEURISTIC_QUESTION_RE.search(lines[j]):
+                            if lines[j].strip():
+                                ans_lines.append(lines[j].strip())
+                            j += 1
+                        break
+                    ans_lines.append(l)
+                    j += 1
+                qa.append(self._make_pair(qtext.strip() or line, ' '.join(ans_lines)))
+                i = j
+                continue
+            i += 1
+        return qa, table_rows
+
+    async def extract_or_escalate(self, text: str, llm_extract: Callable[[str], Awaitable[Dict]]) -> List[Dict]:
+        """
+        QA pairs for a document: the local result when it is confident enough, otherwise
+        llm_extract(text) (e.g. GeminiService.extract_qa_structured), with the local pairs
+        as the fallback when the LLM call fails.
+        """
+        if not text or not isinstance(text, str) or len(text.strip()) < 10:
+            return []
+
+        local = self.extract(text)
+        if DeterministicEvalConfig.ENABLE_LOCAL_EXTRACTION and local["confidence"] >= DeterministicEvalConfig.LOCAL_EXTRACTION_MIN_CONFIDENCE:
+            self.record(local["format"], used_local=True)
+            logger.info(f"Local extraction accepted ({local['format']}, confidence={local['confidence']}): {len(local['qa_pairs'])} QA pairs, skipping LLM.")
+            return local["qa_pairs"]
+        self.record(local["format"], used_local=False)
+
+        try:
+            res = await llm_extract(text)
+            if not res.get("success"):
+                logger.warning(f"Structured extraction failed: {res.get('error')}. Falling back to local extraction.")
+                return local["qa_pairs"]
+            extracted_pairs = res.get("response", [])
+            # Map internal keys back to the format expected by the evaluator
+            for p in extracted_pairs:
+                if 'answer' not in p and 'student_answer' in p:
+                    p['answer'] = p['student_answer']
+            logger.info(f"Successfully extracted {len(extracted_pairs)} QA pairs.")
+            return extracted_pairs
+        except Exception as e:
+            logger.error(f"Error in extraction: {e}")
+            return local["qa_pairs"]
+
+    @classmethod
+    def record(cls, fmt: str, used_local: bool) -> None:
+        """Record whether a document of the given format was served locally or sent to the LLM"""
+        with cls._stats_lock:
+            entry = cls._stats.setdefault(fmt, {"documents": 0, "local_hits": 0, "llm_calls": 0})
+            entry["documents"] += 1
+            if used_local:
+                entry["local_hits"] += 1
+            else:
+                entry["llm_calls"] += 1
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Per-format hit rates and the number of LLM extraction calls saved"""
+        with cls._stats_lock:
+            formats = {}
+            total_docs = 0
+            total_hits = 0
+            for fmt, entry in cls._stats.items():
+                total_docs += entry["documents"]
+                total_hits += entry["local_hits"]
+                formats[fmt] = dict(entry, hit_rate=round(entry["local_hits"] / entry["documents"], 4) if entry["documents"] else 0.0)
+
+        return {
+            "formats": formats,
+            "total_documents": total_docs,
+            "llm_calls_saved": total_hits,
+            "overall_hit_rate": round(total_hits / total_docs, 4) if total_docs else 0.0,
+        }
+
+
+def _is_chunk_anchor(piece: str) -> bool:
+    """Content-defined cut point, so an edit only moves the chunk boundaries around it"""
+    digest = hashlib.sha256(piece.encode()).hexdigest()
+    return int(digest[:8], 16) % 4 == 0
+
+
+def _split_segments(text: str) -> List[str]:
+    """Split text into segments at question markers, or at page breaks / blank lines when there are none"""
+    lines = text.splitlines(keepends=True)
+    question_starts = [i for i, line in enumerate(lines) if QUESTION_MARKER_RE.match(line) or QUESTION_NUMBER_RE.match(line)]
+    if question_starts:
+        starts = set(question_starts)
+    else:
+        starts = {i for i, line in enumerate(lines) if line.startswith('\f') or (i > 0 and not lines[i - 1].strip() and line.strip())}
+
+    segments = []
+    current = []
+    for i, line in enumerate(lines):
+        if i in starts and current:
+            segments.append(''.join(current))
+            current = []
+        current.append(line)
+    if current:
+        segments.append(''.join(current))
+    return segments
+
+
+def split_for_extraction(text: str, max_chars: int, overlap_chars: int) -> List[str]:
+    """
+    Split a long document into overlapping chunks for QA extraction.
+    Chunks end at question boundaries or page breaks where possible; ''.join of the
+    non-overlapping parts gives back the original text.
+    """
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces = []
+    for segment in _split_segments(text):
+        while len(segment) > max_chars:
+            cut = segment.rfind('\n', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            else:
+                cut += 1
+            pieces.append(segment[:cut])
+            segment = segment[cut:]
+        if segment:
+            pieces.append(segment)
+
+    chunks = []
+    current = ''
+    min_chars = max_chars // 2
+    for piece in pieces:
+        if current and len(current) + len(piece) > max_chars:
+            chunks.append(current)
+            current = ''
+        current += piece
+        if len(current) >= min_chars and _is_chunk_anchor(piece):
+            chunks.append(current)
+            current = ''
+    if current:
+        chunks.append(current)
+
+    # Carry the tail of the previous chunk over, so a pair cut at a seam is complete in one chunk
+    overlapped = [chunks[0]]
+    for prev, chunk in zip(chunks, chunks[1:]):
+        tail = prev[-overlap_chars:] if overlap_chars > 0 else ''
+        newline = tail.find('\n')
+        if newline != -1 and len(tail) < len(prev):
+            tail = tail[newline + 1:]
+        overlapped.append(tail + chunk)
+    return overlapped
+
+
+def _question_key(pair: Dict) -> str:
+    return ' '.join(str(pair.get('question', '')).lower().split())
+
+
+def merge_chunk_pairs(chunk_pairs: List[List[Dict]]) -> List[Dict]:
+    """
+    Merge per-chunk QA pairs in chunk order. A question seen in both chunks of a seam is
+    kept once, with the longer (untruncated) answer, at its first position.
+    """
+    merged: List[Dict] = []
+    previous_index: Dict[str, int] = {}
+    for pairs in chunk_pairs:
+        current_index: Dict[str, int] = {}
+        for pair in pairs:
+            key = _question_key(pair)
+            if key and key in previous_index:
+                idx = previous_index[key]
+                if len(str(pair.get('student_answer') or '')) > len(str(merged[idx].get('student_answer') or '')):
+                    # Keep the number if only the truncated copy had one
+                    number = pair.get('question_number') or merged[idx].get('question_number')
+                    merged[idx] = dict(pair, question_number=number) if number is not None else pair
+                current_index[key] = idx
+                continue
+            merged.append(pair)
+            if key:
+                current_index[key] = len(merged) - 1
+        previous_index = current_index
+    return merged
@@ -14,6 +14,10 @@ from .gemini_service import GeminiService
 from .ppt_processor import PPTProcessor
 from .ppt_evaluator import PPTEvaluator
 from .ppt_design_evaluator import PPTDesignEvaluator
+from .qa_extractor import LocalQAExtractor
+from .preextraction_service import PreExtractionService
+from .extraction_executor import extraction_executor
+from .upload_manifest import UploadManifest
 from models import AssignmentFile, EvaluationResult, EvaluationDetail, EvaluationType
 from pathlib import Path
 
@@ -31,6 +35,8 @@ class ReEvaluator:
         self.ppt_evaluator = ppt_evaluator
         self.ppt_design_evaluator = ppt_design_evaluator
         self.file_processor = FileProcessor()
+        self.local_extractor = LocalQAExtractor()
+        self.preextraction = PreExtractionService(self.file_processor)
     
     def calculate_score_from_details(self, details: list, partial_credit: bool = True) -> float:
         """Calculate weighted score percent."""
@@ -60,49 +66,17 @@ class ReEvaluator:
         return round((total_earned / total_possible) * 100.0, 2) if total_possible > 0 else 0.0
     
     async def extract_qa_pairs(self, text: str) -> List[Dict]:
-        """Extract QA pairs with error handling."""
-        if not text or not isinstance(text, str) or len(text.strip()) < 10: return []
-        try:
-            res = await self.gemini_service.extract_qa_structured(text)
-            if not res.get("success"):
-                logger.warning(f"Structured extraction failed: {res.get('error')}. Falling back.")
-                return self._fallback_extract_qa(text)
-            extracted_pairs = res.get("response", [])
-            for p in extracted_pairs:
-                if 'answer' not in p and 'student_answer' in p: p['answer'] = p['student_answer']
-            return extracted_pairs
-        except Exception as e:
-            logger.error(f"Error in extraction: {e}")
-            return self._fallback_extract_qa(text)
-
-    def _fallback_extract_qa(self, text: str) -> list:
-        qa = []
-        lines = [l.rstrip() for l in text.splitlines()]
-        question_re = re.compile(r"^\s*(?:Question\s*\d+|Q\d+|Q|Qus|Ques)\s*[:\.\)]", flags=re.IGNORECASE)
-        current_q, current_a = None, []
-        for line in lines:
-            if question_re.search(line):
-                if current_q: qa.append({"question": current_q, "answer": "\n".join(current_a).strip() or None})
-                current_q = question_re.sub("", line).strip(); current_a = []
-            else: current_a.append(line)
-        if current_q: qa.append({"question": current_q, "answer": "\n".join(current_a).strip() or None})
-        return qa
+        """Extract QA pairs locally when confident, otherwise via the LLM, with error handling."""
+        return await self.local_extractor.extract_or_escalate(text, self.gemini_service.extract_qa_structured)
     
-    async def re_evaluate_file(self, file_path: str, title: str, description: str, file_id: Optional[str] = None, db: Optional[Session] = None, current_user: Optional["User"] = None) -> Dict:
+    async def re_evaluate_file(self, file_path: str, title: str, description: str, file_id: Optional[str] = None, db: Optional[Session] = None, current_user: Optional["User"] = None, incremental: bool = False) -> Dict:
         try:
-            file_type_res = self.file_processor.read_file(file_path)
-            
-            # ATTEMPT TO RESTORE ORIGINAL FILENAME via meta file
-            original_filename = None
-            if file_id:
-                try:
-                    meta_path = Path("uploads") / f"{file_id}.meta.json"
-                    if meta_path.exists():
-                        with open(meta_path, "r", encoding="utf-8") as m:
-                            md = json.load(m)
-                            original_filename = md.get("original_filename")
-                except Exception: 
-                    pass
+            # ATTEMPT TO RESTORE ORIGINAL FILENAME via the upload manifest
+            upload = await asyncio.to_thread(UploadManifest.resolve, db, file_id) if file_id else None
+            original_filename = upload['original_filename'] if upload else None
+
+            artifact = await self.preextraction.get(file_id, upload.get('sha256')) if upload else None
+            file_type_res = dict(artifact['file_data']) if artifact else await extraction_executor.read_file(file_path, upload.get('sha256') if upload else None)
             
             # Fallback to current file path name if metadata lookup fails
             filename = original_filename or file_type_res.get('filename') or os.path.basename(file_path)
@@ -111,7 +85,9 @@ class ReEvaluator:
                 return await self._re_evaluate_ppt(file_path, filename, title, description, file_id, db)
             
             content = str(file_type_res.get('content', ''))
-            qa_pairs = await self.extract_qa_pairs(content)
+            qa_pairs = artifact.get('qa_pairs') if artifact else None
+            if qa_pairs is None:
+                qa_pairs = await self.extract_qa_pairs(content)
             
             # FALLBACK: If no QA pairs were found (common for code files or simple essays),
             # treat the entire content as a single answer to the assignment prompt.
@@ -126,7 +102,8 @@ class ReEvaluator:
 
             eval_tasks = []
             for idx_q, qa in enumerate(qa_pairs, 1):
-                eval_tasks.append(self.gemini_service.evaluate_one_qa(description, qa.get('question', ''), qa.get('answer') or qa.get('student_answer', ''), question_index=idx_q))
+                eval_tasks.append(self.gemini_service.evaluate_one_qa(description, qa.get('question', ''), qa.get('answer') or qa.get('student_answer', ''), question_index=idx_q, incremental=incremental,
+                                                                        question_number=qa.get('question_number')))
             
             eval_results = await asyncio.gather(*eval_tasks)
             details = []
@@ -0,0 +1,272 @@
+"""
+Resumable Upload Service
+tus-style chunked uploads: create a session, PATCH chunks at byte offsets (in any order, in
+parallel, retried as needed), then finalize. Chunks live in the storage backend under
+.partial/{upload_id}/ until finalize assembles and verifies them; only then does the file get a file_id.
+"""
+import re
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .blob_store import BlobStore
+from .storage import get_storage, staging_path
+from .upload_manifest import UploadManifest
+from .upload_service import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_PREFIX = ".partial/"
+# Largest accepted PATCH body
+MAX_CHUNK_BYTES = 8 * 1024 * 1024
+# Most chunk objects one session may stage
+MAX_CHUNKS_PER_UPLOAD = 1024
+# Unfinished sessions older than this are removed by the daily cleanup
+RESUMABLE_UPLOAD_TTL_SECONDS = 24 * 3600
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+CHUNK_NAME_RE = re.compile(r"^(\d{12})\.part$")
+
+
+class ResumableUploadService:
+    """Chunk bookkeeping in the storage backend, so any instance can continue a session"""
+
+    @staticmethod
+    def _session_prefix(upload_id: str) -> str:
+        if not UPLOAD_ID_RE.match(upload_id or ""):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return f"{PARTIAL_PREFIX}{upload_id}/"
+
+    @staticmethod
+    def _load_session(upload_id: str, user_id: int) -> Dict:
+        prefix = ResumableUploadService._session_prefix(upload_id)
+        try:
+            session = json.loads(get_storage().read_bytes(prefix + "session.json"))
+        except (OSError, ValueError):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        if session.get("user_id") != user_id:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return session
+
+    @staticmethod
+    def _chunks(upload_id: str) -> List[tuple]:
+        """Sorted (offset, length, key) of the chunks received so far"""
+        chunks = []
+        for key, size, _ in get_storage().iter_keys(ResumableUploadService._session_prefix(upload_id)):
+            match = CHUNK_NAME_RE.match(key.rsplit("/", 1)[-1])
+            if match:
+                chunks.append((int(match.group(1)), size, key))
+        return sorted(chunks)
+
+    @staticmethod
+    def _received_ranges(chunks: List[tuple]) -> List[List[int]]:
+        """Merged [start, end) byte ranges covered by the chunks"""
+        ranges: List[List[int]] = []
+        for offset, length, _ in chunks:
+            if ranges and offset <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], offset + length)
+            else:
+                ranges.append([offset, offset + length])
+        return ranges
+
+    @staticmethod
+    def create(user_id: int, filename: str, size: int, sha256: Optional[str] = None) -> Dict:
+        if not filename:
+            raise HTTPException(status_code=400, detail="Filename is required")
+        if size <= 0:
+            raise HTTPException(status_code=400, detail="Upload size must be positive")
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=400, detail=f"File {filename} exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)}MB limit")
+
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "user_id": user_id,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+        }
+        get_storage().put_bytes(f"{PARTIAL_PREFIX}{upload_id}/session.json", json.dumps(session).encode("utf-8"))
+        return {"upload_id": upload_id, "offset": 0, "size": size, "max_chunk_bytes": MAX_CHUNK_BYTES}
+
+    @staticmethod
+    def _check_staging(session: Dict, chunks: List[tuple], offset: int, length: int) -> None:
+        """
+        Reject a chunk that would push the session past its chunk count or past the declared length
+        (and MAX_UPLOAD_BYTES) in staged bytes. A chunk re-sent at the same offset replaces the old one.
+        """
+        others = [c for c in chunks if c[0] != offset]
+        if len(others) >= MAX_CHUNKS_PER_UPLOAD:
+            raise HTTPException(status_code=413, detail=f"Upload already has {MAX_CHUNKS_PER_UPLOAD} chunks: send larger chunks")
+        budget = min(session["size"], MAX_UPLOAD_BYTES)
+        if sum(c[1] for c in others) + length > budget:
+            raise HTTPException(status_code=413, detail="Chunks exceed the declared upload size: re-send overlapping chunks at their original offsets")
+
+    @staticmethod
+    def status(upload_id: str, user_id: int) -> Dict:
+        """Upload-Offset is the contiguous prefix received; ranges shows chunks sent out of order"""
+        session = ResumableUploadService._load_session(upload_id, user_id)
+        return ResumableUploadService._status(session, ResumableUploadService._chunks(upload_id))
+
+    @staticmethod
+    def _status(session: Dict, chunks: List[tuple]) -> Dict:
+        upload_id = session["upload_id"]
+        ranges = ResumableUploadService._received_ranges(chunks)
+        offset = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+        return {
+            "upload_id": upload_id,
+            "filename": session["filename"],
+            "size": session["size"],
+            "offset": offset,
+            "received_ranges": ranges,
+            "complete": offset == session["size"],
+        }
+
+    @staticmethod
+    async def write_chunk(upload_id: str, user_id: int, offset: int, body: AsyncIterator[bytes]) -> Dict:
+        """Store one chunk starting at `offset`. Re-sending a chunk at the same offset replaces it."""
+        session = await asyncio.to_thread(ResumableUploadService._load_session, upload_id, user_id)
+        if offset < 0 or offset >= session["size"]:
+            raise HTTPException(status_code=400, detail="Upload-Offset is outside the file")
+        # Cheap early rejection before reading the body; re-checked with the real length below
+        chunks = await asyncio.to_thread(ResumableUploadService._chunks, upload_id)
+        ResumableUploadService._check_staging(session, chunks, offset, 1)
+
+        chunk_key = f"{ResumableUploadService._session_prefix(upload_id)}{offset:012d}.part"
+        temp_path = staging_path(f"{upload_id}-{offset:012d}.{uuid.uuid4().hex[:8]}.chunk")
+        limit = min(MAX_CHUNK_BYTES, session["size"] - offset)
+
+        written = 0
+        out = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            async for data in body:
+                written += len(data)
+                if written > limit:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds the declared upload size or chunk limit")
+                await asyncio.to_thread(out.write, data)
+            await asyncio.to_thread(out.close)
+            if written == 0:
+                raise HTTPException(status_code=400, detail="Empty chunk")
+            # Chunks stored while this body streamed count too
+            chunks = await asyncio.to_thread(ResumableUploadService._chunks, upload_id)
+            ResumableUploadService._check_staging(session, chunks, offset, written)
+            # Only whole chunks become visible
+            await asyncio.to_thread(get_storage().put_file, chunk_key, temp_path)
+        except BaseException:
+            await asyncio.to_thread(ResumableUploadService._discard, out, temp_path)
+            raise
+
+        chunks = await asyncio.to_thread(ResumableUploadService._chunks, upload_id)
+        return ResumableUploadService._status(session, chunks)
+
+    @staticmethod
+    def _discard(out, temp_path: Path) -> None:
+        out.close()
+        temp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _assemble(session: Dict, upload_id: str, temp_path: Path) -> str:
+        """Concatenate chunks into temp_path (overlaps skipped). Returns the sha256; raises on gaps."""
+        storage = get_storage()
+        chunks = ResumableUploadService._chunks(upload_id)
+        ranges = ResumableUploadService._received_ranges(chunks)
+        if ranges != [[0, session["size"]]]:
+            raise HTTPException(status_code=409, detail={"message": "Upload is incomplete", "received_ranges": ranges})
+
+        digest = hashlib.sha256()
+        position = 0
+        with open(temp_path, "wb") as out:
+            for offset, length, key in chunks:
+                if offset + length <= position:
+                    continue
+                # Object storage streams are not seekable: skip the overlap by reading past it
+                skip = position - offset
+                with storage.open_read(key) as f:
+                    while True:
+                        block = f.read(UPLOAD_CHUNK_BYTES)
+                        if not block:
+                            break
+                        if skip:
+                            dropped = min(skip, len(block))
+                            block = block[dropped:]
+                            skip -= dropped
+                        digest.update(block)
+                        out.write(block)
+                position = offset + length
+        return digest.hexdigest()
+
+    @staticmethod
+    async def finalize(db: Session, upload_id: str, user_id: int) -> Dict:
+        """
+        Assemble, verify (size and optional sha256), store through the blob store and manifest,
+        and return the new file_id.
+        """
+        session = await asyncio.to_thread(ResumableUploadService._load_session, upload_id, user_id)
+        file_id = str(uuid.uuid4())
+        temp_path = await asyncio.to_thread(BlobStore.temp_path, f"{file_id}.upload")
+
+        try:
+            sha256 = await asyncio.to_thread(ResumableUploadService._assemble, session, upload_id, temp_path)
+            if session.get("sha256") and session["sha256"] != sha256:
+                raise HTTPException(status_code=422, detail="Checksum mismatch: re-upload the chunks")
+        except BaseException:
+            await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+            raise
+
+        key, deduplicated = await asyncio.to_thread(BlobStore.commit, temp_path, sha256, Path(session["filename"]).suffix)
+        path = await asyncio.to_thread(get_storage().local_path, key)
+        await asyncio.to_thread(ResumableUploadService._record, db, file_id, session, key, sha256, user_id)
+
+        await asyncio.to_thread(ResumableUploadService._delete_session, upload_id)
+        return {
+            "file_id": file_id,
+            "filename": session["filename"],
+            "path": str(path),
+            "size": session["size"],
+            "sha256": sha256,
+            "deduplicated": deduplicated,
+        }
+
+    @staticmethod
+    def _record(db: Session, file_id: str, session: Dict, key: str, sha256: str, user_id: int) -> None:
+        UploadManifest.record(db, file_id, session["filename"], key, session["size"], sha256, user_id=user_id)
+        db.commit()
+
+    @staticmethod
+    def _delete_session(upload_id: str) -> None:
+        storage = get_storage()
+        for key, _, _ in list(storage.iter_keys(ResumableUploadService._session_prefix(upload_id))):
+            storage.delete(key)
+
+    @staticmethod
+    def abort(upload_id: str, user_id: int) -> None:
+        ResumableUploadService._load_session(upload_id, user_id)
+        ResumableUploadService._delete_session(upload_id)
+
+    @staticmethod
+    def cleanup_stale(max_age_seconds: int = RESUMABLE_UPLOAD_TTL_SECONDS) -> int:
+        """Remove sessions that were never finalized (no new chunk within max_age_seconds). Returns count removed."""
+        last_activity: Dict[str, float] = {}
+        for key, _, modified in get_storage().iter_keys(PARTIAL_PREFIX):
+            upload_id = key[len(PARTIAL_PREFIX):].split("/", 1)[0]
+            last_activity[upload_id] = max(last_activity.get(upload_id, 0.0), modified)
+
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for upload_id, modified in last_activity.items():
+            if modified < cutoff and UPLOAD_ID_RE.match(upload_id):
+                try:
+                    ResumableUploadService._delete_session(upload_id)
+                    removed += 1
+                except Exception as e:
+                    logger.warning(f"Could not remove resumable upload {upload_id}: {e}")
+        return removed
@@ -0,0 +1,106 @@
+"""
+Rubric Sections
+Splits an assignment description into a global section and per-question sections,
+so an edited rubric only invalidates the questions whose section changed.
+"""
+import re
+from typing import Dict, Optional
+
+from .determinism_config import DeterministicEvalConfig
+
+# "Q1", "Q1:", "Question 2 -", "Ques 3." at the start of a line
+Q_HEADING_RE = re.compile(r"^\s*Q(?:uestion|ues|us)?\s*\.?\s*(\d+)\b", flags=re.IGNORECASE)
+# "3." / "3)" at the start of a line; only used when there are no Q headings (else they are sub-items)
+NUMBERED_HEADING_RE = re.compile(r"^\s*(\d+)\s*[\.\)]\s", flags=re.IGNORECASE)
+# Headings that apply to every question ("General instructions:", "Marking scheme", "Note:")
+GLOBAL_HEADING_RE = re.compile(r"^\s*(?:General|Instructions?|Notes?|Marking|Rubric|Grading)\b", flags=re.IGNORECASE)
+# Content words compared between a numbered-list item and the student's question
+WORD_RE = re.compile(r"[a-z0-9]{4,}")
+
+
+def _is_global_heading(lines, i: int) -> bool:
+    """
+    A global heading outside any numbered section: a bare heading line ("Marking scheme:",
+    "General Instructions") set off from the text above it by a blank line. "Note: ..." lines
+    inside a question's section stay with that question.
+    """
+    line = lines[i]
+    if not GLOBAL_HEADING_RE.match(line):
+        return False
+    heading, _, rest = line.partition(':')
+    return not rest.strip() and len(heading.split()) <= 4 and (i == 0 or not lines[i - 1].strip())
+
+
+def split_rubric(description: str) -> Dict:
+    """
+    Split a description into {"global": str, "questions": {number: str}, "numbered_list": bool}.
+    Text before the first question heading and under global headings is global. numbered_list
+    is True when the sections come from "1." / "2)" items (no Q headings), which may just as
+    well be numbered instructions.
+    """
+    global_lines = []
+    questions: Dict[int, list] = {}
+    current: Optional[int] = None
+
+    lines = (description or "").splitlines()
+    numbered_list = not any(Q_HEADING_RE.match(l) for l in lines)
+    heading_re = NUMBERED_HEADING_RE if numbered_list else Q_HEADING_RE
+    for i, line in enumerate(lines):
+        match = heading_re.match(line)
+        if match:
+            current = int(match.group(1))
+            questions.setdefault(current, []).append(line.strip())
+            continue
+        if current is not None and _is_global_heading(lines, i):
+            current = None
+        if current is None:
+            global_lines.append(line.strip())
+        else:
+            questions[current].append(line.strip())
+
+    return {
+        "global": "\n".join(l for l in global_lines if l),
+        "questions": {n: "\n".join(l for l in lines if l) for n, lines in questions.items()},
+        "numbered_list": numbered_list,
+    }
+
+
+def _restates(section: str, question: str) -> bool:
+    """Whether a numbered-list item is this question: the question shares at least half of the item's words"""
+    item = NUMBERED_HEADING_RE.sub("", section.split("\n", 1)[0], count=1)
+    item_words = set(WORD_RE.findall(item.lower()))
+    if not item_words:
+        return False
+    return 2 * len(item_words & set(WORD_RE.findall((question or "").lower()))) >= len(item_words)
+
+
+def question_number(question: str, number: Optional[int] = None) -> Optional[int]:
+    """The student's own question number: the extractor's, else a "Q2" / "2." prefix of the question text"""
+    if number is not None:
+        try:
+            return int(number)
+        except (TypeError, ValueError):
+            pass
+    match = Q_HEADING_RE.match(question or "") or NUMBERED_HEADING_RE.match(question or "")
+    return int(match.group(1)) if match else None
+
+
+def section_cache_key(description: str, question: str, student_answer: str, question_index: int,
+                      number: Optional[int] = None) -> str:
+    """
+    Cache key built from only the rubric sections relevant to this question: the global section
+    plus the section of the student's question number (not its extraction position, which shifts
+    when a question is skipped). When the number is unknown or the rubric does not map cleanly
+    onto questions (no such section, or a numbered list whose item is not this question) the
+    whole description is keyed, so any rubric edit regrades the question.
+    """
+    sections = split_rubric(description)
+    number = question_number(question, number)
+    section = sections["questions"].get(number) if number is not None else None
+    if section and sections["numbered_list"] and not _restates(section, question):
+        section = None
+    if not section:
+        combined = f"rubric-full|||{description}|||{question}|||{student_answer}|||{question_index}"
+    else:
+        combined = f"rubric-section|||{sections['global']}|||{number}|||{section}|||{question}|||{student_answer}|||{question_index}"
+    return DeterministicEvalConfig.get_content_hash(combined)
@@ -0,0 +1,311 @@
+"""
+Storage Backends
+One place that decides where uploads, upload chunks and reports live: the local uploads/
+directory (default) or an S3-compatible bucket (AWS S3, MinIO, ...) shared by every instance.
+Select with STORAGE_BACKEND=local|s3.
+"""
+import os
+import time
+import shutil
+import logging
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from .lazy_imports import lazy_import, lazy_available
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+# Local root for the local backend; also holds staging files and the S3 read cache
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+UPLOAD_DIR.mkdir(exist_ok=True)
+STAGING_DIR = UPLOAD_DIR / ".staging"
+CACHE_DIR = UPLOAD_DIR / ".cache"
+
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://minio:9000
+S3_REGION = os.getenv("S3_REGION") or None
+PRESIGNED_URL_EXPIRY_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRY_SECONDS", "900"))
+# Object headers S3Storage.touch() keeps when it rewrites an object's metadata
+S3_COPIED_HEADERS = ("ContentType", "ContentEncoding", "ContentDisposition", "ContentLanguage", "CacheControl")
+
+# Only needed for STORAGE_BACKEND=s3; imported when the S3 backend is created (keeps startup light)
+boto3 = lazy_import("boto3")
+botocore_config = lazy_import("botocore.config")
+botocore_exceptions = lazy_import("botocore.exceptions")
+BOTO3_AVAILABLE = lazy_available(boto3, botocore_config, botocore_exceptions)
+
+
+def staging_path(name: str) -> Path:
+    """Local scratch file for data on its way into storage"""
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    return STAGING_DIR / name
+
+
+class StorageBackend:
+    """Key/value object storage; keys are '/'-separated relative paths"""
+
+    name = "base"
+    # Whether presigned_url() returns direct download links
+    supports_presigned_urls = False
+
+    def put_file(self, key: str, local_path: Path) -> None:
+        """Move a local file into storage under key"""
+        raise NotImplementedError
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def read_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    def open_read(self, key: str) -> BinaryIO:
+        """Streaming reader (call .read(n) / .close()); raises FileNotFoundError"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def touch(self, key: str) -> None:
+        """Set the object's modified time to now (marks a deduplicated blob as in use)"""
+        raise NotImplementedError
+
+    def modified(self, key: str) -> Optional[float]:
+        """Current modified timestamp of an object, or None when it does not exist"""
+        raise NotImplementedError
+
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        """(key, size, modified timestamp) of every object under prefix"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Path:
+        """Filesystem path with the object's bytes (extractors need one); raises FileNotFoundError"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        """Time-limited direct download URL, or None when the backend cannot issue one"""
+        return None
+
+    def prune_cache(self, max_age_seconds: int) -> int:
+        """Drop locally cached copies older than max_age_seconds. Returns count removed."""
+        return 0
+
+
+class LocalStorage(StorageBackend):
+    """Objects are files under UPLOAD_DIR"""
+
+    name = "local"
+
+    def __init__(self, root: Path = UPLOAD_DIR):
+        self.root = root.resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put_file(self, key: str, local_path: Path) -> None:
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(local_path, dest)
+        except OSError:
+            # Different filesystem
+            shutil.move(str(local_path), dest)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        dest = self._path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        temp = dest.with_name(dest.name + ".tmp")
+        temp.write_bytes(data)
+        os.replace(temp, dest)
+
+    def read_bytes(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def open_read(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        path.unlink(missing_ok=True)
+        # Drop now-empty shard / session directories
+        for parent in path.parents:
+            if parent == self.root:
+                break
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+
+    def touch(self, key: str) -> None:
+        os.utime(self._path(key))
+
+    def modified(self, key: str) -> Optional[float]:
+        try:
+            return self._path(key).stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        base = self._path(prefix) if prefix else self.root
+        if not base.exists():
+            return
+        for path in base.rglob("*"):
+            if path.is_file():
+                stat = path.stat()
+                yield path.relative_to(self.root).as_posix(), stat.st_size, stat.st_mtime
+
+    def local_path(self, key: str) -> Path:
+        path = self._path(key)
+        if not path.is_file():
+            raise FileNotFoundError(key)
+        return path
+
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket; reads are cached under uploads/.cache for extractors"""
+
+    name = "s3"
+    supports_presigned_urls = True
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+                 region: Optional[str] = S3_REGION):
+        if not BOTO3_AVAILABLE:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        # Path-style addressing for MinIO and other self-hosted endpoints
+        config = botocore_config.Config(signature_version="s3v4", s3={"addressing_style": "path"} if endpoint_url else {})
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region, config=config)
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _cache_path(self, key: str) -> Path:
+        return CACHE_DIR / key
+
+    def put_file(self, key: str, local_path: Path) -> None:
+        # upload_file streams from disk (multipart for large files)
+        self.client.upload_file(str(local_path), self.bucket, self._key(key))
+        # Keep the bytes as the local cached copy; extraction right after upload reads them
+        cache_path = self._cache_path(key)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(local_path), cache_path)
+
+    def put_bytes(self, key: str, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+        self._cache_path(key).unlink(missing_ok=True)
+
+    def read_bytes(self, key: str) -> bytes:
+        with self.open_read(key) as body:
+            return body.read()
+
+    def open_read(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except botocore_exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key)
+            raise
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except botocore_exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        self._cache_path(key).unlink(missing_ok=True)
+
+    def touch(self, key: str) -> None:
+        # S3 has no touch; a server-side copy onto itself refreshes LastModified without a re-upload.
+        # A self-copy must change the metadata, so the object's own headers and metadata are carried
+        # over (REPLACE would otherwise drop them) with a last-used stamp added.
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            headers = {name: head[name] for name in S3_COPIED_HEADERS if head.get(name)}
+            self.client.copy_object(Bucket=self.bucket, Key=self._key(key), CopySource={"Bucket": self.bucket, "Key": self._key(key)},
+                                    MetadataDirective="REPLACE", Metadata=dict(head.get("Metadata") or {}, touched=str(int(time.time()))),
+                                    **headers)
+        except botocore_exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+
+    def modified(self, key: str) -> Optional[float]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["LastModified"].timestamp()
+        except botocore_exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"].timestamp()
+
+    def local_path(self, key: str) -> Path:
+        cache_path = self._cache_path(key)
+        if cache_path.is_file():
+            return cache_path
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.download")
+        try:
+            self.client.download_file(self.bucket, self._key(key), str(temp))
+        except botocore_exceptions.ClientError as e:
+            temp.unlink(missing_ok=True)
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key)
+            raise
+        os.replace(temp, cache_path)
+        return cache_path
+
+    def presigned_url(self, key: str, filename: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=PRESIGNED_URL_EXPIRY_SECONDS)
+
+    def prune_cache(self, max_age_seconds: int) -> int:
+        if not CACHE_DIR.exists():
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for path in CACHE_DIR.rglob("*"):
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Backend selected by STORAGE_BACKEND (shared per process)"""
+    global _storage
+    if _storage is None:
+        _storage = S3Storage() if STORAGE_BACKEND == "s3" else LocalStorage()
+        logger.info(f"Upload storage backend: {_storage.name}")
+    return _storage
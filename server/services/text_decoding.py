@@ -0,0 +1,121 @@
+"""
+Text Decoding
+Reads a text file once (memory-mapped when large), detects its encoding from a byte sample --
+BOM, UTF-16 without BOM, UTF-8 validation, a statistical detector (charset_normalizer), then a
+cp1252 / latin-1 heuristic -- and decodes once.
+"""
+import os
+import mmap
+import codecs
+import logging
+from typing import Tuple
+
+from .lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+charset_normalizer = lazy_import("charset_normalizer")
+
+# Files at least this large are memory-mapped instead of read into a bytes object
+TEXT_MMAP_THRESHOLD = int(os.getenv('TEXT_MMAP_THRESHOLD', str(1024 * 1024)))
+# Leading bytes used for encoding detection
+TEXT_SNIFF_BYTES = 64 * 1024
+
+# Longest first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+# Bytes cp1252 leaves undefined; their presence means latin-1 (C1 controls) instead
+_CP1252_UNDEFINED = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+
+def _is_utf8(sample: bytes, complete: bool) -> bool:
+    """UTF-8 validity; a multi-byte sequence cut off at the end of a partial sample is allowed"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _utf16_without_bom(sample: bytes) -> str:
+    """'utf-16-le' / 'utf-16-be' when NULs sit in alternating positions (mostly-ASCII UTF-16), else ''"""
+    if len(sample) < 4:
+        return ''
+    even, odd = sample[0::2], sample[1::2]
+    even_nuls, odd_nuls = even.count(0) / len(even), odd.count(0) / len(odd)
+    if odd_nuls > 0.6 and even_nuls < 0.1:
+        return 'utf-16-le'
+    if even_nuls > 0.6 and odd_nuls < 0.1:
+        return 'utf-16-be'
+    return ''
+
+
+def detect_encoding(sample: bytes, complete: bool = False) -> Tuple[str, str]:
+    """
+    (encoding, method) for a byte sample; method is 'bom', 'utf-16', 'utf-8', 'detector' or
+    'heuristic'. complete=True when the sample is the whole file.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, 'bom'
+    # Before UTF-8: NUL-interleaved ASCII is technically valid UTF-8
+    utf16 = _utf16_without_bom(sample)
+    if utf16:
+        return utf16, 'utf-16'
+    if _is_utf8(sample, complete):
+        return 'utf-8', 'utf-8'
+    if charset_normalizer.available:
+        try:
+            best = charset_normalizer.from_bytes(sample).best()
+            if best is not None and best.encoding:
+                return best.encoding, 'detector'
+        except Exception as e:
+            logger.debug(f"charset_normalizer failed: {e}")
+    # Smart quotes and dashes (0x80-0x9F) are far more common in Windows text than C1 controls
+    if any(b in _CP1252_UNDEFINED for b in sample):
+        return 'latin-1', 'heuristic'
+    return 'cp1252', 'heuristic'
+
+
+def detect_file_encoding(file_path: str) -> str:
+    """Encoding of a file from its first TEXT_SNIFF_BYTES (for callers that stream the text)"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(TEXT_SNIFF_BYTES)
+        complete = not f.read(1)
+    return detect_encoding(sample, complete)[0]
+
+
+def _decode(data, encoding: str, errors: str = 'strict') -> str:
+    # str() decodes straight from the buffer (bytes or mmap) without an intermediate copy
+    return str(data, encoding, errors)
+
+
+def decode_bytes(data) -> Tuple[str, str]:
+    """(text, encoding) for a bytes-like object, decoded once"""
+    encoding, method = detect_encoding(bytes(data[:TEXT_SNIFF_BYTES]), len(data) <= TEXT_SNIFF_BYTES)
+    try:
+        return _decode(data, encoding), encoding
+    except LookupError:
+        return _decode(data, 'utf-8', 'replace'), 'utf-8'
+    except UnicodeDecodeError as e:
+        # A sample that was valid UTF-8 stays UTF-8: only the stray bytes later on are replaced,
+        # never the whole file re-decoded as a single-byte encoding (mojibake)
+        logger.debug(f"Text is not clean {method} ({e}); decoding as {encoding} with replacement")
+        return _decode(data, encoding, 'replace'), encoding
+
+
+def read_text(file_path: str) -> Tuple[str, str]:
+    """(text, encoding) of a file read once; memory-mapped at TEXT_MMAP_THRESHOLD bytes and above"""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return '', 'utf-8'
+        if size < TEXT_MMAP_THRESHOLD:
+            return decode_bytes(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_bytes(mapped)
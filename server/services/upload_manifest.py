@@ -0,0 +1,140 @@
+"""
+Upload Manifest
+Indexed file_id -> stored upload lookup (uploaded_files table), replacing directory glob scans
+and per-file .meta.json sidecars. Rows hold storage keys (see services.storage). Uploads stored
+before the manifest existed are backfilled once by the cleanup task.
+"""
+import re
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from models import UploadedFile
+from services.storage import get_storage, UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+# Pre-manifest uploads were saved as UPLOAD_DIR/<file_id><extension> next to <file_id>.meta.json
+LEGACY_UPLOAD_RE = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})(\.[^.]+)?$")
+
+
+class UploadManifest:
+    """Records uploads and resolves file_ids with a primary-key lookup"""
+
+    @staticmethod
+    def record(db: Session, file_id: str, original_filename: str, key: str, size: int,
+               sha256: Optional[str], user_id: Optional[int] = None) -> UploadedFile:
+        """Add a manifest row pointing at a storage key (the caller commits)"""
+        entry = UploadedFile(
+            file_id=file_id,
+            user_id=user_id,
+            original_filename=original_filename,
+            stored_path=key,
+            file_size=size,
+            sha256=sha256,
+            extension=Path(original_filename).suffix.lower(),
+        )
+        db.add(entry)
+        return entry
+
+    @staticmethod
+    def resolve(db: Optional[Session], file_id: str) -> Optional[Dict]:
+        """
+        Find an upload by file_id: {"file_id", "key", "original_filename", "size", "sha256", "extension"}.
+        The object under "key" may have been cleaned up; use local_path() to get its bytes. Returns None if unknown.
+        """
+        if db is None:
+            return None
+        entry = db.query(UploadedFile).filter(UploadedFile.file_id == file_id).first()
+        return UploadManifest._to_dict(entry) if entry else None
+
+    @staticmethod
+    def resolve_many(db: Optional[Session], file_ids: List[str]) -> Dict[str, Dict]:
+        """resolve() for a whole batch with one query: {file_id: upload}; unknown file_ids are left out"""
+        found = {}
+        if db is not None and file_ids:
+            for entry in db.query(UploadedFile).filter(UploadedFile.file_id.in_(list(file_ids))):
+                found[entry.file_id] = UploadManifest._to_dict(entry)
+        return found
+
+    @staticmethod
+    def _to_dict(entry: UploadedFile) -> Dict:
+        return {
+            "file_id": entry.file_id,
+            "key": UploadManifest._storage_key(entry.stored_path),
+            "original_filename": entry.original_filename,
+            "size": entry.file_size,
+            "sha256": entry.sha256,
+            "extension": entry.extension,
+        }
+
+    @staticmethod
+    def _storage_key(stored_path: str) -> str:
+        """Rows written before the storage backends hold local paths like uploads/<file_id>.pdf"""
+        path = Path(stored_path)
+        try:
+            return path.relative_to(UPLOAD_DIR).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    @staticmethod
+    def local_path(upload: Optional[Dict]) -> Optional[Path]:
+        """Local file with the upload's bytes (downloaded from object storage if needed), or None if gone"""
+        if not upload:
+            return None
+        try:
+            return get_storage().local_path(upload["key"])
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def backfill_legacy(db: Session) -> int:
+        """
+        Give uploads stored before the manifest existed a manifest row (original filename from the
+        .meta.json sidecar, which is removed afterwards). Files that already have a row are skipped,
+        so repeated runs only pick up what is left. Returns the number of rows added.
+        """
+        candidates = {}
+        for path in UPLOAD_DIR.iterdir():
+            match = LEGACY_UPLOAD_RE.match(path.name)
+            if match and path.is_file():
+                candidates[match.group(1)] = path
+        if not candidates:
+            return 0
+
+        known = {row.file_id for row in db.query(UploadedFile.file_id).filter(UploadedFile.file_id.in_(list(candidates)))}
+        sidecars = []
+        for file_id, path in candidates.items():
+            if file_id in known:
+                continue
+            meta_path = UPLOAD_DIR / f"{file_id}.meta.json"
+            original_filename = None
+            try:
+                with open(meta_path, "r", encoding="utf-8") as m:
+                    md = json.load(m)
+                    if isinstance(md, dict):
+                        original_filename = md.get("original_filename")
+                sidecars.append(meta_path)
+            except (OSError, ValueError):
+                pass
+
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(block)
+            stat = path.stat()
+            entry = UploadManifest.record(db, file_id, original_filename or path.name, path.name, stat.st_size, digest.hexdigest())
+            # Expire with the upload's age, not the backfill date
+            entry.created_at = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+        db.commit()
+
+        for meta_path in sidecars:
+            meta_path.unlink(missing_ok=True)
+        added = len(candidates) - len(known)
+        if added:
+            logger.info(f"Backfilled {added} legacy uploads into the upload manifest.")
+        return added
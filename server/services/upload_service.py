@@ -0,0 +1,80 @@
+"""
+Upload Service
+Streams uploaded files to disk in fixed-size chunks, hashing and size-checking on the fly,
+and stores them once per distinct content in the blob store
+"""
+import os
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict
+
+from fastapi import HTTPException, UploadFile
+
+from .blob_store import BlobStore
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Per-file upload limit
+MAX_UPLOAD_BYTES = 30 * 1024 * 1024
+# Bytes read from the request and written to disk per step (peak memory per upload)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadService:
+    """Copies uploads into the blob store without buffering whole files in memory"""
+
+    @staticmethod
+    async def stream_to_file(file: UploadFile, dest_path: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> Dict:
+        """
+        Copy an upload to dest_path chunk by chunk. Returns {"size", "sha256"}.
+        Raises HTTPException 400 when the upload is larger than max_bytes; nothing is left on disk then.
+        The multipart parser has already spooled the whole request body (to a temporary file)
+        before the route runs, so the limit bounds what is copied and stored, not what is received.
+        """
+        # Known from the spooled part: reject before copying anything
+        if file.size is not None and file.size > max_bytes:
+            raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds {max_bytes // (1024 * 1024)}MB limit")
+
+        digest = hashlib.sha256()
+        size = 0
+        # Written under a temporary name so a failed upload never looks complete
+        part_path = dest_path.with_name(dest_path.name + ".part")
+        out = await asyncio.to_thread(open, part_path, "wb")
+        try:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=400, detail=f"File {file.filename} exceeds {max_bytes // (1024 * 1024)}MB limit")
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+            await asyncio.to_thread(out.close)
+            await asyncio.to_thread(os.replace, part_path, dest_path)
+        except BaseException:
+            out.close()
+            try:
+                part_path.unlink()
+            except OSError:
+                pass
+            raise
+
+        return {"size": size, "sha256": digest.hexdigest()}
+
+    @staticmethod
+    async def store_upload(file: UploadFile, file_id: str) -> Dict:
+        """
+        Stage an upload locally, then store it as a shared content-addressed blob.
+        Returns {"key", "path" (local copy for extraction), "size", "sha256", "deduplicated"}.
+        """
+        temp_path = BlobStore.temp_path(f"{file_id}.upload")
+        staged = await UploadService.stream_to_file(file, temp_path)
+        key, deduplicated = await asyncio.to_thread(BlobStore.commit, temp_path, staged["sha256"], Path(file.filename).suffix)
+        if deduplicated:
+            logger.info(f"Upload {file.filename} matches an existing blob ({staged['sha256'][:12]}); no new copy stored.")
+        path = await asyncio.to_thread(get_storage().local_path, key)
+        return dict(staged, key=key, path=path, deduplicated=deduplicated)
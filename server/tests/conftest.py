@@ -0,0 +1,28 @@
+import sys
+import types
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Tests import the app modules the way main.py does ("from services.x import ...")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# database.py needs a Postgres DATABASE_URL; tests get an in-memory SQLite database instead
+_database = types.ModuleType("database")
+_database.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+_database.Base = declarative_base()
+_database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_database.engine)
+
+
+def _get_db():
+    db = _database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+_database.get_db = _get_db
+sys.modules.setdefault("database", _database)
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+import models
+from database import Base, SessionLocal, engine
+from services import storage
+from services.blob_store import BlobStore
+
+SHA = "ab" * 32
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    backend = storage.LocalStorage(tmp_path / "uploads")
+    monkeypatch.setattr(storage, "_storage", backend)
+    monkeypatch.setattr("services.blob_store.STAGING_DIR", tmp_path / "staging")
+    Base.metadata.create_all(engine)
+    yield backend
+    Base.metadata.drop_all(engine)
+
+
+def stage(tmp_path, name, data=b"same bytes"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_gc_keeps_blob_deduplicated_by_an_upload_in_progress(tmp_path, local_storage):
+    key, _ = BlobStore.commit(stage(tmp_path, "first"), SHA, ".txt")
+    os.utime(local_storage.local_path(key), (0, 0))  # unreferenced and past the grace period
+
+    listing = local_storage.iter_keys
+
+    def interleaved(prefix):
+        # GC has listed the old blob; now a batch upload deduplicates onto it, manifest row not yet committed
+        entries = list(listing(prefix))
+        assert BlobStore.commit(stage(tmp_path, "second"), SHA, ".txt") == (key, True)
+        return iter(entries)
+
+    local_storage.iter_keys = interleaved
+    with SessionLocal() as db:
+        assert BlobStore.collect_garbage(db) == 0
+    assert local_storage.exists(key)
+
+
+def test_gc_removes_unreferenced_old_blob_but_not_referenced_one(tmp_path, local_storage):
+    old, _ = BlobStore.commit(stage(tmp_path, "a", b"a"), "aa" * 32, ".txt")
+    kept, _ = BlobStore.commit(stage(tmp_path, "b", b"b"), "bb" * 32, ".txt")
+    for key in (old, kept):
+        os.utime(local_storage.local_path(key), (0, 0))
+    with SessionLocal() as db:
+        db.add(models.UploadedFile(file_id="f1", original_filename="b.txt", stored_path=kept))
+        db.commit()
+        assert BlobStore.collect_garbage(db) == 1
+    assert not local_storage.exists(old)
+    assert local_storage.exists(kept)
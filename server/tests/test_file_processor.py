@@ -0,0 +1,44 @@
+import pytest
+
+from services import determinism_config
+from services.file_processor import FileProcessor
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(determinism_config, "EVALUATION_CACHE_DIR", tmp_path / "cache")
+    return tmp_path / "cache" / "text_extraction"
+
+
+def test_complete_extraction_is_cached_under_the_given_sha256(tmp_path, cache_dir, monkeypatch):
+    path = tmp_path / "answers.txt"
+    path.write_text("Q1: What is X?\nAns: y")
+    monkeypatch.setattr(FileProcessor, "file_sha256", staticmethod(lambda p: pytest.fail("file re-hashed")))
+    first = FileProcessor.read_file(str(path), sha256="cd" * 32)
+    assert first["metadata"]["complete"]
+    assert FileProcessor.read_file(str(path), sha256="cd" * 32)["metadata"]["cached"]
+    assert FileProcessor.discard_cached_text("cd" * 32) == 1
+
+
+def test_degraded_extraction_is_not_cached(tmp_path, cache_dir, monkeypatch):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 not really a pdf")
+
+    def partial_read(file_path):
+        FileProcessor._mark_incomplete("OCR of page 2 failed")
+        return "page one text"
+
+    monkeypatch.setattr(FileProcessor, "_read_pdf_by_page", staticmethod(partial_read))
+    result = FileProcessor.read_file(str(path))
+    assert result["content"] == "page one text"
+    assert result["metadata"]["complete"] is False
+    assert not cache_dir.exists() or not any(cache_dir.iterdir())
+
+
+def test_status_message_is_not_cached(tmp_path, cache_dir, monkeypatch):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"%PDF-1.4 not really a pdf")
+    result = FileProcessor.read_file(str(path))
+    assert result["content"].startswith("[")
+    assert result["metadata"]["complete"] is False
+    assert not cache_dir.exists() or not any(cache_dir.iterdir())
@@ -0,0 +1,42 @@
+import struct
+
+from services.format_registry import FormatRegistry
+
+FREE, END, FAT_SECTOR = 0xFFFFFFFF, 0xFFFFFFFE, 0xFFFFFFFD
+
+
+def entry(name, kind, left=FREE, right=FREE, child=FREE):
+    encoded = name.encode("utf-16-le") + b"\0\0"
+    raw = encoded.ljust(64, b"\0") + struct.pack("<HBBIII", len(encoded), kind, 1, left, right, child)
+    return raw.ljust(128, b"\0")
+
+
+def ole_file(path, entries, trailer=b""):
+    """Minimal compound file: sector 0 is the FAT, sector 1 the directory"""
+    header = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" + b"\0" * 16
+    header += struct.pack("<HHHHH", 0x3E, 3, 0xFFFE, 9, 6) + b"\0" * 6
+    header += struct.pack("<9I", 0, 1, 1, 0, 0x1000, END, 0, END, 0)
+    header += struct.pack("<109I", 0, *[FREE] * 108)
+    fat = struct.pack("<2I", FAT_SECTOR, END).ljust(512, b"\xff")
+    directory = b"".join(entries).ljust(512, b"\0")
+    path.write_bytes(header + fat + directory + trailer)
+    return str(path)
+
+
+def test_ole_sniffed_by_root_stream_not_embedded_workbook(tmp_path):
+    # A presentation with an embedded workbook: "Workbook" only inside a sub-storage
+    path = ole_file(tmp_path / "deck.bin", [
+        entry("Root Entry", 5, child=2),
+        entry("Current User", 2),
+        entry("PowerPoint Document", 2, left=1, right=3),
+        entry("MBD0001", 1, child=4),
+        entry("Workbook", 2),
+    ], trailer="Workbook".encode("utf-16-le"))
+    assert FormatRegistry.sniff(path) == "ppt"
+
+
+def test_ole_formats_and_unknown(tmp_path):
+    doc = ole_file(tmp_path / "a", [entry("Root Entry", 5, child=1), entry("WordDocument", 2, right=2), entry("1Table", 2)])
+    xls = ole_file(tmp_path / "b", [entry("Root Entry", 5, child=1), entry("Book", 2)])
+    other = ole_file(tmp_path / "c", [entry("Root Entry", 5, child=1), entry("Contents", 2)])
+    assert [FormatRegistry.sniff(p) for p in (doc, xls, other)] == ["doc", "xls", "ole"]
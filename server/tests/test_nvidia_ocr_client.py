@@ -0,0 +1,51 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import nvidia_ocr_stub
+from services.nvidia_ocr_client import NvidiaOCRClient
+
+IMAGES = [b"a" * n for n in range(1, 6)]
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(fail_every=0, batch=False):
+        nvidia_ocr_stub.counter["requests"] = 0
+        server = ThreadingHTTPServer(("127.0.0.1", 0), nvidia_ocr_stub.make_handler(fail_every, batch))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/ocr"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def texts(results):
+    # Drop the request number so results compare across request orderings
+    return [r.split(" (request")[0] for r in results]
+
+
+def test_batches_keep_image_order(stub):
+    client = NvidiaOCRClient(stub(batch=True), "key", concurrency=2, batch_size=2, backoff=0)
+    results = client.ocr_many(IMAGES)
+    assert texts(results) == [f"stub text {n} bytes" for n in range(1, 6)]
+    assert nvidia_ocr_stub.counter["requests"] == 3
+
+
+def test_endpoint_without_batches_falls_back_to_single_images(stub):
+    client = NvidiaOCRClient(stub(batch=False), "key", concurrency=1, batch_size=5, backoff=0)
+    assert texts(client.ocr_many(IMAGES)) == [f"stub text {n} bytes" for n in range(1, 6)]
+    assert nvidia_ocr_stub.counter["requests"] == 1 + len(IMAGES)
+
+
+def test_failed_requests_are_retried(stub):
+    # Every second request returns 503
+    client = NvidiaOCRClient(stub(fail_every=2), "key", concurrency=1, max_retries=2, backoff=0)
+    assert texts(client.ocr_many(IMAGES[:3])) == [f"stub text {n} bytes" for n in range(1, 4)]
+    assert nvidia_ocr_stub.counter["requests"] == 5
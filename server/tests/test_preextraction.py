@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from services import preextraction_service
+from services.file_processor import FileProcessor
+from services.preextraction_service import PreExtractionService
+
+SHA = "cd" * 32
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr("services.determinism_config.EVALUATION_CACHE_DIR", tmp_path)
+    return PreExtractionService()
+
+
+def extracted(complete=True):
+    async def read_file(file_path, sha256=None):
+        return {"filename": "a.txt", "content": "Student: Ana\nQ1: x", "file_type": "text", "metadata": {"complete": complete}}
+    return read_file
+
+
+def run(service, monkeypatch, read_file):
+    monkeypatch.setattr(preextraction_service.extraction_executor, "read_file", read_file)
+    asyncio.run(service._run("f1", "/uploads/a.txt", "a.txt", None, SHA))
+
+
+def test_artifact_is_used_only_for_same_content_and_extractor_version(artifacts, monkeypatch):
+    run(artifacts, monkeypatch, extracted())
+    assert asyncio.run(artifacts.get("f1", SHA))["file_data"]["filename"] == "a.txt"
+    assert asyncio.run(artifacts.get("f1", "ef" * 32)) is None
+
+    monkeypatch.setattr(FileProcessor, "EXTRACTOR_VERSION", FileProcessor.EXTRACTOR_VERSION + 1)
+    assert asyncio.run(artifacts.get("f1", SHA)) is None
+
+
+def test_incomplete_extraction_is_not_stored(artifacts, monkeypatch):
+    run(artifacts, monkeypatch, extracted(complete=False))
+    assert asyncio.run(artifacts.get("f1", SHA)) is None
@@ -0,0 +1,80 @@
+import asyncio
+
+from services.determinism_config import DeterministicEvalConfig
+from services.gemini_service import GeminiService
+from services.qa_extractor import LocalQAExtractor, merge_chunk_pairs
+
+THRESHOLD = DeterministicEvalConfig.LOCAL_EXTRACTION_MIN_CONFIDENCE
+
+
+def extract(text):
+    return LocalQAExtractor().extract(text)
+
+
+def test_sequential_labeled_pairs_skip_llm():
+    result = extract("Q1: What is X?\nAns: X is y.\nQ2: What is Z?\nAns: Z is w.")
+    assert result["format"] == LocalQAExtractor.FORMAT_QA_LABELED
+    assert len(result["qa_pairs"]) == 2
+    assert result["confidence"] >= THRESHOLD
+
+
+def test_mixed_numbering_falls_back_to_llm():
+    # Questions 2 and 3 have no Q marker and end up inside answer 1
+    result = extract("Q1: What is X?\nAns: X is y.\n2. What is Z?\nZ is w.\n3) What is K?\nK.")
+    assert result["confidence"] < THRESHOLD
+
+
+def test_single_q_marker_in_prose_falls_back_to_llm():
+    result = extract("Q. Note: this lab covers Q-learning.\nAnswer: the agent learns a value table.")
+    assert len(result["qa_pairs"]) == 1
+    assert result["confidence"] < THRESHOLD
+
+
+def test_escalation_uses_llm_only_when_local_is_not_confident():
+    calls = []
+
+    async def llm(text):
+        calls.append(text)
+        return {"success": True, "response": [{"question": "What is Z?", "student_answer": "w"}]}
+
+    extractor = LocalQAExtractor()
+    confident = asyncio.run(extractor.extract_or_escalate("Q1: What is X?\nAns: X is y.\nQ2: What is Z?\nAns: Z is w.", llm))
+    assert len(confident) == 2 and calls == []
+
+    escalated = asyncio.run(extractor.extract_or_escalate("Some essay text without any questions in it.", llm))
+    assert escalated == [{"question": "What is Z?", "student_answer": "w", "answer": "w"}]
+    assert len(calls) == 1
+
+
+def test_escalation_falls_back_to_local_pairs_when_llm_fails():
+    async def llm(text):
+        return {"success": False, "error": "quota"}
+
+    text = "Q. Note: this lab covers Q-learning.\nAnswer: the agent learns a value table."
+    assert asyncio.run(LocalQAExtractor().extract_or_escalate(text, llm)) == extract(text)["qa_pairs"]
+
+
+def test_failed_chunk_keeps_local_question_numbers(tmp_path, monkeypatch):
+    monkeypatch.setattr(DeterministicEvalConfig, "QA_EXTRACTION_CHUNK_CHARS", 60)
+    monkeypatch.setattr(DeterministicEvalConfig, "QA_EXTRACTION_CHUNK_OVERLAP", 0)
+    monkeypatch.setattr("services.determinism_config.EVALUATION_CACHE_DIR", tmp_path)
+    service = GeminiService.__new__(GeminiService)
+    calls = []
+
+    async def llm_first_chunk_only(chunk):
+        calls.append(chunk)
+        if len(calls) == 1:
+            return {"success": True, "response": [{"question": "What is X?", "student_answer": "X is y.", "is_answer_present": True, "question_number": 1}]}
+        return {"success": False, "error": "quota"}
+
+    service._extract_qa_single = llm_first_chunk_only
+    text = "Q1: What is X?\nAns: X is y.\n" + "filler line\n" * 5 + "Q7: What is Z?\nAns: Z is w.\n"
+    result = asyncio.run(service.extract_qa_structured(text))
+    assert result["success"]
+    assert [p.get("question_number") for p in result["response"]] == [1, 7]
+
+
+def test_merge_keeps_number_from_truncated_copy():
+    first = [{"question": "What is X?", "student_answer": "X is", "question_number": 3}]
+    second = [{"question": "What is X?", "student_answer": "X is y.", "question_number": None}]
+    assert merge_chunk_pairs([first, second]) == [{"question": "What is X?", "student_answer": "X is y.", "question_number": 3}]
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+
+import models
+from database import Base, SessionLocal, engine
+from services import storage
+from services.resumable_upload import ResumableUploadService
+
+DATA = b"0123456789" * 10
+USER = 7
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    backend = storage.LocalStorage(tmp_path / "uploads")
+    monkeypatch.setattr(storage, "_storage", backend)
+    monkeypatch.setattr(storage, "STAGING_DIR", tmp_path / "staging")
+    Base.metadata.create_all(engine)
+    yield backend
+    Base.metadata.drop_all(engine)
+
+
+async def body(data):
+    yield data
+
+
+def patch(upload_id, offset, data):
+    return asyncio.run(ResumableUploadService.write_chunk(upload_id, USER, offset, body(data)))
+
+
+def create(sha256=None):
+    return ResumableUploadService.create(USER, "essay.txt", len(DATA), sha256)["upload_id"]
+
+
+def test_chunk_outside_or_past_the_declared_length_is_rejected(local_storage):
+    upload_id = create()
+    with pytest.raises(HTTPException) as outside:
+        patch(upload_id, len(DATA), b"x")
+    assert outside.value.status_code == 400
+    with pytest.raises(HTTPException) as too_long:
+        patch(upload_id, 90, DATA[90:] + b"extra")
+    assert too_long.value.status_code == 413
+
+    # Overlapping chunks at new offsets cannot stage more than the declared length
+    patch(upload_id, 0, DATA[:60])
+    with pytest.raises(HTTPException) as overlap:
+        patch(upload_id, 30, DATA[30:])
+    assert overlap.value.status_code == 413
+    # Re-sending at the same offset replaces the chunk instead
+    assert patch(upload_id, 0, DATA[:60])["offset"] == 60
+
+
+def test_resume_after_out_of_order_chunks(local_storage):
+    upload_id = create()
+    status = patch(upload_id, 50, DATA[50:])
+    assert status["offset"] == 0 and status["received_ranges"] == [[50, 100]]
+
+    # A client that lost its state asks where to resume, then sends the gap
+    status = ResumableUploadService.status(upload_id, USER)
+    assert (status["offset"], status["complete"]) == (0, False)
+    status = patch(upload_id, 0, DATA[:50])
+    assert (status["offset"], status["complete"]) == (100, True)
+
+
+def test_finalize_assembles_verifies_and_records(local_storage):
+    upload_id = create(hashlib.sha256(DATA).hexdigest())
+    patch(upload_id, 0, DATA[:40])
+    with SessionLocal() as db:
+        with pytest.raises(HTTPException) as incomplete:
+            asyncio.run(ResumableUploadService.finalize(db, upload_id, USER))
+        assert incomplete.value.status_code == 409
+
+        patch(upload_id, 40, DATA[40:])
+        stored = asyncio.run(ResumableUploadService.finalize(db, upload_id, USER))
+        entry = db.query(models.UploadedFile).filter_by(file_id=stored["file_id"]).one()
+    assert entry.sha256 == stored["sha256"] == hashlib.sha256(DATA).hexdigest()
+    assert local_storage.read_bytes(entry.stored_path) == DATA
+    assert list(local_storage.iter_keys(f".partial/{upload_id}/")) == []
+
+
+def test_finalize_rejects_checksum_mismatch(local_storage):
+    upload_id = create("00" * 32)
+    patch(upload_id, 0, DATA)
+    with SessionLocal() as db, pytest.raises(HTTPException) as mismatch:
+        asyncio.run(ResumableUploadService.finalize(db, upload_id, USER))
+    assert mismatch.value.status_code == 422
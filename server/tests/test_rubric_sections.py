@@ -0,0 +1,37 @@
+from services.rubric_sections import section_cache_key
+
+RUBRIC = """Answer every question.
+Q1: Explain binary search. It halves the range each step.
+Q2: {q2}
+"""
+
+
+def key(description, question, number=None, index=1):
+    return section_cache_key(description, question, "student answer", index, number)
+
+
+def test_editing_another_question_keeps_the_key():
+    before = RUBRIC.format(q2="Describe merge sort; it runs in O(n log n).")
+    after = RUBRIC.format(q2="Describe quick sort and its pivot choice.")
+    assert key(before, "Explain binary search", number=1, index=0) == key(after, "Explain binary search", number=1, index=0)
+
+
+def test_unknown_number_keys_the_whole_description():
+    # LLM extraction strips the "Q2:" prefix, so the number is often unknown
+    before = RUBRIC.format(q2="Describe merge sort; it runs in O(n log n).")
+    after = RUBRIC.format(q2="Describe quick sort and its pivot choice.")
+    assert key(before, "Describe the sorting algorithm") != key(after, "Describe the sorting algorithm")
+
+
+def test_numbered_instructions_are_not_question_sections():
+    before = "Instructions\n1. Use recursion\n2. Submit by Friday\n"
+    after = "Instructions\n1. Use recursion\n2. Submit by Monday\n"
+    question = "Write a function that reverses a list"
+    assert key(before, question, number=2) != key(after, question, number=2)
+
+
+def test_numbered_list_that_restates_the_questions_is_sectioned():
+    before = "1. Implement merge sort in Python\n2. Explain how hashing works\n"
+    after = "1. Implement merge sort in Python\n2. Explain how hashing handles collisions\n"
+    question = "Implement merge sort in Python"
+    assert key(before, question, number=1) == key(after, question, number=1)
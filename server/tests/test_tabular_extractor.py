@@ -0,0 +1,21 @@
+from services.tabular_extractor import TabularExtractor
+
+
+def sheet(rows, columns):
+    yield [f"measurement_{c}" for c in range(columns)]
+    for r in range(rows):
+        yield [r * 1.5 + c for c in range(columns)]
+
+
+def test_summary_stays_within_budget_including_header_and_statistics():
+    for max_chars in (800, 2000, 6000):
+        text = TabularExtractor._summarize([("Data", sheet(500, 30))], max_chars=max_chars)
+        assert len(text) <= max_chars
+        assert text.splitlines()[1].startswith("measurement_0\t")
+        assert "[Truncated (character limit)" in text
+
+
+def test_statistics_kept_ahead_of_rows():
+    text = TabularExtractor._summarize([("Data", sheet(500, 3))], max_chars=500)
+    assert "Numeric columns:" in text and "  measurement_2: count=500" in text
+    assert len(text) <= 500
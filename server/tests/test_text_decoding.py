@@ -0,0 +1,13 @@
+from services.text_decoding import decode_bytes, TEXT_SNIFF_BYTES
+
+
+def test_stray_byte_after_utf8_sample_is_replaced_not_redetected():
+    data = "é".encode("utf-8") * (TEXT_SNIFF_BYTES // 2 + 8000) + b"\x92 end"
+    text, encoding = decode_bytes(data)
+    assert encoding == "utf-8"
+    assert text.startswith("éé") and text.endswith("� end")
+
+
+def test_cp1252_sample_detected():
+    text, _ = decode_bytes("It’s a “quote”".encode("cp1252"))
+    assert text == "It’s a “quote”"
@@ -0,0 +1,31 @@
+import json
+import uuid
+
+import pytest
+
+from database import Base, SessionLocal, engine
+from services import upload_manifest
+from services.upload_manifest import UploadManifest
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_manifest, "UPLOAD_DIR", tmp_path)
+    Base.metadata.create_all(engine)
+    yield tmp_path
+    Base.metadata.drop_all(engine)
+
+
+def test_legacy_uploads_are_backfilled_once(upload_dir):
+    file_id = str(uuid.uuid4())
+    (upload_dir / f"{file_id}.pdf").write_bytes(b"%PDF-1.4 legacy")
+    (upload_dir / f"{file_id}.meta.json").write_text(json.dumps({"original_filename": "Essay 1.pdf"}))
+    (upload_dir / "notes.txt").write_text("not an upload")
+
+    with SessionLocal() as db:
+        assert UploadManifest.resolve(db, file_id) is None
+        assert UploadManifest.backfill_legacy(db) == 1
+        upload = UploadManifest.resolve(db, file_id)
+        assert (upload["key"], upload["original_filename"], upload["size"]) == (f"{file_id}.pdf", "Essay 1.pdf", 15)
+        assert UploadManifest.backfill_legacy(db) == 0
+    assert not (upload_dir / f"{file_id}.meta.json").exists()